@@ -1,12 +1,36 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Candidate, Lodge, Vote, Document
+from django.db.models import Count
+from .models import User, Candidate, Lodge, LodgeEvent, StageTransition, Vote, Document
+from .pagination import EstimatedCountPaginator
+from .search import index_for
+from .transitions import change_stage
+
+class FullTextSearchMixin:
+    """Answers the changelist search box from the full-text index instead of icontains scans"""
+    
+    def get_search_results(self, request, queryset, search_term):
+        index = index_for(self.model)
+        if not search_term or index is None:
+            return super().get_search_results(request, queryset, search_term)
+        return index.filter(queryset, search_term), False
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables that grow large: the unfiltered row count
+    comes from the database statistics instead of COUNT(*), and the second
+    "N total" count next to filtered results is skipped.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(FullTextSearchMixin, LargeTableAdminMixin, UserAdmin):
     list_display = ('username', 'email', 'get_full_name', 'position', 'primary_lodge', 'is_dignitary', 'is_senior_member')
     list_filter = ('position', 'is_dignitary', 'is_senior_member', 'primary_lodge')
+    list_select_related = ('primary_lodge',)
     search_fields = ('username', 'email', 'first_name', 'last_name')
+    autocomplete_fields = ('primary_lodge',)
     
     # Add custom fields to fieldsets
     fieldsets = UserAdmin.fieldsets + (
@@ -18,8 +42,34 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
+def stage_action(stage, label):
+    """Changelist action moving the selected candidates to ``stage`` (members.transitions.change_stage)"""
+    def action(modeladmin, request, queryset):
+        result = change_stage(queryset.values('pk'), stage, request.user)
+        modeladmin.message_user(request, result.status_message, messages.SUCCESS if result.changed else messages.WARNING)
+        for _, reason in result.skipped[:10]:
+            modeladmin.message_user(request, reason, messages.WARNING)
+    action.__name__ = f"move_to_{stage.lower()}"
+    return admin.action(description=f"Move selected candidates to {label}", permissions=['change'])(action)
+
+class StageTransitionInline(admin.TabularInline):
+    """Read-only stage history; the log is append-only"""
+    model = StageTransition
+    fk_name = 'candidate'
+    fields = ('from_stage', 'to_stage', 'changed_at', 'duration', 'changed_by')
+    readonly_fields = fields
+    ordering = ('changed_at', 'id')
+    extra = 0
+    can_delete = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('changed_by')
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Candidate)
-class CandidateAdmin(admin.ModelAdmin):
+class CandidateAdmin(FullTextSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('full_name', 'email', 'current_stage', 'application_date', 'city', 'interview_date')
     list_filter = ('current_stage', 'city', 'is_kosovo_citizen')
     search_fields = ('full_name', 'email', 'phone_number')
@@ -39,27 +89,53 @@ class CandidateAdmin(admin.ModelAdmin):
             'fields': ('interview_date', 'interview_passed')
         }),
     )
+    inlines = [StageTransitionInline]
+    actions = [stage_action(stage, label) for stage, label in Candidate.STAGE_CHOICES]
+    
+    def save_model(self, request, obj, form, change):
+        # Recorded on the StageTransition when the stage changes
+        obj._changed_by = request.user
+        super().save_model(request, obj, form, change)
 
 @admin.register(Lodge)
 class LodgeAdmin(admin.ModelAdmin):
     list_display = ('name', 'get_members_count')
     search_fields = ('name',)
-    filter_horizontal = ('members',)
+    autocomplete_fields = ('members',)
+    
+    def get_queryset(self, request):
+        # One grouped COUNT for the whole changelist instead of one per lodge
+        return super().get_queryset(request).annotate(members_count=Count('members', distinct=True))
     
     def get_members_count(self, obj):
-        return obj.members.count()
+        return obj.members_count
     get_members_count.short_description = 'Number of Members'
+    get_members_count.admin_order_field = 'members_count'
+
+@admin.register(LodgeEvent)
+class LodgeEventAdmin(admin.ModelAdmin):
+    list_display = ('title', 'lodge', 'kind', 'start', 'end', 'location')
+    list_filter = ('kind', 'lodge')
+    list_select_related = ('lodge',)
+    search_fields = ('title', 'location', 'description')
+    date_hierarchy = 'start'
+    readonly_fields = ('last_updated',)
+    autocomplete_fields = ('lodge', 'candidate')
 
 @admin.register(Vote)
-class VoteAdmin(admin.ModelAdmin):
+class VoteAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('candidate', 'voter', 'lodge', 'vote', 'vote_level', 'stage', 'timestamp')
     list_filter = ('vote', 'vote_level', 'stage', 'lodge')
+    list_select_related = ('candidate', 'voter', 'lodge')
     search_fields = ('candidate__full_name', 'voter__username', 'comments')
     readonly_fields = ('timestamp',)
+    autocomplete_fields = ('candidate', 'voter', 'lodge')
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'candidate', 'uploaded_at', 'verified')
     list_filter = ('verified', 'uploaded_at')
+    list_select_related = ('candidate',)
     search_fields = ('name', 'candidate__full_name')
     readonly_fields = ('uploaded_at',)
+    autocomplete_fields = ('candidate',)
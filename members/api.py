@@ -0,0 +1,106 @@
+"""
+Helpers of the read-only JSON API (the Api*View classes in members.views).
+
+Every response carries a strong ETag. ApiView computes it from a cheap
+validator query, such as the count and newest ``last_updated`` of the
+candidates a list covers, before anything else is read. A poll whose
+If-None-Match still matches is answered with 304 Not Modified without
+fetching or serializing any rows. Lists are paginated with
+members.pagination.KeysetPaginator over ``values()`` rows, and ``?fields=``
+narrows the columns selected.
+"""
+import hashlib
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.generic import View
+
+from .pagination import KeysetPaginator
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Columns ?fields= can select, in their default order
+CANDIDATE_FIELDS = [
+    'id', 'full_name', 'email', 'phone_number', 'address', 'city', 'is_kosovo_citizen', 'social_profile_url',
+    'current_stage', 'application_date', 'stage_changed_at', 'last_updated', 'interview_date', 'interview_passed',
+]
+LODGE_FIELDS = ['id', 'name', 'member_count']
+VOTE_FIELDS = ['id', 'candidate_id', 'lodge_id', 'voter_id', 'stage', 'vote_level', 'vote', 'timestamp', 'comments']
+
+
+def etag(*parts):
+    """Strong ETag over ``parts``, which must have a stable repr"""
+    return '"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def parse_fields(value, allowed):
+    """Columns named in a ``?fields=a,b`` value, all of ``allowed`` when empty; ValueError for unknown names"""
+    if not value:
+        return list(allowed)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(allowed)}")
+    return fields
+
+
+def page_size(request):
+    try:
+        return min(max(int(request.GET.get('page_size', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+
+
+def keyset_page(request, queryset, fields, field_name, descending=False):
+    """
+    ``{'results': [...], 'next': url, 'previous': url}`` for the page at
+    ``?cursor=``, selecting only ``fields`` (plus the keys the cursor needs)
+    """
+    meta = queryset.model._meta
+    extra = {meta.get_field(field_name).attname, meta.pk.attname} - set(fields)
+    rows = queryset.values(*fields, *extra)
+    paginator = KeysetPaginator(rows, field_name, descending=descending, per_page=page_size(request))
+    page = paginator.page(request.GET.get('cursor'))
+    results = [{name: row[name] for name in fields} for row in page] if extra else list(page)
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    return {'results': results, 'next': link(page.next_cursor), 'previous': link(page.previous_cursor)}
+
+
+class ApiView(LoginRequiredMixin, View):
+    """
+    Read-only JSON endpoint. ``get_validator`` returns the values the
+    response depends on, ``get_data`` the payload. Both may raise ValueError
+    (or ValidationError, InvalidPage) for bad parameters, which are answered
+    with 400 and ``{'error': ...}``.
+    """
+    raise_exception = True
+
+    def get_validator(self):
+        raise NotImplementedError
+
+    def get_data(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        try:
+            tag = etag(request.get_full_path(), *self.get_validator())
+            response = get_conditional_response(request, etag=tag)
+            if response is None:
+                response = JsonResponse(self.get_data())
+        except (ValueError, ValidationError, InvalidPage) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        response['ETag'] = tag
+        # Clients may keep responses but must revalidate them
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
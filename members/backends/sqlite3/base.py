@@ -0,0 +1,25 @@
+"""
+SQLite backend tuned for concurrent writers.
+
+* ``settings.SQLITE_PRAGMAS`` are applied to every new connection, except
+  those set to None.
+* Transactions start with ``BEGIN IMMEDIATE``. A plain (deferred) ``BEGIN``
+  takes the write lock at the first write; if another connection wrote in the
+  meantime SQLite fails at once with "database is locked" instead of waiting
+  for ``busy_timeout``, which broke bulk imports running next to vote casting.
+  Taking the lock up front makes writers queue instead.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            if value is not None:
+                conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,173 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from .calendars import calendar_etag, render_lodge_calendar
+from .models import Lodge
+from .pipeline import compute_pipeline_stats
+from .rosters import compute_lodge_summary
+
+LODGE_DIRECTORY_KEY = 'members:lodge_directory'
+PIPELINE_STATS_KEY = 'members:pipeline_stats'
+LODGE_SUMMARY_KEY = 'members:lodge_summary:{}:{}'
+LODGE_CALENDAR_KEY = 'members:lodge_calendar:{}:{}'
+VERSION_KEY = 'members:version:{}'
+FRAGMENT_KEY = 'members:fragment:{}:{}'
+FRAGMENT_STATS_KEY = 'members:fragment_stats:{}:{}'
+
+# Cached template fragments ({% fragment %} in members.templatetags.fragments)
+FRAGMENTS = ('candidate_detail', 'lodge_detail')
+
+# Safety net for deployments where the cache is not shared between processes
+# (locmem): other workers pick up lodge changes within this many seconds
+LODGE_DIRECTORY_TIMEOUT = 60 * 60
+# Short, because bulk imports and raw inserts add candidates without signals
+PIPELINE_STATS_TIMEOUT = 60
+# Versioned like the fragments; the timeout only bounds changes made with
+# raw updates that bump no version
+LODGE_SUMMARY_TIMEOUT = 10 * 60
+# Versioned too; the timeout lets old events drop out of the .ics window
+LODGE_CALENDAR_TIMEOUT = 60 * 60
+# Version bumps invalidate fragments; the timeout only bounds how stale
+# relative times ("for 3 days") in them get
+FRAGMENT_TIMEOUT = 10 * 60
+
+
+def get_lodge_directory():
+    """
+    Id/name list of all lodges for the navigation menu.
+
+    Served from Django's cache framework and invalidated by the Lodge
+    save/delete signal handlers, so rendering a page issues no lodge query
+    once the cache is warm.
+    """
+    lodges = cache.get(LODGE_DIRECTORY_KEY)
+    if lodges is None:
+        lodges = list(Lodge.objects.order_by('id').values('id', 'name'))
+        cache.set(LODGE_DIRECTORY_KEY, lodges, LODGE_DIRECTORY_TIMEOUT)
+    return lodges
+
+
+def invalidate_lodge_directory():
+    cache.delete(LODGE_DIRECTORY_KEY)
+
+
+def get_pipeline_stats():
+    """
+    Stage funnel, city and month counts and median time in stage
+    (members.pipeline), cached for PIPELINE_STATS_TIMEOUT seconds and
+    invalidated whenever a candidate's stage changes.
+    """
+    stats = cache.get(PIPELINE_STATS_KEY)
+    if stats is None:
+        stats = compute_pipeline_stats()
+        cache.set(PIPELINE_STATS_KEY, stats, PIPELINE_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_pipeline_stats():
+    cache.delete(PIPELINE_STATS_KEY)
+
+
+def get_lodge_summary(lodge_id):
+    """
+    Member counts, officers and candidates under review of a lodge
+    (members.rosters), kept until the lodge's version is bumped by a change
+    to the lodge, its members or its votes.
+    """
+    key = LODGE_SUMMARY_KEY.format(lodge_id, get_version(f"lodge:{lodge_id}"))
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_lodge_summary(lodge_id)
+        cache.set(key, summary, LODGE_SUMMARY_TIMEOUT)
+    return summary
+
+
+def get_lodge_calendar(lodge_id):
+    """
+    ``(etag, content)`` of the lodge's .ics file (members.calendars), None for
+    unknown lodges; kept until the lodge's calendar version is bumped by a
+    change to its events or name
+    """
+    key = LODGE_CALENDAR_KEY.format(lodge_id, get_version(f"calendar:{lodge_id}"))
+    calendar = cache.get(key)
+    if calendar is None:
+        content = render_lodge_calendar(lodge_id)
+        if content is None:
+            return None
+        calendar = (calendar_etag(content), content)
+        cache.set(key, calendar, LODGE_CALENDAR_TIMEOUT)
+    return calendar
+
+
+def get_version(name):
+    """
+    Version counter of ``name`` (such as ``candidate:12``) for fragment keys.
+    A counter that was never set or has been evicted starts from the current
+    time, so it cannot fall back to a value older fragments were stored under.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Invalidate every fragment keyed on the version of ``name``"""
+    key = VERSION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def fragment_key(name, vary_on):
+    digest = hashlib.blake2b(repr(vary_on).encode(), digest_size=16).hexdigest()
+    return FRAGMENT_KEY.format(name, digest)
+
+
+def get_fragment(name, vary_on, render):
+    """
+    Cached output of ``render()`` for fragment ``name`` and the values it
+    varies on (object ids, versions, timestamps); counts hits and misses
+    """
+    key = fragment_key(name, vary_on)
+    content = cache.get(key)
+    _count(FRAGMENT_STATS_KEY.format(name, 'misses' if content is None else 'hits'))
+    if content is None:
+        content = render()
+        cache.set(key, content, FRAGMENT_TIMEOUT)
+    return content
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # add() keeps a concurrent first increment
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_fragment_stats():
+    """Hits, misses and hit ratio of every fragment since the counters were last reset"""
+    keys = [FRAGMENT_STATS_KEY.format(name, kind) for name in FRAGMENTS for kind in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    stats = []
+    for name in FRAGMENTS:
+        hits = counts.get(FRAGMENT_STATS_KEY.format(name, 'hits'), 0)
+        misses = counts.get(FRAGMENT_STATS_KEY.format(name, 'misses'), 0)
+        stats.append({
+            'name': name,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        })
+    return stats
+
+
+def reset_fragment_stats():
+    cache.delete_many([FRAGMENT_STATS_KEY.format(name, kind) for name in FRAGMENTS for kind in ('hits', 'misses')])
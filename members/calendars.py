@@ -0,0 +1,188 @@
+"""
+Lodge calendars: the JSON feed FullCalendar fetches for the visible range
+and the iCalendar (.ics) file calendar clients subscribe to.
+
+Both read LodgeEvent rows through the (lodge, start) index. An event may
+run for up to LodgeEvent.MAX_DURATION, so a range query starts that much
+earlier and then drops the events that ended before the range.
+
+Calendar clients poll the .ics file every few minutes.
+members.cache.get_lodge_calendar keeps the rendered file and its ETag under
+the lodge's calendar version, which LodgeEvent and Lodge changes bump. A
+poll whose If-None-Match still matches is answered from the cache without
+a query beyond loading the token's user. Clients have no session; each
+user's subscription URL carries their own token instead (calendar_token),
+signed with SECRET_KEY and valid until the user is deactivated or bumps
+their calendar_token_version.
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.signing import BadSignature, Signer
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Lodge, LodgeEvent, User
+
+# Longest range the JSON feed serves; FullCalendar asks for six weeks at a time
+FEED_MAX_RANGE = timedelta(days=366)
+# How far back the .ics file goes; it always includes every future event
+ICS_HISTORY = timedelta(days=365)
+TOKEN_SALT = 'members.calendars'
+
+KIND_COLORS = {
+    'MEETING': '#c4a747',
+    'COMMITTEE': '#47a7c4',
+    'DEGREE': '#c44747',
+    'INTERVIEW': '#7a47c4',
+}
+KIND_LABELS = dict(LodgeEvent.KIND_CHOICES)
+EVENT_FIELDS = ['id', 'kind', 'title', 'start', 'end', 'location', 'description', 'candidate_id', 'last_updated']
+
+
+def events_between(lodge_id, start, end):
+    """Events of the lodge that overlap ``start`` (inclusive) to ``end`` (exclusive)"""
+    return (
+        LodgeEvent.objects.filter(lodge=lodge_id, start__gte=start - LodgeEvent.MAX_DURATION, start__lt=end)
+        .filter(Q(start__gte=start) | Q(end__gt=start))
+        .order_by('start', 'id')
+    )
+
+
+def parse_bound(value, name):
+    """Aware datetime from a FullCalendar ``start``/``end`` parameter: a date or an ISO 8601 datetime"""
+    if not value:
+        raise ValueError(f"{name} is required")
+    # Query strings turn the + of a UTC offset into a space
+    parsed = parse_datetime(value.replace(' ', '+'))
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"{name} must be a date or an ISO 8601 datetime")
+        parsed = datetime.combine(date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_range(params):
+    start, end = parse_bound(params.get('start'), 'start'), parse_bound(params.get('end'), 'end')
+    if end <= start:
+        raise ValueError("end must be after start")
+    if end - start > FEED_MAX_RANGE:
+        raise ValueError(f"The range cannot be longer than {FEED_MAX_RANGE.days} days")
+    return start, end
+
+
+def feed_events(lodge_id, start, end):
+    """FullCalendar event objects of the events between ``start`` and ``end``"""
+    events = []
+    for event in events_between(lodge_id, start, end).values(*EVENT_FIELDS):
+        color = KIND_COLORS[event['kind']]
+        item = {
+            'id': event['id'],
+            'title': event['title'],
+            'start': event['start'].isoformat(),
+            'end': event['end'] and event['end'].isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'extendedProps': {
+                'kind': event['kind'],
+                'kindLabel': KIND_LABELS[event['kind']],
+                'location': event['location'],
+                'description': event['description'],
+            },
+        }
+        if event['candidate_id']:
+            item['url'] = reverse('candidate_detail', args=[event['candidate_id']])
+        events.append(item)
+    return events
+
+
+def calendar_token(user, lodge_id):
+    """Token of ``user``'s subscription URL for the lodge's .ics file"""
+    return Signer(salt=TOKEN_SALT).sign(f"{user.pk}:{user.calendar_token_version}:{lodge_id}")
+
+
+def calendar_token_user(lodge_id, token):
+    """Active user whose current token for the lodge ``token`` is, else None"""
+    try:
+        user_id, version, token_lodge_id = Signer(salt=TOKEN_SALT).unsign(token).split(':')
+    except (BadSignature, ValueError):
+        return None
+    if token_lodge_id != str(lodge_id):
+        return None
+    return User.objects.filter(pk=user_id, calendar_token_version=version, is_active=True).first()
+
+
+def ics_text(value):
+    """TEXT value escaped as RFC 5545 requires"""
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def ics_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_fold(line):
+    """Lines longer than 75 octets continued on lines starting with a space, never splitting a character"""
+    parts = []
+    limit = 75
+    while len(line.encode()) > limit:
+        cut = limit
+        while len(line[:cut].encode()) > limit:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+        # Continuation lines lose one octet to the leading space
+        limit = 74
+    parts.append(line)
+    return '\r\n '.join(parts)
+
+
+def render_lodge_calendar(lodge_id):
+    """The lodge's events from ICS_HISTORY ago on as an iCalendar file, None for unknown lodges"""
+    name = Lodge.objects.filter(pk=lodge_id).values_list('name', flat=True).first()
+    if name is None:
+        return None
+    events = (
+        LodgeEvent.objects.filter(lodge=lodge_id, start__gte=timezone.now() - ICS_HISTORY)
+        .order_by('start', 'id')
+        .values(*EVENT_FIELDS)
+    )
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Grand Lodge of Kosovo//Membership//EN',
+        'CALSCALE:GREGORIAN',
+        f"X-WR-CALNAME:{ics_text(name)}",
+    ]
+    for event in events:
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:lodge-event-{event['id']}@membership",
+            f"DTSTAMP:{ics_datetime(event['last_updated'])}",
+            f"DTSTART:{ics_datetime(event['start'])}",
+        ]
+        if event['end']:
+            lines.append(f"DTEND:{ics_datetime(event['end'])}")
+        lines += [
+            f"SUMMARY:{ics_text(event['title'])}",
+            f"CATEGORIES:{ics_text(KIND_LABELS[event['kind']])}",
+        ]
+        if event['location']:
+            lines.append(f"LOCATION:{ics_text(event['location'])}")
+        if event['description']:
+            lines.append(f"DESCRIPTION:{ics_text(event['description'])}")
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return ''.join(ics_fold(line) + '\r\n' for line in lines)
+
+
+def calendar_etag(content):
+    return '"%s"' % hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
@@ -1,7 +1,8 @@
-from .models import Lodge
+from .cache import get_lodge_directory
 
 def lodges_processor(request):
     """Make lodges available to all templates"""
     return {
-        'all_lodges': Lodge.objects.all()
+        # Passed uncalled: the template only looks the lodges up when it renders the menu
+        'all_lodges': get_lodge_directory
     } 
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Streaming CSV and XLSX exports.
+
+Rows come straight from ``values_list(...).iterator(chunk_size=...)``: no
+queryset result cache and no model instances, so memory stays flat whatever
+the number of rows. CSV is sent as it is written, one block of lines per
+chunk. XLSX rows go through openpyxl's write-only mode, which spools the
+sheet to a temporary file; the finished workbook is then streamed from it.
+
+Text comes from application forms. Values a spreadsheet would read as a
+formula are prefixed with an apostrophe in both formats (escape_formula).
+"""
+import csv
+import io
+import tempfile
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .models import Candidate, User, Vote
+
+CHUNK_SIZE = 2000
+# Leading characters that make Excel, LibreOffice or Sheets evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def local_datetime(value):
+    """Aware datetimes in local time without tzinfo, which Excel cannot store"""
+    return timezone.localtime(value).replace(tzinfo=None) if value is not None else None
+
+
+def choice_labels(model, field):
+    labels = dict(model._meta.get_field(field).choices)
+    return lambda value: labels.get(value, value)
+
+
+# (header, values_list field, converter or None)
+CANDIDATE_COLUMNS = [
+    ('ID', 'id', None),
+    ('Full Name', 'full_name', None),
+    ('Email', 'email', None),
+    ('Phone Number', 'phone_number', None),
+    ('Address', 'address', None),
+    ('City', 'city', None),
+    ('Kosovo Citizen', 'is_kosovo_citizen', None),
+    ('Social Profile', 'social_profile_url', None),
+    ('Stage', 'current_stage', choice_labels(Candidate, 'current_stage')),
+    ('Application Date', 'application_date', local_datetime),
+    ('Stage Changed', 'stage_changed_at', local_datetime),
+    ('Interview Date', 'interview_date', local_datetime),
+    ('Interview Passed', 'interview_passed', None),
+]
+
+VOTE_COLUMNS = [
+    ('Candidate', 'candidate__full_name', None),
+    ('Candidate Email', 'candidate__email', None),
+    ('Stage', 'stage', choice_labels(Vote, 'stage')),
+    ('Level', 'vote_level', choice_labels(Vote, 'vote_level')),
+    ('Lodge', 'lodge__name', None),
+    ('Voter', 'voter__username', None),
+    ('Vote', 'vote', choice_labels(Vote, 'vote')),
+    ('Timestamp', 'timestamp', local_datetime),
+    ('Comments', 'comments', None),
+]
+
+MEMBER_COLUMNS = [
+    ('Username', 'username', None),
+    ('First Name', 'first_name', None),
+    ('Last Name', 'last_name', None),
+    ('Email', 'email', None),
+    ('Position', 'position', choice_labels(User, 'position')),
+    ('Primary Lodge', 'primary_lodge__name', None),
+    ('Phone Number', 'phone_number', None),
+    ('City', 'city', None),
+    ('Lodge Member', 'is_lodge_member', None),
+    ('Active', 'is_active', None),
+    ('Date Joined', 'date_joined', local_datetime),
+]
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Lists of converted ``columns`` values, fetched ``chunk_size`` rows at a time"""
+    converters = list(enumerate(convert for _, _, convert in columns))
+    converters = [(i, convert) for i, convert in converters if convert]
+    rows = queryset.values_list(*[field for _, field, _ in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        row = list(row)
+        for i, convert in converters:
+            row[i] = convert(row[i])
+        yield row
+
+
+def csv_stream(headers, rows, chunk_size=CHUNK_SIZE):
+    # The byte order mark lets Excel detect UTF-8
+    buffer = io.StringIO()
+    buffer.write('\ufeff')
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([escape_formula(value) for value in row])
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _xlsx_value(value):
+    if isinstance(value, str):
+        return escape_formula(ILLEGAL_CHARACTERS_RE.sub('', value))
+    return value
+
+
+def xlsx_stream(headers, rows, title, block_size=64 * 1024):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        yield from iter(lambda: file.read(block_size), b'')
+
+
+def export_response(queryset, columns, name, format='csv'):
+    """StreamingHttpResponse with ``queryset`` as ``<name>-<date>.csv`` or ``.xlsx`` (unknown formats get CSV)"""
+    if format not in FORMATS:
+        format = 'csv'
+    headers = [header for header, _, _ in columns]
+    rows = export_rows(queryset, columns)
+    if format == 'xlsx':
+        content = xlsx_stream(headers, rows, title=name.title())
+    else:
+        content = csv_stream(headers, rows)
+    response = StreamingHttpResponse(content, content_type=FORMATS[format])
+    filename = f"{name}-{timezone.localdate():%Y-%m-%d}.{format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
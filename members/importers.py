@@ -0,0 +1,395 @@
+import csv
+import hashlib
+import os
+import warnings
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_pipeline_stats
+from .models import Candidate, StageTransition
+from .search import candidate_index
+
+# Google Form column headers (Albanian) mapped to Candidate fields
+COLUMN_MAP = {
+    'Timestamp': 'application_date',
+    'Email Address': 'email',
+    'Emrin dhe Mbiemrin': 'full_name',
+    'Nr. e Telefonit': 'phone_number',
+    'Adresa': 'address',
+    'Qyteti': 'city',
+    'Jeni qytetar i Republikes së Kosoves?': 'is_kosovo_citizen',
+    'Shto vegzën e profilit tuaj (LinkedIn, Facebook etj).': 'social_profile_url',
+}
+
+REQUIRED_COLUMNS = {
+    'Emrin dhe Mbiemrin',
+    'Email Address'
+}
+
+TEXT_FIELDS = ['email', 'full_name', 'phone_number', 'address', 'city', 'social_profile_url']
+
+# Form answers an upsert compares and overwrites; the email identifies the candidate
+FINGERPRINT_FIELDS = TEXT_FIELDS + ['is_kosovo_citizen']
+UPDATE_FIELDS = [field for field in FINGERPRINT_FIELDS if field != 'email']
+
+CITIZEN_ANSWERS = ['po', 'yes', 'true', '1']
+
+# Spreadsheet row of the first data record (row 1 holds the headers)
+FIRST_DATA_ROW = 2
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ImportResult:
+    """Counters and per-row error report of a candidate import"""
+
+    def __init__(self):
+        self.processed_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.skipped_count = 0
+        self.errors = []
+
+    @property
+    def status_message(self):
+        status_message = []
+        if self.processed_count > 0:
+            status_message.append(f"Successfully processed {self.processed_count} new candidates")
+        if self.updated_count > 0:
+            status_message.append(f"Updated {self.updated_count} changed candidates")
+        if self.unchanged_count > 0:
+            status_message.append(f"{self.unchanged_count} rows unchanged since the last import")
+        if self.skipped_count > 0:
+            status_message.append(f"Skipped {self.skipped_count} existing candidates")
+        return ' | '.join(status_message)
+
+
+def check_required_columns(columns):
+    missing_columns = REQUIRED_COLUMNS - set(columns)
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+def normalize_columns(df):
+    """Trim the column headers and check that the required ones are present"""
+    df.columns = df.columns.str.strip()
+    check_required_columns(df.columns)
+    return df
+
+
+def parse_timestamps(values):
+    """
+    Parse the Timestamp column, unparseable values become NaT.
+
+    The format is inferred once for the whole column; only the values that do
+    not match it fall back to the (much slower) per-value parser.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        parsed = pd.to_datetime(values, errors='coerce')
+    leftover = parsed.isna() & values.notna()
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(values[leftover], errors='coerce', format='mixed')
+    return parsed
+
+
+def prepare_frame(df, first_row=FIRST_DATA_ROW):
+    """
+    Turn a raw form export into a frame of Candidate field values.
+
+    All cleaning is done column-wise; the returned frame carries the
+    spreadsheet row number of each record in the ``row`` column.
+    """
+    df = df.reset_index(drop=True)
+    frame = pd.DataFrame(index=df.index)
+    frame['row'] = range(first_row, first_row + len(df))
+
+    for column, field in COLUMN_MAP.items():
+        if field in TEXT_FIELDS:
+            if column in df.columns:
+                frame[field] = df[column].fillna('').astype(str).str.strip()
+            else:
+                frame[field] = ''
+    frame['email'] = frame['email'].str.lower()
+
+    citizen_column = 'Jeni qytetar i Republikes së Kosoves?'
+    if citizen_column in df.columns:
+        answers = df[citizen_column].astype(str).str.strip().str.lower()
+        frame['is_kosovo_citizen'] = answers.isin(CITIZEN_ANSWERS)
+    else:
+        frame['is_kosovo_citizen'] = True
+
+    if 'Timestamp' in df.columns:
+        application_date = parse_timestamps(df['Timestamp'])
+        if application_date.dt.tz is None:
+            application_date = application_date.dt.tz_localize(
+                settings.TIME_ZONE, ambiguous='NaT', nonexistent='shift_forward'
+            )
+        frame['application_date'] = application_date
+    else:
+        frame['application_date'] = pd.NaT
+
+    return frame
+
+
+def fingerprints(frame):
+    """Hash of each record's FINGERPRINT_FIELDS, to tell re-exported rows from edited ones"""
+    columns = [frame[field].astype(str) for field in FINGERPRINT_FIELDS]
+    return pd.Series(
+        [hashlib.blake2b('\x1f'.join(values).encode(), digest_size=16).hexdigest() for values in zip(*columns)],
+        index=frame.index, dtype=object,
+    )
+
+
+def _field_max_lengths():
+    return {
+        field: Candidate._meta.get_field(field).max_length
+        for field in TEXT_FIELDS
+    }
+
+
+class CandidateImporter:
+    """
+    Set-based importer for candidate spreadsheets.
+
+    Frames are processed in chunks of ``batch_size`` rows: one query looks up
+    the emails that already exist (including those written by earlier chunks
+    of the same file), duplicates inside the chunk are detected in memory and
+    the remaining rows are written with a single ``bulk_create``.
+
+    With ``upsert`` rows of existing candidates are not reported but compared
+    with the fingerprint stored by the last import: unchanged ones are counted,
+    changed ones written with a single ``bulk_update``. Rows timestamped up
+    to ``since``, the high-water mark of the previous upsert, are skipped
+    before any lookup, so a cumulative export only costs its new tail.
+    ``high_water_mark`` is the newest Timestamp imported so far.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, upsert=False, since=None):
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.since = since
+        self.high_water_mark = None
+        self.result = ImportResult()
+        self.max_lengths = _field_max_lengths()
+
+    def import_frame(self, frame):
+        """Import a prepared frame (see ``prepare_frame``) chunk by chunk"""
+        with transaction.atomic():
+            for start in range(0, len(frame), self.batch_size):
+                self.import_chunk(frame.iloc[start:start + self.batch_size])
+        return self.result
+
+    def import_chunk(self, chunk):
+        errors = []
+
+        if self.since is not None and chunk['application_date'].notna().any():
+            seen = chunk['application_date'] <= self.since
+            self.result.unchanged_count += int(seen.sum())
+            chunk = chunk[~seen]
+
+        missing_email = chunk['email'] == ''
+        for row in chunk.loc[missing_email, 'row']:
+            errors.append((row, f"Row {row}: Email is required"))
+        chunk = chunk[~missing_email]
+        chunk = chunk.assign(fingerprint=fingerprints(chunk))
+
+        existing = {
+            email: (pk, fingerprint)
+            for pk, email, fingerprint in Candidate.objects.filter(email__in=list(chunk['email']))
+            .order_by().values_list('pk', 'email', 'import_fingerprint')
+        }
+        is_known = chunk['email'].isin(set(existing))
+
+        too_long = pd.Series('', index=chunk.index)
+        for field, max_length in self.max_lengths.items():
+            exceeded = (chunk[field].str.len() > max_length) & (too_long == '')
+            too_long[exceeded] = f"{field} exceeds {max_length} characters"
+        is_invalid = (too_long != '') & (self.upsert | ~is_known)
+
+        new_emails = chunk.loc[~is_known & ~is_invalid, 'email']
+        is_duplicate = chunk.index.isin(new_emails[new_emails.duplicated()].index)
+        is_skipped = is_duplicate if self.upsert else is_known | is_duplicate
+        self.advance_high_water_mark(chunk.loc[~is_invalid & ~is_duplicate, 'application_date'])
+
+        for row, email in chunk.loc[is_skipped, ['row', 'email']].itertuples(index=False):
+            errors.append((row, f"Row {row}: Candidate with email {email} already exists"))
+        for row, message in zip(chunk.loc[is_invalid, 'row'], too_long[is_invalid]):
+            errors.append((row, f"Row {row}: {message}"))
+
+        new_rows = chunk[~is_known & ~is_duplicate & ~is_invalid]
+        created = Candidate.objects.bulk_create(
+            [self.build_candidate(record) for record in new_rows.itertuples(index=False)],
+            batch_size=self.batch_size,
+        )
+        # bulk_create sends no post_save signals
+        candidate_index.update(created)
+        StageTransition.objects.bulk_create(
+            [StageTransition(candidate=candidate, to_stage=candidate.current_stage,
+                             changed_at=candidate.stage_changed_at) for candidate in created],
+            batch_size=self.batch_size,
+        )
+        updated = self.update_known(chunk[is_known & ~is_invalid], existing) if self.upsert else []
+        if created or updated:
+            invalidate_pipeline_stats()
+
+        self.result.processed_count += len(new_rows)
+        self.result.skipped_count += int(is_skipped.sum())
+        self.result.errors.extend(message for row, message in sorted(errors))
+
+    def update_known(self, rows, existing):
+        # A later answer in the same chunk supersedes an earlier one
+        latest = rows.drop_duplicates('email', keep='last')
+        changed = latest[latest['fingerprint'] != latest['email'].map(lambda email: existing[email][1])]
+        now = timezone.now()
+        candidates = [
+            Candidate(
+                pk=existing[record.email][0], email=record.email, import_fingerprint=record.fingerprint,
+                last_updated=now, **{field: getattr(record, field) for field in UPDATE_FIELDS},
+            )
+            for record in changed.itertuples(index=False)
+        ]
+        Candidate.objects.bulk_update(
+            candidates, UPDATE_FIELDS + ['import_fingerprint', 'last_updated'], batch_size=self.batch_size
+        )
+        # bulk_update sends no post_save signals either
+        candidate_index.update(candidates)
+        self.result.updated_count += len(candidates)
+        self.result.unchanged_count += len(rows) - len(candidates)
+        return candidates
+
+    def advance_high_water_mark(self, timestamps):
+        newest = timestamps.max()
+        if pd.notna(newest) and (self.high_water_mark is None or newest > self.high_water_mark):
+            self.high_water_mark = newest.to_pydatetime()
+
+    def build_candidate(self, record):
+        application_date = record.application_date
+        application_date = application_date.to_pydatetime() if pd.notna(application_date) else timezone.now()
+        return Candidate(
+            email=record.email,
+            full_name=record.full_name,
+            phone_number=record.phone_number,
+            address=record.address,
+            city=record.city,
+            is_kosovo_citizen=record.is_kosovo_citizen,
+            social_profile_url=record.social_profile_url,
+            current_stage='APPLIED',
+            application_date=application_date,
+            stage_changed_at=application_date,
+            import_fingerprint=record.fingerprint,
+        )
+
+
+def import_candidates(df, batch_size=DEFAULT_BATCH_SIZE, upsert=False, since=None):
+    """Import a raw form export DataFrame and return its ``ImportResult``"""
+    frame = prepare_frame(normalize_columns(df))
+    return CandidateImporter(batch_size=batch_size, upsert=upsert, since=since).import_frame(frame)
+
+
+def _cell_to_str(value):
+    # Same representation as pd.read_excel(..., dtype=str); empty cells stay None
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+def _iter_xlsx_rows(path):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # Blank rows are only emitted once a non-blank row follows them, so
+        # formatted but empty rows at the end of the sheet are dropped
+        blank_rows = 0
+        for values in workbook.active.iter_rows(values_only=True):
+            row = tuple(_cell_to_str(value) for value in values)
+            if not any(row):
+                blank_rows += 1
+                continue
+            for _ in range(blank_rows):
+                yield ()
+            blank_rows = 0
+            yield row
+    finally:
+        workbook.close()
+
+
+def _iter_csv_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for values in csv.reader(f):
+            yield tuple(value if value != '' else None for value in values)
+
+
+def _iter_xls_rows(path):
+    # The legacy .xls format cannot be streamed, read it whole
+    df = pd.read_excel(path, dtype=str, header=None)
+    for values in df.itertuples(index=False):
+        yield tuple(value if pd.notna(value) else None for value in values)
+
+
+def iter_rows(path):
+    """
+    Yield the rows of a .xlsx, .csv or .xls file as tuples of strings (or None).
+
+    The first row yielded is the header. ``.xlsx`` files are read with
+    openpyxl's read-only mode and CSV files line by line, so only the current
+    row is held in memory.
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension == '.csv':
+        return _iter_csv_rows(path)
+    if extension == '.xls':
+        return _iter_xls_rows(path)
+    return _iter_xlsx_rows(path)
+
+
+def count_rows(path):
+    """Number of data rows in a file, or None when it cannot be known cheaply"""
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension == '.xlsx':
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max_row - 1 if max_row else None
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+    return None
+
+
+def iter_frames(path, chunk_size=DEFAULT_BATCH_SIZE, skip_rows=0):
+    """
+    Stream a form export as prepared frames (see ``prepare_frame``) of at most
+    ``chunk_size`` records, skipping the first ``skip_rows`` data rows.
+    """
+    rows = iter(iter_rows(path))
+    header = [
+        str(name).strip() if name is not None else f"Unnamed: {i}"
+        for i, name in enumerate(next(rows, ()))
+    ]
+    check_required_columns(header)
+
+    width = len(header)
+    first_row = FIRST_DATA_ROW + skip_rows
+    rows = islice(rows, skip_rows, None)
+    while True:
+        chunk = [row[:width] + (None,) * (width - len(row)) for row in islice(rows, chunk_size)]
+        if not chunk:
+            break
+        yield prepare_frame(pd.DataFrame(chunk, columns=header, dtype=object), first_row=first_row)
+        first_row += len(chunk)
+
+
+def import_candidates_from_file(path, batch_size=DEFAULT_BATCH_SIZE, upsert=False, since=None):
+    """Import a form export file chunk by chunk in bounded memory"""
+    importer = CandidateImporter(batch_size=batch_size, upsert=upsert, since=since)
+    with transaction.atomic():
+        for frame in iter_frames(path, chunk_size=batch_size):
+            importer.import_chunk(frame)
+    return importer.result
@@ -0,0 +1,147 @@
+"""
+Per-request query instrumentation.
+
+``QueryRecorder`` hooks into every database connection with an execute
+wrapper, so it works with ``DEBUG = False`` and costs one timer per query.
+``QueryInstrumentationMiddleware`` records each request and reports
+
+* a ``Server-Timing`` header (database time and query count, template
+  render time, total time) that browser dev tools display per request,
+* one JSON log line on the ``members.queries`` logger,
+* a warning for every statement repeated ``N_PLUS_ONE_THRESHOLD`` times or
+  more, the usual sign of a query issued once per row (N+1).
+
+Statements are compared by fingerprint: literals, placeholders and IN lists
+are collapsed, so ``WHERE id = 1`` and ``WHERE id = 2`` count as repeats.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('members.queries')
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """``sql`` with literals, placeholders and IN lists replaced, so repeats of one statement compare equal"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def n_plus_one_threshold():
+    return getattr(settings, 'N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+
+
+class QueryRecorder:
+    """Context manager recording ``(sql, seconds)`` for every query run inside it"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def repeated(self, threshold=2):
+        """``[(fingerprint, times)]`` of statements run at least ``threshold`` times, most repeated first"""
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return [(statement, times) for statement, times in counts.most_common() if times >= threshold]
+
+    def n_plus_one(self, threshold=None):
+        return self.repeated(threshold or n_plus_one_threshold())
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records query count, database time, repeated statements and template
+    render time per request; see the module docstring for the output.
+
+    Queries run while a streaming response is consumed happen after the
+    middleware returns and are not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.template_render_seconds = 0.0
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+                f'tpl;dur={request.template_render_seconds * 1000:.1f};desc="Template render"',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        n_plus_one = recorder.n_plus_one()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'template_ms': round(request.template_render_seconds * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repeated_queries': sum(times - 1 for _, times in recorder.repeated()),
+            'n_plus_one': len(n_plus_one),
+        }))
+        for statement, times in n_plus_one:
+            logger.warning(json.dumps({
+                'event': 'n_plus_one', 'path': request.path, 'times': times, 'sql': statement,
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        # TemplateResponses are rendered by the handler after the middleware
+        # chain returns them, so time the render call itself
+        render = response.render
+
+        def timed_render():
+            started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request.template_render_seconds += time.perf_counter() - started
+
+        response.render = timed_render
+        return response
@@ -0,0 +1,148 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import BulkUpload
+
+logger = logging.getLogger(__name__)
+
+# RUNNING jobs that have not reported progress for this long are treated as crashed
+STALE_AFTER = timedelta(minutes=10)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BULK_UPLOAD_WORKERS', 1),
+            thread_name_prefix='bulk-upload',
+        )
+    return _executor
+
+
+def enqueue_bulk_upload(upload):
+    """
+    Queue a saved BulkUpload for processing.
+
+    With the default ``thread`` runner the job starts in the in-process pool
+    once the current transaction commits. With the ``command`` runner the
+    upload stays PENDING until ``manage.py process_bulk_uploads`` picks it up.
+    """
+    if getattr(settings, 'BULK_UPLOAD_RUNNER', 'thread') == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, upload.pk))
+
+
+def _run_in_thread(upload_id):
+    close_old_connections()
+    try:
+        run_bulk_upload(upload_id)
+    except Exception:
+        logger.exception("Bulk upload %s crashed", upload_id)
+    finally:
+        close_old_connections()
+
+
+def claim_bulk_upload(upload_id, statuses=('PENDING',)):
+    """Atomically move an upload to RUNNING; returns False if another worker owns it"""
+    now = timezone.now()
+    claimable = BulkUpload.objects.filter(pk=upload_id, status__in=statuses)
+    if 'RUNNING' in statuses:
+        claimable = claimable.exclude(status='RUNNING', heartbeat_at__gte=now - STALE_AFTER)
+    return claimable.update(status='RUNNING', heartbeat_at=now) == 1
+
+
+def previous_high_water_mark(upload):
+    """
+    Newest Timestamp imported by the upserts finished before ``upload``.
+    Insert-only uploads do not count: they leave rows of known emails as they were.
+    """
+    return (
+        BulkUpload.objects.filter(
+            mode='UPSERT', status__in=['COMPLETED', 'COMPLETED_WITH_ERRORS'], uploaded_at__lt=upload.uploaded_at
+        )
+        .aggregate(mark=Max('high_water_mark'))['mark']
+    )
+
+
+def run_bulk_upload(upload_id, batch_size=None, statuses=('PENDING',)):
+    """
+    Import a queued BulkUpload.
+
+    Every chunk is committed together with the upload's progress counters, so
+    a job that dies part way can be resumed from its last committed chunk.
+    Returns False when the upload could not be claimed.
+    """
+    if not claim_bulk_upload(upload_id, statuses):
+        return False
+
+    # Imported here so the views that queue uploads do not load pandas
+    from .importers import DEFAULT_BATCH_SIZE, CandidateImporter, count_rows, iter_frames
+
+    batch_size = batch_size or getattr(settings, 'BULK_UPLOAD_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    upload = BulkUpload.objects.get(pk=upload_id)
+    if upload.started_at is None:
+        upload.started_at = timezone.now()
+
+    try:
+        upload.total_rows = count_rows(upload.file.path)
+        upload.save(update_fields=['started_at', 'total_rows'])
+
+        # Rows are streamed from the file; already committed ones are skipped
+        upsert = upload.mode == 'UPSERT'
+        importer = CandidateImporter(
+            batch_size=batch_size, upsert=upsert, since=previous_high_water_mark(upload) if upsert else None
+        )
+        importer.high_water_mark = upload.high_water_mark
+        chunks = iter_frames(upload.file.path, chunk_size=batch_size, skip_rows=upload.committed_rows)
+        for chunk in chunks:
+            processed_before = importer.result.processed_count
+            updated_before = importer.result.updated_count
+            unchanged_before = importer.result.unchanged_count
+            errors_before = len(importer.result.errors)
+
+            with transaction.atomic():
+                importer.import_chunk(chunk)
+                new_errors = importer.result.errors[errors_before:]
+                upload.processed_count += importer.result.processed_count - processed_before
+                upload.updated_count += importer.result.updated_count - updated_before
+                upload.unchanged_count += importer.result.unchanged_count - unchanged_before
+                upload.high_water_mark = importer.high_water_mark
+                upload.committed_rows += len(chunk)
+                if new_errors:
+                    upload.error_log = '\n'.join(filter(None, [upload.error_log] + new_errors))
+                upload.heartbeat_at = timezone.now()
+                upload.save(update_fields=[
+                    'processed_count', 'updated_count', 'unchanged_count', 'high_water_mark',
+                    'committed_rows', 'error_log', 'heartbeat_at',
+                ])
+
+        upload.total_rows = upload.committed_rows
+        if upload.error_log:
+            upload.status = 'COMPLETED_WITH_ERRORS'
+        else:
+            upload.status = 'COMPLETED'
+            upload.error_log = 'All records processed successfully'
+    except Exception as e:
+        upload.status = 'FAILED'
+        upload.error_log = '\n'.join(filter(None, [upload.error_log, str(e)]))
+
+    upload.finished_at = timezone.now()
+    upload.save(update_fields=['status', 'error_log', 'finished_at', 'total_rows'])
+    return True
+
+
+def resumable_uploads(retry_failed=False):
+    """Uploads a worker should pick up: queued ones, stale RUNNING ones and optionally FAILED ones"""
+    statuses = ['PENDING', 'RUNNING'] + (['FAILED'] if retry_failed else [])
+    return (
+        BulkUpload.objects.filter(status__in=statuses)
+        .exclude(status='RUNNING', heartbeat_at__gte=timezone.now() - STALE_AFTER)
+        .order_by('uploaded_at')
+    )
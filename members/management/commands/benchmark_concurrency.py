@@ -0,0 +1,155 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.test.utils import override_settings
+
+from members.importers import import_candidates
+from members.models import Candidate, Lodge, User, Vote
+from members.synthetic import insert_candidates
+
+from .benchmark_import import HEADERS
+
+# The SQLite defaults before SQLITE_PRAGMAS: rollback journal, fsync on every commit
+ROLLBACK_JOURNAL_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure writes/second while bulk imports and vote casting run in parallel threads. '
+        'Benchmark rows are committed and deleted afterwards, so run it against a development '
+        'or staging database (DB_NAME=/tmp/bench.sqlite3 ...)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--importers', type=int, default=2, help='Threads importing candidate batches')
+        parser.add_argument('--voters', type=int, default=4, help='Threads casting votes one request at a time')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows per import transaction')
+        parser.add_argument(
+            '--compare-journal', action='store_true',
+            help='SQLite only: run once with the rollback journal defaults and once with SQLITE_PRAGMAS '
+                 '(set SQLITE_JOURNAL_MODE=WAL to compare against WAL)'
+        )
+
+    def handle(self, *args, **options):
+        profiles = [('configured', getattr(settings, 'SQLITE_PRAGMAS', {}))]
+        if options['compare_journal'] and connection.vendor == 'sqlite':
+            profiles.insert(0, ('rollback journal', ROLLBACK_JOURNAL_PRAGMAS))
+
+        for name, pragmas in profiles:
+            # Pragmas are applied when a connection opens, so start from none
+            connections.close_all()
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                run = self.prepare(options)
+                try:
+                    results = self.run(run, options)
+                finally:
+                    self.clean_up(run)
+            self.report(name, pragmas if connection.vendor == 'sqlite' else None, results, options['seconds'])
+        connections.close_all()
+
+    def prepare(self, options):
+        tag = uuid.uuid4().hex[:8]
+        lodge = Lodge.objects.create(name=f"Concurrency benchmark {tag}")
+        voters = User.objects.bulk_create([
+            User(username=f"bench-{tag}-{i}", primary_lodge=lodge) for i in range(max(options['voters'], 1) * 10)
+        ])
+        insert_candidates(2000, email_prefix=f"bench-{tag}-")
+        return {
+            'tag': tag,
+            'lodge': lodge,
+            'voters': voters,
+            'candidates': list(
+                Candidate.objects.filter(email__startswith=f"bench-{tag}-").values_list('pk', flat=True)
+            ),
+        }
+
+    def clean_up(self, run):
+        Candidate.objects.filter(email__startswith=f"bench-{run['tag']}-").delete()
+        User.objects.filter(username__startswith=f"bench-{run['tag']}-").delete()
+        run['lodge'].delete()
+
+    def run(self, run, options):
+        deadline = time.perf_counter() + options['seconds']
+        results = {'import': [], 'vote': []}
+        lock = threading.Lock()
+
+        def record(kind, rows, seconds, error=None):
+            with lock:
+                results[kind].append((rows, seconds, error))
+
+        threads = [
+            threading.Thread(target=self.import_worker, args=(run, i, deadline, options['batch_size'], record))
+            for i in range(options['importers'])
+        ] + [
+            threading.Thread(target=self.vote_worker, args=(run, i, options['voters'], deadline, record))
+            for i in range(options['voters'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def import_worker(self, run, worker, deadline, batch_size, record):
+        batch = 0
+        try:
+            while time.perf_counter() < deadline:
+                df = pd.DataFrame([
+                    ['1/17/2025 12:00:00', f"bench-{run['tag']}-{worker}-{batch}-{i}@example.com",
+                     f"Import {worker} {batch} {i}", '044000000', 'Rruga 1', 'Prishtinë', 'Po']
+                    for i in range(batch_size)
+                ], columns=HEADERS, dtype=str)
+                started = time.perf_counter()
+                try:
+                    result = import_candidates(df, batch_size=batch_size)
+                    record('import', result.processed_count, time.perf_counter() - started)
+                except DatabaseError as e:
+                    record('import', 0, time.perf_counter() - started, str(e))
+                batch += 1
+        finally:
+            connections.close_all()
+
+    def vote_worker(self, run, worker, workers, deadline, record):
+        rng = random.Random(worker)
+        # Each worker owns a slice of the voters, so (candidate, voter) pairs never collide
+        voters = run['voters'][worker::workers]
+        pairs = [(candidate, voter) for voter in voters for candidate in run['candidates']]
+        rng.shuffle(pairs)
+        try:
+            for candidate_id, voter in pairs:
+                if time.perf_counter() >= deadline:
+                    break
+                started = time.perf_counter()
+                try:
+                    Vote.objects.create(
+                        candidate_id=candidate_id, voter=voter, lodge=run['lodge'], stage='VOTING',
+                        vote_level='LODGE', vote=rng.choice(['APPROVE', 'REJECT', 'ABSTAIN']),
+                    )
+                    record('vote', 1, time.perf_counter() - started)
+                except DatabaseError as e:
+                    record('vote', 0, time.perf_counter() - started, str(e))
+        finally:
+            connections.close_all()
+
+    def report(self, name, pragmas, results, seconds):
+        self.stdout.write(f"\n{name}" + (f" {pragmas}" if pragmas else ''))
+        self.stdout.write(f"{'workload':<10} {'writes':>8} {'writes/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'errors':>7}")
+        for kind, label in (('import', 'imports'), ('vote', 'votes')):
+            entries = results[kind]
+            writes = sum(rows for rows, _, _ in entries)
+            timings = sorted(elapsed * 1000 for _, elapsed, _ in entries) or [0]
+            errors = [error for _, _, error in entries if error]
+            self.stdout.write(
+                f"{label:<10} {writes:>8} {writes / seconds:>9.0f} {statistics.median(timings):>9.1f} "
+                f"{timings[max(0, int(len(timings) * 0.95) - 1)]:>9.1f} {len(errors):>7}"
+            )
+            if errors:
+                self.stdout.write(f"{'':<10} first error: {errors[0]}")
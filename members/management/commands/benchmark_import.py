@@ -0,0 +1,117 @@
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from openpyxl import Workbook
+
+from members.importers import import_candidates, import_candidates_from_file
+
+HEADERS = [
+    'Timestamp', 'Email Address', 'Emrin dhe Mbiemrin', 'Nr. e Telefonit', 'Adresa', 'Qyteti',
+    'Jeni qytetar i Republikes së Kosoves?',
+]
+CITIES = ['Prishtinë', 'Prizren', 'Pejë', 'Gjakovë', 'Ferizaj']
+
+
+def iter_form_rows(rows, duplicate_every=50):
+    """Yield ``rows`` synthetic Google Form responses"""
+    for i in range(rows):
+        # Repeat the previous email now and then so duplicate detection is exercised
+        n = i - 1 if i and i % duplicate_every == 0 else i
+        yield [
+            f"1/{i % 28 + 1}/2025 12:{i % 60:02d}:00",
+            f"candidate{n}@example.com",
+            f"Candidate {i}",
+            f"04{i % 10000000:07d}",
+            f"Rruga {i % 300}",
+            CITIES[i % len(CITIES)],
+            'Po' if i % 2 == 0 else 'Jo',
+        ]
+
+
+def build_form_export(rows, duplicate_every=50):
+    """Build a DataFrame shaped like the Google Form export with ``rows`` responses"""
+    return pd.DataFrame(list(iter_form_rows(rows, duplicate_every)), columns=HEADERS, dtype=str)
+
+
+def write_form_export(path, rows):
+    """Write a synthetic form export to an .xlsx file without holding it in memory"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADERS)
+    for row in iter_form_rows(rows):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure bulk candidate import throughput (rows/second) and peak memory of the '
+        'DataFrame and streaming paths; all writes are rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Spreadsheet sizes to benchmark'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--mode', choices=['dataframe', 'stream'], nargs='+', default=['dataframe', 'stream'],
+            help='dataframe: pd.read_excel + import_candidates, stream: import_candidates_from_file'
+        )
+        parser.add_argument(
+            '--file',
+            help='Import this file once in the current process (used internally so every '
+                 'measurement gets a fresh process and its own peak RSS)'
+        )
+
+    def handle(self, *args, **options):
+        if options['file']:
+            return self.run_once(options['file'], options['mode'][0], options['batch_size'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in options['rows']:
+                path = os.path.join(tmp, f"form_export_{rows}.xlsx")
+                write_form_export(path, rows)
+                for mode in options['mode']:
+                    output = subprocess.run(
+                        [sys.executable, '-m', 'django', 'benchmark_import', '--file', path,
+                         '--mode', mode, '--batch-size', str(options['batch_size'])],
+                        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+                        env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+                            'DJANGO_SETTINGS_MODULE', 'membership_project.settings')},
+                    ).stdout
+                    self.stdout.write(f"{rows:>8} rows  {mode:<9}  {output.strip()}")
+
+    def run_once(self, path, mode, batch_size):
+        # DEBUG query logging would keep thousands of INSERT statements alive
+        with override_settings(DEBUG=False), transaction.atomic():
+            started = time.perf_counter()
+            if mode == 'stream':
+                result = import_candidates_from_file(path, batch_size=batch_size)
+            else:
+                df = pd.read_excel(path, dtype=str)
+                result = import_candidates(df, batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        rows = result.processed_count + len(result.errors)
+        self.stdout.write(
+            f"{elapsed:8.3f}s  {rows / elapsed:8.0f} rows/s  peak RSS {peak_rss_mb():7.1f} MB  "
+            f"created={result.processed_count} skipped={result.skipped_count}"
+        )
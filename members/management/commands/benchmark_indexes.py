@@ -0,0 +1,105 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import override_settings
+
+from members.models import Candidate, Lodge, User, Vote
+from members.synthetic import create_lodges, create_users, insert_candidates, insert_votes
+
+# Indexes added for these queries; the benchmark drops them to measure the difference
+HOT_PATH_INDEXES = [
+    'candidate_stage_appdate_idx',
+    'candidate_city_appdate_idx',
+    'vote_tally_lookup_idx',
+]
+
+
+def hot_queries(candidate_id=1):
+    """
+    ``(name, queryset, expected index)`` for the queries the applicants list,
+    stage dashboards, admin filters and vote counting run most often.
+    """
+    votes = Vote.objects.filter(candidate_id=candidate_id, stage='VOTING')
+    return [
+        ('applicants list', Candidate.objects.order_by('-application_date', '-id')[:20],
+         'candidate_appdate_id_idx'),
+        ('stage dashboard', Candidate.objects.filter(current_stage='VOTING').order_by('-application_date')[:20],
+         'candidate_stage_appdate_idx'),
+        ('admin city filter', Candidate.objects.filter(city='Prizren').order_by('-application_date')[:100],
+         'candidate_city_appdate_idx'),
+        ('admin city facets', Candidate.objects.order_by('city').values_list('city', flat=True).distinct(),
+         'candidate_city_appdate_idx'),
+        ('interview schedule', Candidate.objects.filter(interview_date__isnull=False).order_by('interview_date')[:20],
+         'candidate_interview_id_idx'),
+        ('vote approve count', votes.filter(vote_level='LODGE', vote='APPROVE'), 'vote_tally_lookup_idx'),
+        ('grand lodge exists', votes.filter(vote_level='GRAND_LODGE'), 'vote_tally_lookup_idx'),
+        ('vote tally', votes.values('candidate_id', 'stage', 'vote_level').annotate(
+            approve=Count('id', filter=Q(vote='APPROVE')), total=Count('id'),
+        ).order_by(), 'vote_tally_lookup_idx'),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the candidate and vote hot-path queries on a synthetic dataset with and without '
+        'the hot-path indexes; all writes are rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=500000)
+        parser.add_argument('--lodges', type=int, default=10)
+        parser.add_argument('--voters', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the best time is reported')
+        parser.add_argument('--explain', action='store_true', help='Print the query plans')
+
+    def handle(self, *args, **options):
+        with override_settings(DEBUG=False), transaction.atomic():
+            self.populate(options)
+            candidate_id = (
+                Vote.objects.values_list('candidate_id', flat=True).order_by('candidate_id').first() or 1
+            )
+
+            with_indexes = self.run_queries(candidate_id, options['repeat'], options['explain'])
+            with connection.cursor() as cursor:
+                for name in HOT_PATH_INDEXES:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+            # SQLite keeps serving cached EXPLAIN output after a DROP INDEX, so plans are only shown once
+            without_indexes = self.run_queries(candidate_id, options['repeat'])
+
+            self.stdout.write(f"\n{'query':<22} {'with (ms)':>10} {'without (ms)':>13} {'speed-up':>9}")
+            for name, seconds in with_indexes.items():
+                before = without_indexes[name]
+                self.stdout.write(
+                    f"{name:<22} {seconds * 1000:>10.2f} {before * 1000:>13.2f} {before / max(seconds, 1e-9):>8.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def populate(self, options):
+        started = time.perf_counter()
+        lodges = create_lodges(options['lodges'], start=Lodge.objects.count())
+        voters = create_users(options['voters'], lodges, start=User.objects.count())
+        start = Candidate.objects.count()
+        insert_candidates(options['candidates'], start=start)
+        votes = insert_votes([voter.pk for voter in voters], [lodge.pk for lodge in lodges])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(
+            f"Inserted {options['candidates']} candidates and {votes} votes "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    def run_queries(self, candidate_id, repeat, explain=False):
+        timings = {}
+        for name, queryset, expected in hot_queries(candidate_id):
+            if explain:
+                self.stdout.write(f"\n{name} (expects {expected}):\n{queryset.explain()}")
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        return timings
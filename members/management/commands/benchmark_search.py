@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from members.models import Candidate
+from members.pagination import estimate_count
+from members.search import candidate_index, prefer_ordered_scan
+from members.synthetic import insert_candidates
+
+# Typeahead prefixes, full words, folded diacritics, phone and email fragments
+QUERIES = ['ar', 'arb', 'kras', 'arben kras', 'prizren', 'çeku', 'ceku', 'dermaku besa', '044', 'applicant12345']
+TARGET_MS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure full-text search latency (typeahead and the filtered applicants page) on a '
+        'synthetic candidate table; all writes are rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+        parser.add_argument('--query', nargs='+', default=QUERIES)
+
+    def handle(self, *args, **options):
+        with override_settings(DEBUG=False), transaction.atomic():
+            started = time.perf_counter()
+            insert_candidates(options['candidates'], start=Candidate.objects.count())
+            indexed = candidate_index.rebuild()
+            self.stdout.write(f"Indexed {indexed} candidates in {time.perf_counter() - started:.1f}s\n")
+            total = estimate_count(Candidate.objects.all())
+
+            self.stdout.write(f"{'query':<16} {'matches':>8} {'typeahead p50/p95 (ms)':>24} {'page p50/p95 (ms)':>19}")
+            for query in options['query']:
+                typeahead = self.measure(lambda: candidate_index.top(query, 10), options['repeat'])
+                page = self.measure(lambda: self.applicants_page(query, total), options['repeat'])
+                slow = ' *' if max(typeahead[1], page[1]) > TARGET_MS else ''
+                self.stdout.write(
+                    f"{query:<16} {candidate_index.count(query):>8} {typeahead[0]:>11.2f} / {typeahead[1]:<10.2f} "
+                    f"{page[0]:>8.2f} / {page[1]:<8.2f}{slow}"
+                )
+            self.stdout.write(f"\n* p95 above the {TARGET_MS} ms target")
+            transaction.set_rollback(True)
+
+    def applicants_page(self, query, total, page_size=10):
+        """The queries ApplicantsListView runs for ?q=: the match count and the first page"""
+        matches = candidate_index.count(query)
+        queryset = candidate_index.filter(
+            Candidate.objects.all(), query, ordered_scan=prefer_ordered_scan(matches, total, page_size)
+        )
+        return list(queryset.order_by('-application_date', '-id')[:page_size])
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)]
@@ -0,0 +1,79 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from members.storage import blob_storage
+
+EXTENSIONS = ['.pdf', '.jpg', '.png', '.xlsx']
+
+
+def build_corpus(files, duplicate_share, min_kb, max_kb, seed=0):
+    """
+    ``[(name, content)]`` of ``files`` uploads, ``duplicate_share`` of them
+    repeating an earlier upload (the same ID card sent again, one spreadsheet
+    uploaded twice); the content objects are shared, not copied.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(files):
+        if corpus and rng.random() < duplicate_share:
+            name, content = rng.choice(corpus)
+            extension = os.path.splitext(name)[1]
+        else:
+            content = rng.randbytes(rng.randint(min_kb, max_kb) * 1024)
+            extension = rng.choice(EXTENSIONS)
+        corpus.append((f"upload-{i}{extension}", content))
+    return corpus
+
+
+def disk_usage(root):
+    files = size = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            files += 1
+            size += os.path.getsize(os.path.join(directory, filename))
+    return files, size
+
+
+class Command(BaseCommand):
+    help = (
+        'Upload a corpus with duplicates through the plain file system storage and the '
+        'content-addressed storage and compare throughput and disk usage; everything is '
+        'written to temporary directories and rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=500)
+        parser.add_argument('--duplicates', type=float, default=0.4, help='Share of uploads repeating an earlier one')
+        parser.add_argument('--min-kb', type=int, default=50)
+        parser.add_argument('--max-kb', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        corpus = build_corpus(options['files'], options['duplicates'], options['min_kb'], options['max_kb'])
+        uploaded = sum(len(content) for _, content in corpus)
+        unique = len({content for _, content in corpus})
+        self.stdout.write(
+            f"{len(corpus)} uploads, {unique} distinct, {uploaded / 1024 / 1024:.1f} MB uploaded\n"
+            f"{'storage':<20} {'MB/s':>7} {'files':>6} {'MB on disk':>11}"
+        )
+        for label, storage in (('file system', None), ('content-addressed', blob_storage)):
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                if storage is None:
+                    storage = FileSystemStorage()
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    for name, content in corpus:
+                        storage.save(name, ContentFile(content))
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                files, size = disk_usage(media_root)
+            self.stdout.write(
+                f"{label:<20} {uploaded / 1024 / 1024 / elapsed:>7.0f} {files:>6} {size / 1024 / 1024:>11.1f}"
+            )
@@ -0,0 +1,241 @@
+import json
+import math
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from members import urls as members_urls
+from members.importers import import_candidates_from_file
+from members.instrumentation import QueryRecorder
+from members.models import Blob, BulkUpload, Candidate, ChunkedUpload, Document, Lodge, MemberDocument, User, Vote
+
+from .benchmark_import import write_form_export
+
+# Model whose first row fills in the URL arguments, by URL name
+URL_OBJECTS = {
+    'candidate_detail': Candidate,
+    'api_candidate_detail': Candidate,
+    'lodge_detail': Lodge,
+    'lodge_events': Lodge,
+    'lodge_calendar': Lodge,
+    'calendar_token_reset': Lodge,
+    'bulk_upload_progress': BulkUpload,
+    'delete_document': MemberDocument,
+    'file_download': Blob,
+    'file_derivative': Blob,
+    # The benchmark user's own upload (get_upload)
+    'chunked_upload': ChunkedUpload,
+    'chunked_upload_chunk': ChunkedUpload,
+    'chunked_upload_complete': ChunkedUpload,
+}
+# URL arguments that are not taken from the object
+URL_ARGUMENTS = {
+    'file_derivative': {'kind': 'thumb'},
+    'chunked_upload_chunk': {'index': 0},
+}
+# Query strings measured as separate entries; URLs not listed are requested once without one
+URL_VARIANTS = {
+    'applicants': [
+        {}, {'sort': '-name'}, {'page': 50}, {'paginate': 'cursor'}, {'page_size': 100}, {'q': 'arben'},
+    ],
+    'applicants_typeahead': [{'q': 'ar'}, {'q': 'krasniqi'}],
+    # Searched so a run over a large database stays short
+    'applicants_export': [{'q': 'arben'}, {'q': 'arben', 'format': 'xlsx'}],
+    'api_candidates': [{}, {'fields': 'id,full_name', 'page_size': 100}, {'q': 'arben'}],
+    # A month view and the longest range served
+    'lodge_events': [{'start': '2025-03-01', 'end': '2025-04-12'}, {'start': '2025-01-01', 'end': '2026-01-01'}],
+}
+
+# A URL counts as regressed when it issues more queries, or when its median
+# time grows by more than this share and this many milliseconds
+REGRESSION_RATIO = 0.2
+REGRESSION_MIN_MS = 2
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every page in members/urls.py and the bulk import path against the current database, '
+        'count their queries and write a JSON report; all writes are rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per URL after one warm-up')
+        parser.add_argument('--import-rows', type=int, default=5000, help='Rows in the bulk import file; 0 skips it')
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument('--compare', help='Earlier report to compare against')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true', help='Exit with an error when --compare finds regressions'
+        )
+
+    def handle(self, *args, **options):
+        report = {
+            'commit': git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+        }
+        with override_settings(DEBUG=False), transaction.atomic():
+            report['dataset'] = {
+                model._meta.model_name: model.objects.count()
+                for model in (Lodge, User, Candidate, Vote, Document, MemberDocument, BulkUpload)
+            }
+            report['urls'] = self.benchmark_urls(options['repeat'])
+            if options['import_rows']:
+                report['bulk_import'] = self.benchmark_import(options['import_rows'])
+            transaction.set_rollback(True)
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                regressions = self.compare(json.load(f), report)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} URLs regressed against {options['compare']}")
+
+    def get_user(self):
+        """A secretary, so the control panel pages are measured too"""
+        user = User.objects.filter(position='SE', is_active=True).first()
+        if user is None:
+            user = User.objects.create_user('benchmark-secretary', position='SE')
+        return user
+
+    def get_upload(self, user):
+        """An upload of ``user``, the only ones the upload URLs serve them; made without a file if missing"""
+        upload = ChunkedUpload.objects.filter(user=user).order_by('created_at').first()
+        if upload is None:
+            upload = ChunkedUpload.objects.create(user=user, filename='benchmark.bin', size=1, chunk_size=1)
+        return upload
+
+    def iter_urls(self, user):
+        for pattern in members_urls.urlpatterns:
+            kwargs = {}
+            if pattern.pattern.converters:
+                model = URL_OBJECTS.get(pattern.name)
+                if model is ChunkedUpload:
+                    obj = self.get_upload(user)
+                else:
+                    obj = model.objects.order_by('pk').first() if model else None
+                if obj is None:
+                    yield pattern.name, None, f"no {model.__name__ if model else 'object'} to fill in its arguments"
+                    continue
+                # Arguments named after a field (file_download's name) take its value, the rest the pk
+                kwargs = {name: getattr(obj, name, obj.pk) for name in pattern.pattern.converters}
+                kwargs.update(URL_ARGUMENTS.get(pattern.name, {}))
+            url = reverse(pattern.name, kwargs=kwargs)
+            for params in URL_VARIANTS.get(pattern.name, [{}]):
+                yield pattern.name, (url, params), None
+
+    def fetch(self, client, url, params):
+        """GET and read the whole body; streamed exports only query and render while being read"""
+        response = client.get(url, params)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, len(content)
+
+    def benchmark_urls(self, repeat):
+        client = Client()
+        user = self.get_user()
+        client.force_login(user)
+        results = {}
+        self.stdout.write(f"{'url':<52} {'status':>6} {'queries':>7} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+        for name, request, skipped in self.iter_urls(user):
+            if skipped:
+                results[name] = {'skipped': skipped}
+                self.stdout.write(f"{name:<52} skipped: {skipped}")
+                continue
+            url, params = request
+            key = f"{name}?{urlencode(params)}" if params else name
+            response, size = self.fetch(client, url, params)
+            with QueryRecorder() as recorder:
+                self.fetch(client, url, params)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                self.fetch(client, url, params)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[key] = {
+                'url': url,
+                'params': params,
+                'status': response.status_code,
+                'bytes': size,
+                'queries': recorder.count,
+                'db_ms': round(recorder.duration * 1000, 3),
+                'n_plus_one': [{'sql': statement, 'times': times} for statement, times in recorder.n_plus_one()],
+                'p50_ms': round(statistics.median(timings), 3),
+                # Nearest rank
+                'p95_ms': round(timings[math.ceil(0.95 * len(timings)) - 1], 3),
+                'max_ms': round(timings[-1], 3),
+            }
+            result = results[key]
+            self.stdout.write(
+                f"{key:<52} {result['status']:>6} {result['queries']:>7} "
+                f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}"
+                + (f"  N+1: {len(result['n_plus_one'])}" if result['n_plus_one'] else '')
+            )
+        return results
+
+    def benchmark_import(self, rows):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'form_export.xlsx')
+            write_form_export(path, rows)
+            with transaction.atomic(), QueryRecorder() as recorder:
+                started = time.perf_counter()
+                result = import_candidates_from_file(path)
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+        self.stdout.write(f"bulk import: {rows} rows in {elapsed:.2f}s, {recorder.count} queries")
+        return {
+            'rows': rows,
+            'created': result.processed_count,
+            'skipped': result.skipped_count,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed),
+            'queries': recorder.count,
+            'db_seconds': round(recorder.duration, 3),
+        }
+
+    def compare(self, before, after):
+        """Print the differences between two reports; returns the number of regressed URLs"""
+        self.stdout.write(f"\nCompared with {before.get('commit')} ({before.get('created_at')}):")
+        regressions = 0
+        for key, now in after['urls'].items():
+            then = before.get('urls', {}).get(key)
+            if not then or 'skipped' in now or 'skipped' in then:
+                continue
+            slower = now['p50_ms'] - then['p50_ms']
+            regressed = now['queries'] > then['queries'] or (
+                slower > REGRESSION_MIN_MS and slower > then['p50_ms'] * REGRESSION_RATIO
+            )
+            regressions += regressed
+            self.stdout.write(
+                f"{'REGRESSED' if regressed else 'ok':<10} {key:<52} queries {then['queries']} -> {now['queries']}, "
+                f"p50 {then['p50_ms']:.2f} -> {now['p50_ms']:.2f} ms"
+            )
+        if 'bulk_import' in before and 'bulk_import' in after:
+            self.stdout.write(
+                f"{'':<10} bulk import rows/s {before['bulk_import']['rows_per_second']} -> "
+                f"{after['bulk_import']['rows_per_second']}"
+            )
+        return regressions
@@ -0,0 +1,92 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from members.models import Blob, ChunkedUpload
+from members.storage import BLOB_DIR, TEMP_DIR, blob_storage, count_references
+from members.thumbnails import original_base
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the references to every stored file from the models that use them, then delete '
+        'blobs nothing refers to, files under blobs/ without a Blob row and abandoned temporary and chunked uploads'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep anything stored more recently than this; uploads in progress are not referenced yet'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+
+        # Their part files are old temp files by now and go with the stray files below
+        abandoned = ChunkedUpload.objects.filter(updated_at__lt=cutoff)
+        uploads = abandoned.count() if dry_run else abandoned.delete()[1].get(ChunkedUpload._meta.label, 0)
+        corrected = self.recount(dry_run)
+        blobs, blob_bytes = self.delete_unreferenced(cutoff, dry_run)
+        files, file_bytes = self.delete_stray_files(cutoff.timestamp(), dry_run)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrected {corrected} reference counts. {verb} {blobs} unreferenced blobs "
+            f"({blob_bytes / 1024 / 1024:.1f} MB), {files} stray files ({file_bytes / 1024 / 1024:.1f} MB) "
+            f"and {uploads} abandoned chunked uploads"
+        ))
+
+    def recount(self, dry_run):
+        """Bring every ref_count in line with the models; returns the number of corrected rows"""
+        with transaction.atomic():
+            counts = count_references()
+            changed = []
+            for blob in Blob.objects.only('pk', 'name', 'ref_count').iterator(2000):
+                references = counts.get(blob.name, 0)
+                if blob.ref_count != references:
+                    blob.ref_count = references
+                    changed.append(blob)
+            if not dry_run:
+                Blob.objects.bulk_update(changed, ['ref_count'], batch_size=1000)
+        return len(changed)
+
+    def delete_unreferenced(self, cutoff, dry_run):
+        deleted = size = 0
+        orphans = Blob.objects.filter(ref_count=0, stored_at__lt=cutoff).values_list('pk', 'name', 'size')
+        for pk, name, blob_size in orphans.iterator(2000):
+            # Re-checked row by row: an upload of the same content may have claimed it meanwhile
+            if dry_run or Blob.objects.filter(pk=pk, ref_count=0, stored_at__lt=cutoff).delete()[0]:
+                if not dry_run:
+                    blob_storage.delete(name)
+                deleted += 1
+                size += blob_size
+        return deleted, size
+
+    def delete_stray_files(self, cutoff, dry_run):
+        """
+        Files under blobs/ with no Blob row (a crash between writing and
+        recording), derivatives of deleted or older versions and old temp files
+        """
+        root = blob_storage.path(BLOB_DIR)
+        temp_dir = blob_storage.path(TEMP_DIR)
+        known = set(Blob.objects.values_list('name', flat=True))
+        # Thumbnails and previews live as long as their original
+        bases = {os.path.splitext(name)[0] for name in known}
+        deleted = size = 0
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, blob_storage.location).replace(os.sep, '/')
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff or (directory != temp_dir and (name in known or original_base(name) in bases)):
+                    continue
+                if not dry_run:
+                    os.unlink(path)
+                deleted += 1
+                size += stat.st_size
+        return deleted, size
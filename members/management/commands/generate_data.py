@@ -0,0 +1,60 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from members.models import Candidate, Document, Lodge, User, Vote
+from members.synthetic import (
+    create_lodges, create_users, insert_candidates, insert_documents, insert_stage_transitions, insert_votes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate realistic synthetic data: lodges, members with their positions, candidates in every '
+        'stage with their stage history, lodge and Grand Lodge votes and candidate documents'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lodges', type=int, default=10)
+        parser.add_argument('--users', type=int, default=300, help='Members, including the officers of every lodge')
+        parser.add_argument('--candidates', type=int, default=10000)
+        parser.add_argument('--documents-per-candidate', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password', help='Password of every generated member')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            last_candidate = Candidate.objects.aggregate(last=Max('pk'))['last'] or 0
+            lodges = create_lodges(options['lodges'], start=Lodge.objects.count())
+            users = create_users(
+                options['users'], lodges, seed=options['seed'], start=User.objects.count(),
+                password=options['password'],
+            )
+            insert_candidates(options['candidates'], seed=options['seed'], start=Candidate.objects.count())
+
+            # Only the new candidates get transitions, votes and documents, so the command can be run repeatedly
+            new_candidates = Candidate.objects.filter(pk__gt=last_candidate)
+            transitions = insert_stage_transitions(seed=options['seed'], candidates=new_candidates)
+            votes = insert_votes(
+                [user.pk for user in users], [lodge.pk for lodge in lodges], seed=options['seed'],
+                candidates=new_candidates,
+            )
+            documents = insert_documents(
+                options['documents_per_candidate'], seed=options['seed'], candidates=new_candidates
+            )
+
+            # Raw inserts skip the signal handlers that maintain these
+            call_command('rebuild_vote_tallies', stdout=self.stdout)
+            call_command('rebuild_search_index', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(lodges)} lodges, {len(users)} members, {options['candidates']} candidates, "
+            f"{transitions} stage transitions, {votes} votes and {documents} documents "
+            f"in {time.perf_counter() - started:.1f}s "
+            f"(now {Candidate.objects.count()} candidates, {Vote.objects.count()} votes, "
+            f"{Document.objects.count()} documents)"
+        ))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from members.jobs import resumable_uploads, run_bulk_upload
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued bulk candidate uploads. Uploads left RUNNING by a crashed worker '
+        'are resumed from their last committed chunk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('upload_ids', nargs='*', type=int, help='Only process these uploads')
+        parser.add_argument('--retry-failed', action='store_true', help='Also resume FAILED uploads')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--interval', type=float, default=5.0, help='Polling interval in seconds')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        while True:
+            uploads = resumable_uploads(retry_failed=options['retry_failed'])
+            if options['upload_ids']:
+                uploads = uploads.filter(pk__in=options['upload_ids'])
+
+            for upload in uploads:
+                resumed = upload.committed_rows
+                if run_bulk_upload(upload.pk, options['batch_size'], statuses=(upload.status,)):
+                    upload.refresh_from_db()
+                    self.stdout.write(
+                        f"Upload {upload.pk}: {upload.status}, {upload.processed_count} candidates"
+                        + (f" (resumed after {resumed} rows)" if resumed else '')
+                    )
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from members.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search tables for candidates and members from their model tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for index in SEARCH_INDEXES:
+            with transaction.atomic():
+                count = index.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Indexed {count} rows into {index.table}"))
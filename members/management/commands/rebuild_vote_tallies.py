@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from members.models import VoteTally
+from members.voting import Tally, stored_tallies, tally_votes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the VoteTally table from the raw Vote table, or verify it with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the stored tallies with the Vote table and report differences'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+
+        with transaction.atomic():
+            VoteTally.objects.all().delete()
+            VoteTally.objects.bulk_create([
+                VoteTally(
+                    candidate_id=candidate_id, stage=stage, vote_level=vote_level,
+                    approve_count=tally.approve, reject_count=tally.reject, abstain_count=tally.abstain,
+                )
+                for (candidate_id, stage, vote_level), tally in tally_votes().items()
+            ], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {VoteTally.objects.count()} vote tallies"))
+
+    def verify(self):
+        expected = tally_votes()
+        stored = stored_tallies()
+        mismatches = 0
+        for key in sorted(set(expected) | set(stored), key=str):
+            if expected.get(key, Tally()) != stored.get(key, Tally()):
+                mismatches += 1
+                self.stdout.write(f"{key}: stored {stored.get(key)}, votes {expected.get(key)}")
+        if mismatches:
+            raise CommandError(f"{mismatches} vote tallies differ from the Vote table; run rebuild_vote_tallies")
+        self.stdout.write(self.style.SUCCESS(f"All {len(expected)} vote tallies match the Vote table"))
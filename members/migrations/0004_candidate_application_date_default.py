@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0003_bulkupload_memberdocument'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidate',
+            name='application_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_vote_tallies(apps, schema_editor):
+    Vote = apps.get_model('members', 'Vote')
+    VoteTally = apps.get_model('members', 'VoteTally')
+    rows = (
+        Vote.objects.values('candidate_id', 'stage', 'vote_level')
+        .annotate(
+            approve_count=Count('id', filter=Q(vote='APPROVE')),
+            reject_count=Count('id', filter=Q(vote='REJECT')),
+            abstain_count=Count('id', filter=Q(vote='ABSTAIN')),
+        )
+        .order_by()
+    )
+    VoteTally.objects.bulk_create([VoteTally(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0005_bulkupload_job_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('APPLIED', 'Application Submitted'), ('DOCUMENTS', 'Document Review'), ('INTERVIEW', 'Interview Stage'), ('LODGE_REVIEW', 'Lodge Review'), ('VOTING', 'Final Voting'), ('ACCEPTED', 'Accepted'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('vote_level', models.CharField(choices=[('LODGE', 'Lodge Level'), ('GRAND_LODGE', 'Grand Lodge Level')], max_length=20)),
+                ('approve_count', models.PositiveIntegerField(default=0)),
+                ('reject_count', models.PositiveIntegerField(default=0)),
+                ('abstain_count', models.PositiveIntegerField(default=0)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_tallies', to='members.candidate')),
+            ],
+            options={
+                'unique_together': {('candidate', 'stage', 'vote_level')},
+            },
+        ),
+        migrations.RunPython(populate_vote_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0006_votetally'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['full_name', 'id'], name='candidate_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['application_date', 'id'], name='candidate_appdate_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['current_stage', 'id'], name='candidate_stage_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['interview_date', 'id'], name='candidate_interview_id_idx'),
+        ),
+    ]
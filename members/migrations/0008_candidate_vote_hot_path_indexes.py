@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-18 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0007_candidate_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['current_stage', '-application_date'], name='candidate_stage_appdate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['city', '-application_date'], name='candidate_city_appdate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['candidate', 'stage', 'vote_level', 'vote'], name='vote_tally_lookup_idx'),
+        ),
+    ]
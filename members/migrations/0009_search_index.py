@@ -0,0 +1,80 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# The tables and documents as members.search built them when this migration
+# was written; copied here so later changes to that module leave it alone.
+# Model name -> (table, fields, digit fields)
+SEARCH_TABLES = {
+    'Candidate': ('members_candidate_search', ['full_name', 'email', 'phone_number', 'city'], ['phone_number']),
+    'User': ('members_user_search', ['username', 'first_name', 'last_name', 'email', 'phone_number'], ['phone_number']),
+}
+CREATE_SQL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+        "USING fts5(body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    'postgresql': [
+        "CREATE TABLE IF NOT EXISTS {table} (id bigint PRIMARY KEY, body text NOT NULL, vector tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS {table}_vector ON {table} USING gin (vector)",
+    ],
+}
+INSERT_SQL = {
+    'sqlite': "INSERT INTO {table} (rowid, body) VALUES (%s, %s)",
+    'postgresql': "INSERT INTO {table} (id, body, vector) VALUES (%s, %s, to_tsvector('simple', %s))",
+}
+BATCH_SIZE = 5000
+
+
+def document(obj, fields, digit_fields):
+    words = []
+    for field in fields:
+        folded = unicodedata.normalize('NFKD', str(getattr(obj, field) or ''))
+        folded = ''.join(c for c in folded if not unicodedata.combining(c)).casefold()
+        words.extend(re.findall(r'\w+', folded))
+    for field in digit_fields:
+        digits = re.sub(r'\D', '', getattr(obj, field) or '')
+        if digits:
+            words.append(digits)
+    return ' '.join(words)
+
+
+def create_search_tables(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for model_name, (table, fields, digit_fields) in SEARCH_TABLES.items():
+            for sql in CREATE_SQL[vendor]:
+                cursor.execute(sql.format(table=table))
+            model = apps.get_model('members', model_name)
+            rows = model.objects.order_by('pk').only('pk', *fields).iterator(BATCH_SIZE)
+            batch = []
+            for obj in rows:
+                body = document(obj, fields, digit_fields)
+                batch.append((obj.pk, body) if vendor == 'sqlite' else (obj.pk, body, body))
+                if len(batch) >= BATCH_SIZE:
+                    cursor.executemany(INSERT_SQL[vendor].format(table=table), batch)
+                    batch = []
+            if batch:
+                cursor.executemany(INSERT_SQL[vendor].format(table=table), batch)
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor not in CREATE_SQL:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, _, _ in SEARCH_TABLES.values():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0008_candidate_vote_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:11
+
+import django.utils.timezone
+import members.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('stored_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='bulkupload',
+            name='file',
+            field=models.FileField(storage=members.storage.get_blob_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=members.storage.get_blob_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='memberdocument',
+            name='file',
+            field=models.FileField(storage=members.storage.get_blob_storage, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:19
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_stage_changed_at(apps, schema_editor):
+    # The best record of a past stage change is the last edit
+    Candidate = apps.get_model('members', 'Candidate')
+    Candidate.objects.update(stage_changed_at=F('last_updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0011_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='stage_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_stage_changed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['current_stage', 'stage_changed_at'], name='candidate_stage_changed_idx'),
+        ),
+    ]
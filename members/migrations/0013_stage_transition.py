@@ -0,0 +1,47 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def log_current_stages(apps, schema_editor):
+    # Earlier changes went unrecorded; start every history at the current stage
+    Candidate = apps.get_model('members', 'Candidate')
+    StageTransition = apps.get_model('members', 'StageTransition')
+    candidates = Candidate.objects.order_by().values_list('id', 'current_stage', 'stage_changed_at')
+    batch = []
+    for candidate_id, stage, changed_at in candidates.iterator(chunk_size=2000):
+        batch.append(StageTransition(candidate_id=candidate_id, to_stage=stage, changed_at=changed_at))
+        if len(batch) >= 2000:
+            StageTransition.objects.bulk_create(batch)
+            batch = []
+    StageTransition.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0012_candidate_stage_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_stage', models.CharField(blank=True, choices=[('APPLIED', 'Application Submitted'), ('DOCUMENTS', 'Document Review'), ('INTERVIEW', 'Interview Stage'), ('LODGE_REVIEW', 'Lodge Review'), ('VOTING', 'Final Voting'), ('ACCEPTED', 'Accepted'), ('REJECTED', 'Rejected')], max_length=50)),
+                ('to_stage', models.CharField(choices=[('APPLIED', 'Application Submitted'), ('DOCUMENTS', 'Document Review'), ('INTERVIEW', 'Interview Stage'), ('LODGE_REVIEW', 'Lodge Review'), ('VOTING', 'Final Voting'), ('ACCEPTED', 'Accepted'), ('REJECTED', 'Rejected')], max_length=50)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_transitions', to='members.candidate')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['changed_at', 'id'],
+                'indexes': [models.Index(fields=['candidate', 'changed_at'], name='transition_candidate_idx'), models.Index(fields=['from_stage', 'changed_at', 'duration'], name='transition_from_stage_idx')],
+            },
+        ),
+        migrations.RunPython(log_current_stages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0013_stage_transition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkupload',
+            name='high_water_mark',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='mode',
+            field=models.CharField(choices=[('INSERT', 'Add new candidates only'), ('UPSERT', 'Add new candidates and update changed ones')], default='INSERT', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='unchanged_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkupload',
+            name='updated_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='import_fingerprint',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
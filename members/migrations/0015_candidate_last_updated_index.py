@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0014_incremental_import'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['last_updated'], name='candidate_last_updated_idx'),
+        ),
+    ]
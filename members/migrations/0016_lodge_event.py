@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 06:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0015_candidate_last_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LodgeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('MEETING', 'Regular Meeting'), ('COMMITTEE', 'Committee Meeting'), ('DEGREE', 'Degree Work'), ('INTERVIEW', 'Candidate Interview')], default='MEETING', max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('candidate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lodge_events', to='members.candidate')),
+                ('lodge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='members.lodge')),
+            ],
+            options={
+                'ordering': ['start', 'id'],
+                'indexes': [models.Index(fields=['lodge', 'start'], name='lodgeevent_lodge_start_idx')],
+            },
+        ),
+    ]
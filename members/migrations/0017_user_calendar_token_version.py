@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0016_lodge_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='calendar_token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,7 +1,15 @@
+import uuid
+from datetime import timedelta
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .storage import get_blob_storage
+from .thumbnails import derivative_url
+
 class User(AbstractUser):
     """Custom user model for enhanced functionality"""
     POSITION_CHOICES = [
@@ -49,6 +57,9 @@ class User(AbstractUser):
     address = models.CharField(max_length=255, blank=True)
     city = models.CharField(max_length=100, blank=True)
     
+    # Part of the signed calendar subscription tokens; bumping it revokes them
+    calendar_token_version = models.PositiveIntegerField(default=0)
+    
     class Meta:
         verbose_name = _('User')
         verbose_name_plural = _('Users')
@@ -61,6 +72,10 @@ class User(AbstractUser):
         """Check if user holds a leadership position"""
         return self.position in ['FNMM', 'ZFNMM', 'FMB1', 'FNMB2', 'FNS', 'FNT', 'FNO', 'MN', 'MB1', 'MB2', 'SE', 'TR', 'OR']
 
+    @property
+    def is_secretary(self):
+        return self.position == 'SE'
+
     @property
     def full_name(self):
         """Returns the person's full name."""
@@ -95,8 +110,13 @@ class Candidate(models.Model):
         choices=STAGE_CHOICES,
         default='APPLIED'
     )
-    application_date = models.DateTimeField(auto_now_add=True)
+    application_date = models.DateTimeField(default=timezone.now)
     last_updated = models.DateTimeField(auto_now=True)
+    # When current_stage last changed; maintained by the signal handlers in members.signals
+    stage_changed_at = models.DateTimeField(default=timezone.now)
+    
+    # Hash of the form answers last imported (members.importers.fingerprints); unchanged rows are skipped
+    import_fingerprint = models.CharField(max_length=32, blank=True)
     
     # Interview Details
     interview_date = models.DateTimeField(null=True, blank=True)
@@ -104,13 +124,60 @@ class Candidate(models.Model):
     
     class Meta:
         ordering = ['-application_date']
+        indexes = [
+            # Server-side sorting and keyset pagination of the applicants list
+            models.Index(fields=['full_name', 'id'], name='candidate_name_id_idx'),
+            models.Index(fields=['application_date', 'id'], name='candidate_appdate_id_idx'),
+            models.Index(fields=['current_stage', 'id'], name='candidate_stage_id_idx'),
+            models.Index(fields=['interview_date', 'id'], name='candidate_interview_id_idx'),
+            # Stage dashboards and the admin stage filter, newest first
+            models.Index(fields=['current_stage', '-application_date'], name='candidate_stage_appdate_idx'),
+            models.Index(fields=['city', '-application_date'], name='candidate_city_appdate_idx'),
+            # Median time in stage (members.pipeline)
+            models.Index(fields=['current_stage', 'stage_changed_at'], name='candidate_stage_changed_idx'),
+            # Newest change, the validator of the API's ETags (members.api)
+            models.Index(fields=['last_updated'], name='candidate_last_updated_idx'),
+        ]
         
     def __str__(self):
         return f"{self.full_name} - {self.get_current_stage_display()}"
     
+    def save(self, *args, **kwargs):
+        # The StageTransition written by the post_save handler commits or rolls back with the change
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
     def check_vote_status(self, stage):
         """Check voting status for the candidate at a specific stage"""
-        return Vote.get_final_decision(self, stage)
+        from .voting import final_decisions
+        return final_decisions([self], [stage])[(self.pk, stage)]
+
+class StageTransition(models.Model):
+    """
+    Append-only log of candidate stage changes, written in the same
+    transaction as the change by the Candidate signal handlers in
+    members.signals (and by bulk imports, which bypass them).
+    """
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='stage_transitions')
+    # Blank for the stage a candidate entered on creation
+    from_stage = models.CharField(max_length=50, choices=Candidate.STAGE_CHOICES, blank=True)
+    to_stage = models.CharField(max_length=50, choices=Candidate.STAGE_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+    # Time spent in from_stage; None for the first transition
+    duration = models.DurationField(null=True, blank=True)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [
+            # Per-candidate timelines
+            models.Index(fields=['candidate', 'changed_at'], name='transition_candidate_idx'),
+            # Time-in-stage percentiles over a date range (members.transitions)
+            models.Index(fields=['from_stage', 'changed_at', 'duration'], name='transition_from_stage_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.candidate_id}: {self.from_stage or '-'} -> {self.to_stage} at {self.changed_at}"
 
 class Lodge(models.Model):
     """Model for different lodges"""
@@ -120,6 +187,53 @@ class Lodge(models.Model):
     def __str__(self):
         return self.name
 
+class LodgeEvent(models.Model):
+    """
+    Calendar entry of a lodge. Interviews are added for the lodge holding
+    them, then follow the interview_date of their candidate and go when it is
+    cleared (members.signals); the feeds in members.calendars read events by
+    lodge and start.
+    """
+    KIND_CHOICES = [
+        ('MEETING', 'Regular Meeting'),
+        ('COMMITTEE', 'Committee Meeting'),
+        ('DEGREE', 'Degree Work'),
+        ('INTERVIEW', 'Candidate Interview'),
+    ]
+    # Range queries look back this far for events that started earlier and are still running
+    MAX_DURATION = timedelta(days=7)
+    
+    lodge = models.ForeignKey(Lodge, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='MEETING')
+    title = models.CharField(max_length=200)
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+    location = models.CharField(max_length=200, blank=True)
+    description = models.TextField(blank=True)
+    candidate = models.ForeignKey(
+        Candidate, on_delete=models.CASCADE, null=True, blank=True, related_name='lodge_events'
+    )
+    last_updated = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['start', 'id']
+        indexes = [
+            # Date range feeds and the last/next meeting of the lodge page
+            models.Index(fields=['lodge', 'start'], name='lodgeevent_lodge_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.lodge_id}: {self.title} at {self.start}"
+    
+    def clean(self):
+        if self.kind == 'INTERVIEW' and self.candidate_id is None:
+            raise ValidationError({'candidate': 'Interviews need a candidate.'})
+        if self.start and self.end:
+            if self.end < self.start:
+                raise ValidationError({'end': 'The event cannot end before it starts.'})
+            if self.end - self.start > self.MAX_DURATION:
+                raise ValidationError({'end': f"Events cannot last longer than {self.MAX_DURATION.days} days."})
+
 class Vote(models.Model):
     """Model for tracking votes on candidates"""
     VOTE_CHOICES = [
@@ -148,10 +262,19 @@ class Vote(models.Model):
     
     class Meta:
         unique_together = ['candidate', 'voter', 'stage', 'vote_level']
+        indexes = [
+            # Covers the per-candidate counts, the Grand Lodge exists() check and the grouped tally query
+            models.Index(fields=['candidate', 'stage', 'vote_level', 'vote'], name='vote_tally_lookup_idx'),
+        ]
         
     def __str__(self):
         return f"{self.candidate.full_name} - {self.vote} by {self.voter.username} ({self.get_vote_level_display()})"
 
+    def save(self, *args, **kwargs):
+        # Keep the VoteTally update done by the post_save handler in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     @classmethod
     def check_unanimous(cls, candidate, stage, vote_level):
         """Check if voting is unanimous for a candidate at a specific stage and level"""
@@ -189,18 +312,54 @@ class Vote(models.Model):
         # If no Grand Lodge votes, check Lodge votes
         return cls.check_unanimous(candidate, stage, 'LODGE')
 
-class Document(models.Model):
+class VoteTally(models.Model):
+    """
+    Denormalized vote counters per candidate, stage and vote level.
+    Maintained by the Vote signal handlers in members.signals.
+    """
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='vote_tallies')
+    stage = models.CharField(max_length=20, choices=Candidate.STAGE_CHOICES)
+    vote_level = models.CharField(max_length=20, choices=Vote.VOTE_LEVEL)
+    approve_count = models.PositiveIntegerField(default=0)
+    reject_count = models.PositiveIntegerField(default=0)
+    abstain_count = models.PositiveIntegerField(default=0)
+    
+    # Vote.vote value -> counter field
+    COUNTER_FIELDS = {
+        'APPROVE': 'approve_count',
+        'REJECT': 'reject_count',
+        'ABSTAIN': 'abstain_count',
+    }
+    
+    class Meta:
+        unique_together = ['candidate', 'stage', 'vote_level']
+    
+    def __str__(self):
+        return f"{self.candidate_id} {self.stage} {self.vote_level}: {self.approve_count}/{self.reject_count}/{self.abstain_count}"
+
+class DocumentPreviewMixin:
+    """Thumbnail and preview URLs of ``file`` (members.thumbnails), None for files without them"""
+    
+    @property
+    def thumbnail_url(self):
+        return derivative_url(self.file.name, 'thumb')
+    
+    @property
+    def preview_url(self):
+        return derivative_url(self.file.name, 'preview')
+
+class Document(DocumentPreviewMixin, models.Model):
     """Model for candidate documents"""
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
-    file = models.FileField(upload_to='candidate_documents/')
+    file = models.FileField(storage=get_blob_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     verified = models.BooleanField(default=False)
     
     def __str__(self):
         return f"{self.name} - {self.candidate.full_name}"
 
-class MemberDocument(models.Model):
+class MemberDocument(DocumentPreviewMixin, models.Model):
     """Model for storing member documents"""
     DOCUMENT_TYPES = [
         ('ID', 'ID Card'),
@@ -211,7 +370,7 @@ class MemberDocument(models.Model):
     
     member = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES)
-    file = models.FileField(upload_to='member_documents/')
+    file = models.FileField(storage=get_blob_storage)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='uploaded_documents')
@@ -223,12 +382,111 @@ class MemberDocument(models.Model):
 
 class BulkUpload(models.Model):
     """Model for tracking bulk candidate uploads"""
-    file = models.FileField(upload_to='bulk_uploads/')
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('COMPLETED_WITH_ERRORS', 'Completed with errors'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    MODE_CHOICES = [
+        ('INSERT', 'Add new candidates only'),
+        ('UPSERT', 'Add new candidates and update changed ones'),
+    ]
+    
+    file = models.FileField(storage=get_blob_storage)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='INSERT')
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, default='PENDING')
+    status = models.CharField(max_length=25, choices=STATUS_CHOICES, default='PENDING')
     processed_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    unchanged_count = models.IntegerField(default=0)
     error_log = models.TextField(blank=True)
+    # Newest form Timestamp imported; an upsert skips rows up to the mark of the previous upsert
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    
+    # Job progress
+    total_rows = models.IntegerField(null=True, blank=True)
+    committed_rows = models.IntegerField(
+        default=0,
+        help_text="Spreadsheet rows already committed; a resumed job starts after them"
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
         return f"Bulk Upload by {self.uploaded_by} on {self.uploaded_at}"
+    
+    @property
+    def is_active(self):
+        return self.status in ('PENDING', 'RUNNING')
+    
+    @property
+    def progress_percent(self):
+        if not self.total_rows:
+            return 100 if self.status in ('COMPLETED', 'COMPLETED_WITH_ERRORS') else 0
+        return round(100 * self.committed_rows / self.total_rows)
+
+class Blob(models.Model):
+    """
+    A file stored once per content by members.storage.ContentAddressedStorage.
+    ref_count is maintained by the signal handlers in members.signals;
+    unreferenced blobs are removed by `manage.py gc_blobs`.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    # Last time this content was uploaded; gc_blobs leaves recent blobs alone
+    # so an upload whose model row is not saved yet keeps its file
+    stored_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+class ChunkedUpload(models.Model):
+    """
+    A file sent in numbered chunks (members.uploads), so large scans and
+    spreadsheets survive dropped connections. Once complete, file_name is the
+    stored blob, ready to be attached to a MemberDocument or BulkUpload.
+    """
+    STATUS_CHOICES = [
+        ('UPLOADING', 'Uploading'),
+        ('COMPLETE', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='UPLOADING')
+    file_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+    
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+    
+    def chunk_length(self, index):
+        """Expected length of chunk ``index``; only the last one may be shorter"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+class UploadChunk(models.Model):
+    """A verified chunk of a ChunkedUpload; a row per chunk lets chunks arrive in parallel"""
+    upload = models.ForeignKey(ChunkedUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    
+    class Meta:
+        unique_together = ['upload', 'index']
+    
+    def __str__(self):
+        return f"{self.upload_id} #{self.index}"
@@ -0,0 +1,181 @@
+import base64
+import json
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+# Tables estimated above this size get an approximate count instead of COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count estimate for an unfiltered queryset, or None when no
+    estimate is available (filtered querysets, unknown backends).
+
+    PostgreSQL reads the planner statistics; SQLite uses the highest primary
+    key, which is exact until rows get deleted.
+    """
+    if queryset.query.where:
+        return None
+    model = queryset.model
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) '
+                f'FROM {connection.ops.quote_name(model._meta.db_table)}'
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids COUNT(*) on very large, unfiltered tables"""
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+            self.count_is_estimated = True
+            return estimate
+        self.count_is_estimated = False
+        return super().count
+
+
+class KnownCountPaginator(Paginator):
+    """
+    Paginator told its row count, e.g. from a cached summary, instead of
+    running COUNT(*); pages stay lazy until their rows are iterated
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) pagination over ``queryset`` ordered by ``field_name``.
+
+    Each page is fetched with ``WHERE (field, id) > (last_field, last_id)``
+    instead of an OFFSET, so page 10,000 costs the same as page 1 when the
+    ordering is backed by an index. Rows are tie-broken on the primary key
+    unless the field is unique; NULLs sort last in both directions. Works
+    on ``values()`` querysets too.
+    """
+
+    def __init__(self, queryset, field_name, descending=False, per_page=10):
+        self.queryset = queryset
+        self.field = queryset.model._meta.get_field(field_name)
+        self.field_name = field_name
+        self.descending = descending
+        self.per_page = per_page
+        self.tie_break = not self.field.unique and not self.field.primary_key
+
+    def ordering(self, reverse=False):
+        descending = self.descending != reverse
+        field = F(self.field_name)
+        # Forward order puts NULLs last, the reversed order therefore puts them first
+        nulls = {}
+        if self.field.null:
+            nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        ordering = [field.desc(**nulls) if descending else field.asc(**nulls)]
+        if self.tie_break:
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def encode_cursor(self, obj, direction):
+        if isinstance(obj, dict):
+            # A values() row, which must include the field and the primary key
+            pk_name = self.queryset.model._meta.pk.attname
+            obj = self.queryset.model(**{self.field.attname: obj[self.field.attname], pk_name: obj[pk_name]})
+        value = getattr(obj, self.field.attname)
+        data = {'v': self.field.value_to_string(obj) if value is not None else None, 'pk': obj.pk, 'd': direction}
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            value = self.field.to_python(data['v']) if data['v'] is not None else None
+            return value, int(data['pk']), data['d']
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidPage('Invalid cursor') from e
+
+    def _after(self, value, pk, backwards):
+        """Rows after the cursor in the forward order (or before it, when ``backwards``)"""
+        ascending = self.descending == backwards
+        beyond = f"{self.field_name}__{'gt' if ascending else 'lt'}"
+        beyond_pk = 'pk__gt' if ascending else 'pk__lt'
+        is_null = Q(**{f"{self.field_name}__isnull": True})
+
+        if value is None:
+            # Cursor sits among the trailing NULLs
+            tie = is_null & Q(**{beyond_pk: pk}) if self.tie_break else Q(pk__in=[])
+            return ~is_null | tie if backwards else tie
+        condition = Q(**{beyond: value})
+        if self.tie_break:
+            # The redundant >= / <= bound lets the database seek the index
+            # instead of scanning it from the start
+            bound = f"{self.field_name}__{'gte' if ascending else 'lte'}"
+            condition = Q(**{bound: value}) & (condition | Q(**{self.field_name: value, beyond_pk: pk}))
+        if self.field.null and not backwards:
+            condition |= is_null
+        return condition
+
+    def page(self, cursor=None):
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            value, pk, direction = self.decode_cursor(cursor)
+            backwards = direction == 'previous'
+            queryset = queryset.filter(self._after(value, pk, backwards))
+
+        rows = list(queryset.order_by(*self.ordering(reverse=backwards))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], 'previous') if has_previous and rows else None,
+        )
@@ -0,0 +1,101 @@
+"""
+Candidate pipeline statistics for the senior member dashboard.
+
+Counts per stage, city and month of application come from one grouped
+aggregate over (current_stage, city, month). Months are bucketed with a CASE
+over their start dates rather than a Trunc function, which SQLite evaluates
+in Python row by row. The median time in the current stage comes from a
+second query ranking the candidates of each stage by stage_changed_at. The
+result is bounded whatever the number of candidates, and
+members.cache.get_pipeline_stats keeps it, so a dashboard render costs a
+cache lookup.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Case, Count, F, IntegerField, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Candidate
+
+# Stages a candidate passes through in order; REJECTED can follow any of them
+PIPELINE_STAGES = ['APPLIED', 'DOCUMENTS', 'INTERVIEW', 'LODGE_REVIEW', 'VOTING', 'ACCEPTED']
+TOP_CITIES = 10
+MONTHS = 24
+
+
+def month_starts(now, months=MONTHS):
+    """Start of the month of ``now`` and of the ``months - 1`` before it, newest first"""
+    start = timezone.localtime(now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    starts = []
+    for _ in range(months):
+        starts.append(start)
+        start = (start - timedelta(days=1)).replace(day=1)
+    return starts
+
+
+def median_stage_changes():
+    """Median ``stage_changed_at`` of each occupied stage, the lower middle of an even count"""
+    ranked = (
+        Candidate.objects.order_by()
+        .annotate(
+            position=Window(RowNumber(), partition_by=[F('current_stage')], order_by=F('stage_changed_at').desc()),
+            total=Window(Count('*'), partition_by=[F('current_stage')]),
+        )
+        .filter(position=(F('total') + 1) / 2)
+        .values_list('current_stage', 'stage_changed_at')
+    )
+    return dict(ranked)
+
+
+def compute_pipeline_stats():
+    now = timezone.now()
+    starts = month_starts(now)
+    # Applications before the first month fall into no bucket
+    month = Case(
+        *[When(application_date__gte=start, then=Value(i)) for i, start in enumerate(starts)],
+        output_field=IntegerField(),
+    )
+    by_stage = Counter()
+    by_city = Counter()
+    by_month = Counter()
+    grouped = (
+        Candidate.objects.order_by()
+        .values('current_stage', 'city', month=month)
+        .annotate(n=Count('id'))
+    )
+    for row in grouped:
+        by_stage[row['current_stage']] += row['n']
+        by_city[row['city']] += row['n']
+        if row['month'] is not None:
+            by_month[starts[row['month']]] += row['n']
+
+    medians = median_stage_changes()
+
+    total = sum(by_stage.values())
+    funnel = []
+    for code, label in Candidate.STAGE_CHOICES:
+        # Candidates at this stage or past it; rejected ones are not known to have reached it
+        reached = (
+            sum(by_stage[stage] for stage in PIPELINE_STAGES[PIPELINE_STAGES.index(code):])
+            if code in PIPELINE_STAGES else by_stage[code]
+        )
+        median_days = None
+        if code in medians:
+            median_days = max((now - medians[code]).days, 0)
+        funnel.append({
+            'stage': code,
+            'label': label,
+            'count': by_stage[code],
+            'reached': reached,
+            'percent': round(100 * reached / total) if total else 0,
+            'median_days': median_days,
+        })
+    return {
+        'total': total,
+        'funnel': funnel,
+        'cities': by_city.most_common(TOP_CITIES),
+        'months': [(start, by_month[start]) for start in reversed(starts) if by_month[start]],
+        'computed_at': now,
+    }
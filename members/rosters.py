@@ -0,0 +1,119 @@
+"""
+Lodge rosters.
+
+The members of a lodge are the users in Lodge.members and those whose
+primary_lodge it is; a user may be both. compute_lodge_summary covers
+everything on the lodge page except the member list, in three queries
+whatever the size of the lodge: counts per position (one grouped
+aggregate), the officers, and the candidates the lodge has voted on that
+are still open (one aggregate over the lodge's votes). That last one reads
+every vote of the lodge, tens of milliseconds for 40,000 of them, so
+members.cache.get_lodge_summary keeps the summary until the lodge's
+version moves.
+
+The member list is paginated. A page is two queries: the members, with
+their primary lodge joined, and their lodges, prefetched.
+"""
+from django.db.models import Case, Count, IntegerField, Max, Prefetch, Q, Value, When
+from django.utils import timezone
+
+from .models import Candidate, Lodge, User
+
+ROSTER_PAGE_SIZE = 50
+# Candidates listed as under review, most recently voted on first
+REVIEW_LIMIT = 20
+CLOSED_STAGES = ['ACCEPTED', 'REJECTED']
+
+POSITION_LABELS = dict(User.POSITION_CHOICES)
+# Every position but Regular Member, as User.is_leadership
+OFFICER_POSITIONS = [code for code, _ in User.POSITION_CHOICES if code != 'Antare']
+
+
+def position_rank():
+    """Order of User.POSITION_CHOICES, Grand Master first; unknown positions last"""
+    return Case(
+        *[When(position=code, then=Value(i)) for i, (code, _) in enumerate(User.POSITION_CHOICES)],
+        default=Value(len(User.POSITION_CHOICES)),
+        output_field=IntegerField(),
+    )
+
+
+def lodge_members(lodge_id):
+    members = Lodge.members.through.objects.filter(lodge=lodge_id).values('user_id')
+    return User.objects.filter(Q(primary_lodge=lodge_id) | Q(pk__in=members))
+
+
+def roster_members(lodge_id):
+    """Members of the lodge by rank and name, with ``primary_lodge`` and ``lodges`` loaded"""
+    return (
+        lodge_members(lodge_id)
+        .select_related('primary_lodge')
+        .prefetch_related(Prefetch('lodges', queryset=Lodge.objects.order_by('name').only('id', 'name')))
+        .annotate(rank=position_rank())
+        .order_by('rank', 'last_name', 'first_name', 'id')
+    )
+
+
+def compute_lodge_summary(lodge_id):
+    members = lodge_members(lodge_id)
+    year_start = timezone.localtime().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    counts = (
+        members.order_by()
+        .values('position')
+        .annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            new=Count('id', filter=Q(date_joined__gte=year_start)),
+        )
+    )
+    by_position = {row['position']: row for row in counts}
+    # Positions in rank order, then any stored value that is not a choice
+    codes = [code for code in POSITION_LABELS if code in by_position]
+    codes += sorted(set(by_position) - set(POSITION_LABELS))
+    positions = [
+        {'position': code, 'label': POSITION_LABELS.get(code, code), 'count': by_position[code]['total']}
+        for code in codes
+    ]
+
+    officers = [
+        {
+            'id': officer['id'],
+            'name': f"{officer['first_name']} {officer['last_name']}".strip() or officer['username'],
+            'position': officer['position'],
+            'label': POSITION_LABELS[officer['position']],
+        }
+        for officer in (
+            members.filter(position__in=OFFICER_POSITIONS)
+            .annotate(rank=position_rank())
+            .order_by('rank', 'last_name', 'first_name', 'id')
+            .values('id', 'username', 'first_name', 'last_name', 'position')
+        )
+    ]
+
+    stage_labels = dict(Candidate.STAGE_CHOICES)
+    under_review = list(
+        Candidate.objects.filter(vote__lodge=lodge_id)
+        .exclude(current_stage__in=CLOSED_STAGES)
+        .annotate(
+            votes=Count('vote'),
+            approvals=Count('vote', filter=Q(vote__vote='APPROVE')),
+            rejections=Count('vote', filter=Q(vote__vote='REJECT')),
+            last_vote=Max('vote__timestamp'),
+        )
+        .order_by('-last_vote', '-id')
+        .values('id', 'full_name', 'current_stage', 'votes', 'approvals', 'rejections', 'last_vote')[:REVIEW_LIMIT + 1]
+    )
+    for candidate in under_review:
+        candidate['stage_label'] = stage_labels[candidate['current_stage']]
+
+    return {
+        'member_count': sum(row['total'] for row in by_position.values()),
+        'active_count': sum(row['active'] for row in by_position.values()),
+        'new_count': sum(row['new'] for row in by_position.values()),
+        'year': year_start.year,
+        'positions': positions,
+        'officers': officers,
+        'under_review': under_review[:REVIEW_LIMIT],
+        'more_under_review': len(under_review) > REVIEW_LIMIT,
+        'computed_at': timezone.now(),
+    }
@@ -0,0 +1,247 @@
+"""
+Full-text search over candidates and members.
+
+Every indexed model has a shadow table holding one accent-folded document per
+row, keyed by the row's primary key:
+
+* SQLite: an FTS5 virtual table (``rowid`` = primary key)
+* PostgreSQL: a table with a ``tsvector`` column behind a GIN index
+
+Documents are folded and tokenized in Python (``Çeku`` -> ``ceku``,
+``arben.krasniqi@gmail.com`` -> ``arben krasniqi gmail com``) so both backends
+see the same words, and every query word is matched as a prefix. Tables are
+kept in sync by the save/delete signal handlers and the bulk importer;
+``rebuild_search_index`` repopulates them.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Candidate, User
+
+WORD_RE = re.compile(r'\w+')
+
+# Shortest query the typeahead answers; single letters match too many rows to be useful
+MIN_QUERY_LENGTH = 2
+
+
+def fold(text):
+    """Lowercase ``text`` and strip diacritics: 'Dërmaku Çeku' -> 'dermaku ceku'"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return WORD_RE.findall(fold(text))
+
+
+class SQLiteBackend:
+    def create_table(self, cursor, index):
+        # The prefix option keeps 2 and 3 letter typeahead queries off a term scan
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.table} "
+            f"USING fts5(body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+
+    def drop_table(self, cursor, index):
+        cursor.execute(f"DROP TABLE IF EXISTS {index.table}")
+
+    def upsert(self, cursor, index, documents):
+        cursor.executemany(f"DELETE FROM {index.table} WHERE rowid = %s", [(pk,) for pk, _ in documents])
+        cursor.executemany(f"INSERT INTO {index.table} (rowid, body) VALUES (%s, %s)", documents)
+
+    def delete(self, cursor, index, pks):
+        cursor.executemany(f"DELETE FROM {index.table} WHERE rowid = %s", [(pk,) for pk in pks])
+
+    def match_sql(self, index, words):
+        expression = ' '.join(f'"{word}"*' for word in words)
+        return f"SELECT rowid FROM {index.table} WHERE {index.table} MATCH %s", [expression]
+
+    def in_sql(self, column, match_sql, ordered_scan):
+        # A unary + keeps SQLite from driving the query from the match list, so it
+        # walks the ordering index instead and probes each row against the matches
+        return f"{'+' if ordered_scan else ''}{column} IN ({match_sql})"
+
+    def top_sql(self, index, words, limit):
+        sql, params = self.match_sql(index, words)
+        # FTS5 walks its rowids in descending order, so this stops after ``limit`` hits
+        return f"{sql} ORDER BY rowid DESC LIMIT %s", params + [limit]
+
+
+class PostgresBackend:
+    def create_table(self, cursor, index):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {index.table} "
+            f"(id bigint PRIMARY KEY, body text NOT NULL, vector tsvector NOT NULL)"
+        )
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index.table}_vector ON {index.table} USING gin (vector)")
+
+    def drop_table(self, cursor, index):
+        cursor.execute(f"DROP TABLE IF EXISTS {index.table}")
+
+    def upsert(self, cursor, index, documents):
+        cursor.executemany(
+            f"INSERT INTO {index.table} (id, body, vector) VALUES (%s, %s, to_tsvector('simple', %s)) "
+            f"ON CONFLICT (id) DO UPDATE SET body = EXCLUDED.body, vector = EXCLUDED.vector",
+            [(pk, body, body) for pk, body in documents],
+        )
+
+    def delete(self, cursor, index, pks):
+        cursor.execute(f"DELETE FROM {index.table} WHERE id = ANY(%s)", [list(pks)])
+
+    def match_sql(self, index, words):
+        expression = ' & '.join(f"{word}:*" for word in words)
+        return f"SELECT id FROM {index.table} WHERE vector @@ to_tsquery('simple', %s)", [expression]
+
+    def in_sql(self, column, match_sql, ordered_scan):
+        # The planner has GIN statistics and picks the join order itself
+        return f"{column} IN ({match_sql})"
+
+    def top_sql(self, index, words, limit):
+        sql, params = self.match_sql(index, words)
+        return f"{sql} ORDER BY id DESC LIMIT %s", params + [limit]
+
+
+BACKENDS = {'sqlite': SQLiteBackend(), 'postgresql': PostgresBackend()}
+
+
+def get_backend():
+    """Search backend for the default database, or None when it has no full-text support"""
+    return BACKENDS.get(connection.vendor)
+
+
+class SearchIndex:
+    """Full-text index over ``fields`` of ``model``; ``digit_fields`` are also indexed without separators"""
+
+    def __init__(self, model, table, fields, digit_fields=()):
+        self.model = model
+        self.table = table
+        self.fields = fields
+        self.digit_fields = digit_fields
+
+    def document(self, obj):
+        words = []
+        for field in self.fields:
+            words.extend(tokenize(getattr(obj, field) or ''))
+        for field in self.digit_fields:
+            digits = re.sub(r'\D', '', getattr(obj, field) or '')
+            if digits:
+                words.append(digits)
+        return ' '.join(words)
+
+    def update(self, objects):
+        backend = get_backend()
+        documents = [(obj.pk, self.document(obj)) for obj in objects if obj.pk is not None]
+        if backend is None or not documents:
+            return
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, self, documents)
+
+    def remove(self, pks):
+        backend = get_backend()
+        if backend is None or not pks:
+            return
+        with connection.cursor() as cursor:
+            backend.delete(cursor, self, pks)
+
+    def rebuild(self, queryset=None, batch_size=5000):
+        """
+        Recreate the table from ``queryset`` (all rows of the model by default);
+        returns the number of indexed rows.
+        """
+        backend = get_backend()
+        if backend is None:
+            return 0
+        with connection.cursor() as cursor:
+            backend.drop_table(cursor, self)
+            backend.create_table(cursor, self)
+        count = 0
+        batch = []
+        if queryset is None:
+            queryset = self.model.objects.all()
+        for obj in queryset.order_by('pk').only('pk', *self.fields, *self.digit_fields).iterator(batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                self.update(batch)
+                count += len(batch)
+                batch = []
+        self.update(batch)
+        return count + len(batch)
+
+    def filter(self, queryset, query, ordered_scan=False):
+        """
+        Restrict ``queryset`` to rows matching every word of ``query``.
+
+        With ``ordered_scan`` the database walks the queryset's ordering and
+        probes the matches instead of sorting every match; see ``prefer_ordered_scan``.
+        """
+        words = tokenize(query)
+        if not words:
+            return queryset
+        backend = get_backend()
+        if backend is None:
+            condition = Q()
+            for word in words:
+                condition &= Q(*[Q(**{f"{field}__icontains": word}) for field in self.fields], _connector=Q.OR)
+            return queryset.filter(condition)
+        sql, params = backend.match_sql(self, words)
+        if not ordered_scan:
+            return queryset.filter(pk__in=RawSQL(sql, params))
+        quote = connection.ops.quote_name
+        column = f"{quote(self.model._meta.db_table)}.{quote(self.model._meta.pk.column)}"
+        return queryset.filter(RawSQL(backend.in_sql(column, sql, ordered_scan), params, output_field=BooleanField()))
+
+    def count(self, query):
+        """Number of rows matching ``query``, counted on the search table alone"""
+        words = tokenize(query)
+        backend = get_backend()
+        if backend is None or not words:
+            return self.filter(self.model.objects.all(), query).count()
+        sql, params = backend.match_sql(self, words)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({sql}) matches", params)
+            return cursor.fetchone()[0]
+
+    def top(self, query, limit=10):
+        """Up to ``limit`` matching objects for a typeahead, newest rows first"""
+        words = tokenize(query)
+        if len(''.join(words)) < MIN_QUERY_LENGTH:
+            return []
+        backend = get_backend()
+        if backend is None:
+            return list(self.filter(self.model.objects.order_by('-pk'), query)[:limit])
+        sql, params = backend.top_sql(self, words, limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            pks = [row[0] for row in cursor.fetchall()]
+        objects = self.model.objects.in_bulk(pks)
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+def prefer_ordered_scan(matches, total, page_size):
+    """
+    Whether a page of ``page_size`` out of ``matches`` rows (of ``total``) is
+    cheaper to find by walking the ordering index than by sorting the matches.
+
+    The walk visits about ``page_size * total / matches`` rows, sorting visits
+    all ``matches``; broad queries such as a city name favour the walk.
+    """
+    return matches * matches > page_size * total
+
+
+candidate_index = SearchIndex(
+    Candidate, 'members_candidate_search', ['full_name', 'email', 'phone_number', 'city'],
+    digit_fields=['phone_number'],
+)
+user_index = SearchIndex(
+    User, 'members_user_search', ['username', 'first_name', 'last_name', 'email', 'phone_number'],
+    digit_fields=['phone_number'],
+)
+SEARCH_INDEXES = [candidate_index, user_index]
+
+
+def index_for(model):
+    return next((index for index in SEARCH_INDEXES if index.model is model), None)
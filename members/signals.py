@@ -0,0 +1,311 @@
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_version, invalidate_lodge_directory, invalidate_pipeline_stats
+from .models import (
+    Blob, BulkUpload, Candidate, Document, Lodge, LodgeEvent, MemberDocument, StageTransition, User, Vote, VoteTally,
+)
+from .search import index_for
+from .thumbnails import enqueue_derivatives
+
+
+def adjust_vote_tally(candidate_id, stage, vote_level, vote, delta):
+    """Add ``delta`` to the counter of ``vote`` with a single UPDATE ... SET x = x + delta"""
+    field = VoteTally.COUNTER_FIELDS.get(vote)
+    if field is None:
+        return
+    tally = VoteTally.objects.filter(candidate_id=candidate_id, stage=stage, vote_level=vote_level)
+    if tally.update(**{field: F(field) + delta}) or delta < 0:
+        return
+    VoteTally.objects.get_or_create(candidate_id=candidate_id, stage=stage, vote_level=vote_level)
+    tally.update(**{field: F(field) + delta})
+
+
+def _tally_key(vote):
+    return (vote.candidate_id, vote.stage, vote.vote_level, vote.vote)
+
+
+@receiver(pre_save, sender=Vote)
+def remember_previous_vote(sender, instance, raw, **kwargs):
+    instance._previous_tally_key = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    previous = (
+        Vote.objects.filter(pk=instance.pk)
+        .values_list('candidate_id', 'stage', 'vote_level', 'vote')
+        .first()
+    )
+    instance._previous_tally_key = previous
+
+
+@receiver(post_save, sender=Vote)
+def update_vote_tally_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_tally_key', None)
+    current = _tally_key(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        adjust_vote_tally(*previous, delta=-1)
+    adjust_vote_tally(*current, delta=1)
+
+
+@receiver(post_delete, sender=Vote)
+def update_vote_tally_on_delete(sender, instance, **kwargs):
+    adjust_vote_tally(*_tally_key(instance), delta=-1)
+
+
+def touch_candidate(candidate_id):
+    """Move ``last_updated``, the validator of the candidate's API responses, when its documents or votes change"""
+    Candidate.objects.filter(pk=candidate_id).update(last_updated=timezone.now())
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def touch_candidate_on_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    touch_candidate(instance.candidate_id)
+    previous = getattr(instance, '_previous_tally_key', None)
+    if previous is not None and previous[0] != instance.candidate_id:
+        touch_candidate(previous[0])
+
+
+@receiver(post_save, sender=Lodge)
+@receiver(post_delete, sender=Lodge)
+def invalidate_lodge_caches(sender, **kwargs):
+    invalidate_lodge_directory()
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def bump_candidate_fragments(sender, instance, raw=False, **kwargs):
+    """Invalidate the cached fragments of the candidate page (and, for votes, the lodge page)"""
+    if raw:
+        return
+    candidate_id = instance.pk if sender is Candidate else instance.candidate_id
+    bump_version(f"candidate:{candidate_id}")
+    if sender is Candidate and getattr(instance, '_previous_stage', None):
+        # Lodge rosters list the stage of the candidates their lodge voted on
+        for lodge_id in Vote.objects.filter(candidate=candidate_id).values_list('lodge', flat=True).distinct():
+            bump_version(f"lodge:{lodge_id}")
+    if sender is Vote:
+        bump_version(f"lodge:{instance.lodge_id}")
+        previous = getattr(instance, '_previous_tally_key', None)
+        if previous is not None and previous[0] != candidate_id:
+            bump_version(f"candidate:{previous[0]}")
+
+
+@receiver(post_save, sender=Lodge)
+@receiver(post_delete, sender=Lodge)
+def bump_lodge_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(f"lodge:{instance.pk}")
+        bump_version(f"calendar:{instance.pk}")
+
+
+@receiver(post_save, sender=LodgeEvent)
+@receiver(post_delete, sender=LodgeEvent)
+def bump_lodge_calendar(sender, instance, raw=False, **kwargs):
+    """Invalidate the cached .ics file and the last/next meeting on the lodge page"""
+    if not raw:
+        bump_version(f"calendar:{instance.lodge_id}")
+        bump_version(f"lodge:{instance.lodge_id}")
+
+
+@receiver(post_save, sender=Candidate)
+def move_interview_events(sender, instance, raw, created, update_fields, **kwargs):
+    """
+    Keep the candidate's interview events at its interview_date, with their
+    length, and remove them when the interview is called off. Candidates
+    belong to no lodge, so the events themselves are added per lodge.
+    """
+    if raw or created or (update_fields is not None and 'interview_date' not in update_fields):
+        return
+    interviews = LodgeEvent.objects.filter(candidate=instance.pk, kind='INTERVIEW')
+    if instance.interview_date is None:
+        interviews.delete()
+        return
+    events = interviews.exclude(start=instance.interview_date)
+    for event in events:
+        if event.end is not None:
+            event.end += instance.interview_date - event.start
+        event.start = instance.interview_date
+        event.save(update_fields=['start', 'end', 'last_updated'])
+
+
+def member_lodge_ids(user_id):
+    """Lodges whose roster lists the user: those they belong to and their primary lodge"""
+    return set(
+        Lodge.objects.filter(Q(members=user_id) | Q(primary_members=user_id)).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=MemberDocument)
+@receiver(post_delete, sender=MemberDocument)
+def bump_member_lodge_fragments(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for lodge_id in member_lodge_ids(instance.member_id):
+        bump_version(f"lodge:{lodge_id}")
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_primary_lodge(sender, instance, raw, update_fields, **kwargs):
+    instance._previous_primary_lodge_id = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'primary_lodge' not in update_fields:
+        return
+    previous = User.objects.filter(pk=instance.pk).values_list('primary_lodge', flat=True).first()
+    instance._previous_primary_lodge_id = previous
+
+
+@receiver(pre_delete, sender=User)
+def remember_member_lodges(sender, instance, **kwargs):
+    # Memberships are deleted before post_delete runs
+    instance._member_lodge_ids = member_lodge_ids(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_roster_fragments(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    """Invalidate the rosters listing the user; logins, which only save last_login, leave them alone"""
+    if raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    if created:
+        # Lodge.members additions are handled by the m2m_changed receiver
+        lodge_ids = {instance.primary_lodge_id}
+    else:
+        lodge_ids = getattr(instance, '_member_lodge_ids', None)
+        if lodge_ids is None:
+            lodge_ids = member_lodge_ids(instance.pk)
+    lodge_ids.add(getattr(instance, '_previous_primary_lodge_id', None))
+    for lodge_id in lodge_ids - {None}:
+        bump_version(f"lodge:{lodge_id}")
+
+
+@receiver(m2m_changed, sender=Lodge.members.through)
+def bump_lodge_fragments_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Lodge.members changes from either side: lodge.members.add(...) or user.lodges.add(...)"""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            bump_version(f"lodge:{instance.pk}")
+    elif action == 'pre_clear':
+        # The lodges a clear() affects are gone by post_clear
+        instance._cleared_lodge_ids = list(instance.lodges.values_list('id', flat=True))
+    else:
+        lodge_ids = instance.__dict__.pop('_cleared_lodge_ids', []) if action == 'post_clear' else pk_set
+        for lodge_id in lodge_ids:
+            bump_version(f"lodge:{lodge_id}")
+
+
+@receiver(pre_save, sender=Candidate)
+def track_stage_change(sender, instance, raw, update_fields, **kwargs):
+    instance._stage_changed = False
+    instance._previous_stage = None
+    if raw or (update_fields is not None and 'current_stage' not in update_fields):
+        return
+    if instance._state.adding or instance.pk is None:
+        instance._stage_changed = True
+        return
+    previous = Candidate.objects.filter(pk=instance.pk).values_list('current_stage', 'stage_changed_at').first()
+    if previous is not None and previous[0] != instance.current_stage:
+        instance._previous_stage = previous
+        instance.stage_changed_at = timezone.now()
+        instance._stage_changed = True
+
+
+@receiver(post_save, sender=Candidate)
+def record_stage_transition(sender, instance, **kwargs):
+    """Append to the stage log; Candidate.save runs this in the transaction of the change"""
+    if not getattr(instance, '_stage_changed', False):
+        return
+    from_stage, entered_at = instance._previous_stage or ('', None)
+    StageTransition.objects.create(
+        candidate=instance, from_stage=from_stage, to_stage=instance.current_stage,
+        changed_at=instance.stage_changed_at,
+        duration=instance.stage_changed_at - entered_at if entered_at else None,
+        changed_by=getattr(instance, '_changed_by', None),
+    )
+    invalidate_pipeline_stats()
+
+
+@receiver(post_delete, sender=Candidate)
+def invalidate_pipeline_on_delete(sender, **kwargs):
+    invalidate_pipeline_stats()
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_save, sender=User)
+def update_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Reindex the saved row unless the save left the indexed fields alone; fixtures need rebuild_search_index"""
+    index = index_for(sender)
+    if raw or (update_fields is not None and not set(update_fields) & {*index.fields, *index.digit_fields}):
+        return
+    index.update([instance])
+
+
+@receiver(post_delete, sender=Candidate)
+@receiver(post_delete, sender=User)
+def remove_from_search_index(sender, instance, **kwargs):
+    index_for(sender).remove([instance.pk])
+
+
+def adjust_blob_refs(name, delta):
+    """Add ``delta`` to the reference count of blob ``name``; files stored before blobs existed have no row"""
+    if name:
+        Blob.objects.filter(name=name).update(ref_count=F('ref_count') + delta)
+
+
+@receiver(pre_save, sender=Document)
+@receiver(pre_save, sender=MemberDocument)
+@receiver(pre_save, sender=BulkUpload)
+def remember_previous_file(sender, instance, raw, update_fields, **kwargs):
+    instance._previous_file_name = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'file' not in update_fields:
+        # Progress saves of running bulk uploads leave the file alone
+        instance._previous_file_name = instance.file.name
+        return
+    instance._previous_file_name = sender.objects.filter(pk=instance.pk).values_list('file', flat=True).first()
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=MemberDocument)
+@receiver(post_save, sender=BulkUpload)
+def update_blob_refs_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_file_name', None)
+    current = instance.file.name
+    if previous == current:
+        return
+    adjust_blob_refs(previous, -1)
+    adjust_blob_refs(current, 1)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=MemberDocument)
+def create_document_derivatives(sender, instance, raw, **kwargs):
+    if not raw and getattr(instance, '_previous_file_name', None) != instance.file.name:
+        enqueue_derivatives(instance.file.name)
+
+
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=MemberDocument)
+@receiver(post_delete, sender=BulkUpload)
+def update_blob_refs_on_delete(sender, instance, **kwargs):
+    adjust_blob_refs(instance.file.name, -1)
@@ -0,0 +1,212 @@
+"""
+Content-addressed file storage shared by every uploaded file.
+
+Uploads are hashed (SHA-256) while they stream to a temporary file and then
+stored once under a sharded name derived from the digest::
+
+    blobs/3f/a2/3fa2...c9.pdf
+
+so the same ID card or spreadsheet uploaded twice, or attached to both a
+member and a candidate, occupies the disk once. Every stored file has a
+``Blob`` row whose ``ref_count`` is kept up to date by the signal handlers of
+the models in ``BLOB_FIELDS``; ``manage.py gc_blobs`` removes blobs nothing
+refers to any more.
+
+Files are served by ``FileDownloadView``: behind Apache or nginx it only
+checks access and hands the transfer to the web server with ``X-Sendfile`` or
+``X-Accel-Redirect`` (see ``FILE_DOWNLOAD_SERVER``).
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+BLOB_DIR = 'blobs'
+TEMP_DIR = os.path.join(BLOB_DIR, 'tmp')
+CHUNK_SIZE = 256 * 1024
+# Longer "extensions" are most likely not extensions at all
+MAX_EXTENSION_LENGTH = 10
+
+# (model, field) of every file stored here
+BLOB_FIELDS = [
+    ('members.Document', 'file'),
+    ('members.MemberDocument', 'file'),
+    ('members.BulkUpload', 'file'),
+]
+
+
+def blob_name(digest, extension=''):
+    """Sharded name of the blob with SHA-256 ``digest``: blobs/ab/cd/abcd...ext"""
+    return '/'.join([BLOB_DIR, digest[:2], digest[2:4], digest + extension])
+
+
+def blob_digest(name):
+    """SHA-256 of the content of blob ``name``"""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def file_extension(name):
+    extension = os.path.splitext(name)[1].lower()
+    return extension if len(extension) <= MAX_EXTENSION_LENGTH else ''
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    ``FileSystemStorage`` that names files by their content.
+
+    The extension of the uploaded name is kept so downloads get the right
+    content type. Names written before this storage existed (such as
+    ``member_documents/id.pdf``) are still read and served as they are.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The name is chosen by _save from the content, so there is nothing to avoid
+        return name
+
+    def _save(self, name, content):
+        if hasattr(content, 'temporary_file_path'):
+            # Large form uploads are already on disk: hash them there and move them in
+            return self.store_file(content.temporary_file_path(), name)
+        fd, temp_path = self.temp_file()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return self._store(temp_path, name, digest.hexdigest(), size)
+
+    def temp_file(self):
+        """``(fd, path)`` of a new temporary file on the same file system as the blobs"""
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        return tempfile.mkstemp(dir=temp_dir)
+
+    def store_file(self, path, name):
+        """
+        Hash the file at ``path`` and move it into the store as an upload named
+        ``name``; returns the blob name. Files under TEMP_DIR are renamed, not copied.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+        return self._store(path, name, digest.hexdigest(), size)
+
+    def _store(self, path, name, digest, size):
+        from .models import Blob
+
+        name = blob_name(digest, file_extension(name))
+        target = self.path(name)
+        try:
+            if os.path.exists(target):
+                os.unlink(path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # A rename, so a concurrent upload of the same content just replaces it with itself
+                file_move_safe(path, target, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(target, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(path):
+                os.unlink(path)
+            raise
+
+        # Created unreferenced; the owning model's post_save signal counts the reference
+        Blob.objects.update_or_create(
+            name=name, defaults={'stored_at': timezone.now()},
+            create_defaults={'sha256': digest, 'size': size},
+        )
+        return name
+
+    def delete(self, name):
+        """Delete ``name`` unless a model still refers to it"""
+        from .models import Blob
+
+        if Blob.objects.filter(name=name, ref_count__gt=0).exists():
+            return
+        super().delete(name)
+
+    def url(self, name):
+        return reverse('file_download', kwargs={'name': name})
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    # A callable keeps the storage out of migrations
+    return blob_storage
+
+
+def blob_models():
+    """``[(model, field_name)]`` of ``BLOB_FIELDS``"""
+    return [(apps.get_model(label), field) for label, field in BLOB_FIELDS]
+
+
+def is_referenced(name):
+    """Whether any model in ``BLOB_FIELDS`` refers to the file ``name``"""
+    return any(model.objects.filter(**{field: name}).exists() for model, field in blob_models())
+
+
+def count_references():
+    """``{name: references}`` over every model in ``BLOB_FIELDS``"""
+    counts = {}
+    for model, field in blob_models():
+        rows = model.objects.exclude(**{field: ''}).values(field).annotate(n=Count('pk')).values_list(field, 'n')
+        for name, n in rows:
+            counts[name] = counts.get(name, 0) + n
+    return counts
+
+
+def file_response(name, as_attachment=False):
+    """
+    Response delivering the stored file ``name``, according to ``FILE_DOWNLOAD_SERVER``:
+
+    * ``django``: stream it from Django (development, or no web server in front)
+    * ``x-sendfile``: Apache mod_xsendfile or lighttpd send the file at the given path
+    * ``x-accel-redirect``: nginx serves ``FILE_DOWNLOAD_INTERNAL_URL`` + name from an
+      ``internal`` location aliased to MEDIA_ROOT
+
+    Blobs never change, so browsers may cache them for good.
+    """
+    server = getattr(settings, 'FILE_DOWNLOAD_SERVER', 'django')
+    path = blob_storage.path(name)
+    filename = os.path.basename(name)
+    if server == 'django':
+        response = FileResponse(open(path, 'rb'), as_attachment=as_attachment, filename=filename)
+    else:
+        content_type, encoding = mimetypes.guess_type(filename)
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        if server == 'x-sendfile':
+            response.headers['X-Sendfile'] = path
+        elif server == 'x-accel-redirect':
+            internal_url = getattr(settings, 'FILE_DOWNLOAD_INTERNAL_URL', '/protected-media/')
+            response.headers['X-Accel-Redirect'] = internal_url + quote(name)
+        else:
+            raise ValueError(f"Unknown FILE_DOWNLOAD_SERVER {server!r}")
+    if name.startswith(BLOB_DIR + '/'):
+        response.headers['ETag'] = f'"{blob_digest(name)}"'
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
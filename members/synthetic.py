@@ -0,0 +1,227 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+Candidates, their stage transitions, votes and documents are written with executemany on a raw
+cursor rather than through the ORM so that hundreds of thousands of rows can
+be generated in seconds. Raw inserts bypass the signal handlers, so callers
+rebuild the vote tallies and the search index afterwards (see the
+``generate_data`` command).
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.utils import timezone
+
+from .models import Candidate, Document, Lodge, StageTransition, User, Vote
+from .pipeline import PIPELINE_STAGES
+
+FIRST_NAMES = [
+    'Arben', 'Besnik', 'Dardan', 'Driton', 'Fatos', 'Gent', 'Ilir', 'Kushtrim', 'Labinot', 'Valon',
+    'Albana', 'Besa', 'Drita', 'Fjolla', 'Jeta', 'Lirije', 'Mimoza', 'Njomza', 'Teuta', 'Vjosa',
+]
+LAST_NAMES = [
+    'Berisha', 'Krasniqi', 'Gashi', 'Hoxha', 'Morina', 'Shala', 'Kelmendi', 'Hasani', 'Rexhepi', 'Bytyqi',
+    'Çeku', 'Dërmaku', 'Selimi', 'Zeqiri', 'Thaçi',
+]
+CITIES = [
+    'Prishtinë', 'Prizren', 'Pejë', 'Gjakovë', 'Ferizaj', 'Gjilan', 'Mitrovicë', 'Vushtrri', 'Podujevë', 'Suharekë',
+]
+# Most historical candidates have already been decided
+STAGE_WEIGHTS = {
+    'APPLIED': 20, 'DOCUMENTS': 8, 'INTERVIEW': 6, 'LODGE_REVIEW': 4, 'VOTING': 3, 'ACCEPTED': 39, 'REJECTED': 20,
+}
+
+LODGE_NAMES = ['Iliria', 'Dardania', 'Arbëria', 'Skënderbeu', 'Ulpiana', 'Teuta', 'Gjergj Fishta', 'Rilindja']
+# Grand Lodge officers exist once, every lodge has its own officers and the rest are regular members
+GRAND_OFFICERS = ['FNMM', 'ZFNMM', 'FMB1', 'FNMB2', 'FNS', 'FNT', 'FNO']
+LODGE_OFFICERS = ['MN', 'MB1', 'MB2', 'SE', 'TR', 'OR']
+DIGNITARIES = ['FNMM', 'ZFNMM', 'FNS']
+DOCUMENT_NAMES = ['Letër motivimi', 'Certifikata e gjendjes penale', 'Diploma', 'Letërnjoftimi']
+
+CANDIDATE_COLUMNS = [
+    'timestamp', 'email', 'full_name', 'phone_number', 'address', 'city', 'is_kosovo_citizen',
+    'social_profile_url', 'social_profile_url2', 'current_stage', 'application_date', 'last_updated',
+    'interview_date', 'interview_passed', 'stage_changed_at', 'import_fingerprint',
+]
+DOCUMENT_COLUMNS = ['candidate_id', 'name', 'file', 'uploaded_at', 'verified']
+TRANSITION_COLUMNS = ['candidate_id', 'from_stage', 'to_stage', 'changed_at', 'duration']
+VOTE_COLUMNS = ['candidate_id', 'voter_id', 'lodge_id', 'vote', 'vote_level', 'stage', 'timestamp', 'comments']
+
+
+def _insert_many(table, columns, rows, batch_size):
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(table), ', '.join(quote(column) for column in columns), ', '.join(['%s'] * len(columns))
+    )
+    inserted = 0
+    with connection.cursor() as cursor:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+    return inserted
+
+
+def candidate_rows(count, rng, start=0, days=5 * 365, email_prefix='applicant'):
+    now = timezone.now()
+    stages = list(STAGE_WEIGHTS)
+    weights = list(STAGE_WEIGHTS.values())
+    for i in range(start, start + count):
+        stage = rng.choices(stages, weights)[0]
+        applied = now - timedelta(days=rng.uniform(0, days))
+        interviewed = stage in ('INTERVIEW', 'LODGE_REVIEW', 'VOTING', 'ACCEPTED', 'REJECTED')
+        changed = min(applied + timedelta(days=rng.uniform(0, 60)), now)
+        yield (
+            applied, f"{email_prefix}{i}@example.com", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            f"04{rng.randrange(10 ** 7):07d}", f"Rruga {rng.randrange(1, 400)}", rng.choice(CITIES),
+            rng.random() < 0.9, '', '', stage, applied, changed,
+            applied + timedelta(days=rng.uniform(7, 60)) if interviewed else None,
+            (stage != 'REJECTED') if interviewed and stage != 'INTERVIEW' else None,
+            changed, '',
+        )
+
+
+def insert_candidates(count, seed=0, start=0, batch_size=5000, email_prefix='applicant'):
+    """Insert ``count`` synthetic candidates; emails are ``<email_prefix><n>@example.com`` from ``n = start``"""
+    rng = random.Random(seed)
+    return _insert_many(
+        Candidate._meta.db_table, CANDIDATE_COLUMNS,
+        candidate_rows(count, rng, start, email_prefix=email_prefix), batch_size,
+    )
+
+
+def transition_rows(candidates, rng):
+    """
+    The stages each candidate went through to reach its current one, entered
+    at its application date and left at random times up to ``stage_changed_at``
+    """
+    duration = StageTransition._meta.get_field('duration')
+    for candidate_id, stage, applied, changed in candidates:
+        if stage in PIPELINE_STAGES:
+            path = PIPELINE_STAGES[:PIPELINE_STAGES.index(stage) + 1]
+        else:
+            path = PIPELINE_STAGES[:rng.randint(1, len(PIPELINE_STAGES) - 1)] + [stage]
+        span = (changed - applied).total_seconds()
+        times = [applied] + sorted(
+            applied + timedelta(seconds=rng.uniform(0, span)) for _ in range(len(path) - 2)
+        ) + ([changed] if len(path) > 1 else [])
+        from_stage, entered_from_stage = '', None
+        for to_stage, entered in zip(path, times):
+            spent = duration.get_db_prep_value(entered - entered_from_stage, connection) if from_stage else None
+            yield (candidate_id, from_stage, to_stage, entered, spent)
+            from_stage, entered_from_stage = to_stage, entered
+
+
+def insert_stage_transitions(seed=0, batch_size=5000, candidates=None):
+    """Log a plausible stage history for every candidate (of ``candidates``, default all)"""
+    rng = random.Random(seed)
+    if candidates is None:
+        candidates = Candidate.objects.all()
+    candidates = candidates.order_by().values_list(
+        'id', 'current_stage', 'application_date', 'stage_changed_at'
+    ).iterator(chunk_size=batch_size)
+    return _insert_many(
+        StageTransition._meta.db_table, TRANSITION_COLUMNS, transition_rows(candidates, rng), batch_size
+    )
+
+
+def vote_rows(candidates, voter_ids, lodge_ids, rng, voters_per_stage=(3, 7), grand_lodge_share=0.2):
+    now = timezone.now()
+    for candidate_id, stage in candidates:
+        if stage not in ('LODGE_REVIEW', 'VOTING', 'ACCEPTED', 'REJECTED'):
+            continue
+        vote_stage = 'LODGE_REVIEW' if stage == 'LODGE_REVIEW' else 'VOTING'
+        levels = ['LODGE'] + (['GRAND_LODGE'] if rng.random() < grand_lodge_share else [])
+        lodge_id = rng.choice(lodge_ids)
+        for level in levels:
+            for voter_id in rng.sample(voter_ids, min(len(voter_ids), rng.randint(*voters_per_stage))):
+                vote = 'REJECT' if stage == 'REJECTED' and rng.random() < 0.5 else rng.choices(
+                    ['APPROVE', 'REJECT', 'ABSTAIN'], [85, 5, 10])[0]
+                yield (candidate_id, voter_id, lodge_id, vote, level, vote_stage, now, '')
+
+
+def insert_votes(voter_ids, lodge_ids, seed=0, batch_size=5000, candidates=None):
+    """Cast synthetic votes on every candidate (of ``candidates``, default all) that reached lodge review"""
+    rng = random.Random(seed)
+    if candidates is None:
+        candidates = Candidate.objects.all()
+    candidates = candidates.order_by().values_list('id', 'current_stage').iterator(chunk_size=batch_size)
+    return _insert_many(
+        Vote._meta.db_table, VOTE_COLUMNS, vote_rows(candidates, list(voter_ids), list(lodge_ids), rng),
+        batch_size,
+    )
+
+
+def create_lodges(count, start=0):
+    names = [
+        LODGE_NAMES[i % len(LODGE_NAMES)] + (f" {i // len(LODGE_NAMES) + 1}" if i >= len(LODGE_NAMES) else '')
+        for i in range(start, start + count)
+    ]
+    return Lodge.objects.bulk_create([Lodge(name=name) for name in names])
+
+
+def create_users(count, lodges, seed=0, start=0, password='password'):
+    """
+    Create ``count`` members spread over ``lodges``: one set of Grand Lodge
+    officers, a full set of officers per lodge and regular members for the
+    rest. All users share one password hash, hashing is far too slow to repeat.
+    """
+    rng = random.Random(seed)
+    password = make_password(password)
+    users = []
+    for i in range(count):
+        officer = i - len(GRAND_OFFICERS)
+        if i < len(GRAND_OFFICERS):
+            position, lodge = GRAND_OFFICERS[i], rng.choice(lodges)
+        elif officer < len(LODGE_OFFICERS) * len(lodges):
+            position, lodge = LODGE_OFFICERS[officer % len(LODGE_OFFICERS)], lodges[officer // len(LODGE_OFFICERS)]
+        else:
+            position, lodge = 'Antare', rng.choice(lodges)
+        number = start + i
+        users.append(User(
+            username=f"member{number}", email=f"member{number}@example.com", password=password,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            position=position, is_dignitary=position in DIGNITARIES,
+            is_senior_member=position in GRAND_OFFICERS, is_lodge_member=True,
+            primary_lodge=lodge, city=rng.choice(CITIES), phone_number=f"04{rng.randrange(10 ** 7):07d}",
+        ))
+    users = User.objects.bulk_create(users, batch_size=1000)
+    Lodge.members.through.objects.bulk_create(
+        [Lodge.members.through(lodge_id=user.primary_lodge_id, user_id=user.pk) for user in users],
+        batch_size=1000,
+    )
+    return users
+
+
+def document_rows(candidates, rng, per_candidate):
+    now = timezone.now()
+    for candidate_id, stage in candidates:
+        if stage == 'APPLIED':
+            continue
+        for n in range(rng.randint(1, per_candidate) if per_candidate else 0):
+            yield (
+                candidate_id, rng.choice(DOCUMENT_NAMES), f"candidate_documents/synthetic/{candidate_id}-{n}.pdf",
+                now, stage != 'DOCUMENTS',
+            )
+
+
+def insert_documents(per_candidate=2, seed=0, batch_size=5000, candidates=None):
+    """
+    Attach up to ``per_candidate`` document rows to every candidate past the
+    application stage; only the rows are created, not the files.
+    """
+    rng = random.Random(seed)
+    if candidates is None:
+        candidates = Candidate.objects.all()
+    candidates = candidates.order_by().values_list('id', 'current_stage').iterator(chunk_size=batch_size)
+    return _insert_many(
+        Document._meta.db_table, DOCUMENT_COLUMNS, document_rows(candidates, rng, per_candidate), batch_size
+    )
@@ -0,0 +1,40 @@
+from django import template
+
+from ..cache import FRAGMENTS, get_fragment
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return get_fragment(self.name, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    Cache the enclosed markup until any of the values it varies on changes::
+
+        {% fragment 'candidate_detail' candidate.pk candidate.last_updated fragment_version %}
+            ...
+        {% endfragment %}
+
+    The name must be one of members.cache.FRAGMENTS, whose hits and misses are
+    counted. Keep anything that depends on the user out of the fragment: one
+    rendering is served to everybody.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a name and at least one value to vary on")
+    name = bits[1].strip('\'"')
+    if name not in FRAGMENTS:
+        raise template.TemplateSyntaxError(f"Unknown fragment {name!r}; add it to members.cache.FRAGMENTS")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, name, [parser.compile_filter(bit) for bit in bits[2:]])
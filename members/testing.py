@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from .instrumentation import QueryRecorder, n_plus_one_threshold
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for query budgets::
+
+        with self.assertQueryBudget(5):
+            self.client.get(url)
+
+    Unlike ``assertNumQueries`` the budget is an upper bound, and the block
+    also fails when one statement repeats ``n_plus_one`` times or more
+    (``N_PLUS_ONE_THRESHOLD`` by default), so an N+1 cannot hide under a
+    generous budget.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, n_plus_one=None):
+        with QueryRecorder() as recorder:
+            yield recorder
+
+        problems = []
+        if recorder.count > budget:
+            problems.append(f"{recorder.count} queries, budget is {budget}")
+        for statement, times in recorder.n_plus_one(n_plus_one or n_plus_one_threshold()):
+            problems.append(f"likely N+1, {times} times: {statement}")
+        if problems:
+            queries = '\n'.join(f"{i}. {sql}" for i, (sql, _) in enumerate(recorder.queries, start=1))
+            self.fail('\n'.join(problems) + f"\nQueries:\n{queries}")
@@ -1,3 +1,1791 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import pandas as pd
+from openpyxl import load_workbook
+from PIL import Image
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from django.utils.formats import date_format
+
+from .backends.sqlite3.base import DatabaseWrapper
+from .cache import get_fragment_stats, get_lodge_directory, get_lodge_summary, get_pipeline_stats, get_version
+from .calendars import calendar_token
+from .instrumentation import QueryInstrumentationMiddleware, fingerprint
+from .importers import import_candidates, import_candidates_from_file, iter_frames
+from .jobs import run_bulk_upload
+from .management.commands.benchmark_indexes import hot_queries
+from .pagination import KeysetPaginator
+from .pipeline import compute_pipeline_stats, month_starts
+from .rosters import ROSTER_PAGE_SIZE, compute_lodge_summary
+from .search import SearchIndex, candidate_index, fold, user_index
+from .storage import blob_name, blob_storage
+from .thumbnails import DERIVATIVES, derivative_name, ensure_derivative
+from .transitions import candidate_timeline, change_stage, stage_duration_percentiles
+from .uploads import part_path
+from .models import (
+    Blob, BulkUpload, Candidate, ChunkedUpload, Document, Lodge, LodgeEvent, MemberDocument, StageTransition, User,
+    Vote, VoteTally,
+)
+from .synthetic import insert_candidates, insert_votes
+from .testing import QueryBudgetMixin
+from .voting import final_decisions, stored_tallies, tally_votes
+
+
+class CandidateImportTests(TestCase):
+    def make_export(self, rows):
+        columns = ['Timestamp', 'Email Address', 'Emrin dhe Mbiemrin', 'Nr. e Telefonit',
+                   'Jeni qytetar i Republikes së Kosoves?']
+        return pd.DataFrame(rows, columns=columns, dtype=str)
+
+    def test_import_reports_same_errors_as_row_by_row_import(self):
+        Candidate.objects.create(email='old@example.com', full_name='Old', phone_number='1',
+                                 address='', city='')
+        df = self.make_export([
+            ['1/17/2025 12:33:45', ' New@Example.com ', 'Arben Krasniqi', '044123456', 'Po'],
+            ['1/18/2025 09:00:00', 'old@example.com', 'Old Again', '', 'Po'],
+            ['1/18/2025 10:00:00', None, 'No Email', '', 'Po'],
+            ['1/19/2025 10:00:00', 'new@example.com', 'Duplicate', '', 'Jo'],
+            ['not a date', 'other@example.com', 'Drita Berisha', '049000000', 'Jo'],
+        ])
+
+        result = import_candidates(df, batch_size=2)
+
+        self.assertEqual(result.processed_count, 2)
+        self.assertEqual(result.skipped_count, 2)
+        self.assertEqual(result.errors, [
+            'Row 3: Candidate with email old@example.com already exists',
+            'Row 4: Email is required',
+            'Row 5: Candidate with email new@example.com already exists',
+        ])
+
+        candidate = Candidate.objects.get(email='new@example.com')
+        self.assertEqual(candidate.full_name, 'Arben Krasniqi')
+        self.assertEqual(candidate.phone_number, '044123456')
+        self.assertTrue(candidate.is_kosovo_citizen)
+        self.assertEqual(candidate.application_date, datetime(2025, 1, 17, 12, 33, 45, tzinfo=dt_timezone.utc))
+        self.assertFalse(Candidate.objects.get(email='other@example.com').is_kosovo_citizen)
+
+    def test_streaming_import_matches_dataframe_import(self):
+        rows = [
+            ['1/17/2025 12:33:45', 'a@example.com', 'Arben Krasniqi', '044123456', 'Po'],
+            ['', '', 'No Email', '', ''],
+            ['1/18/2025 10:00:00', 'b@example.com', 'Drita Berisha', '', 'Jo'],
+            ['1/19/2025 10:00:00', 'A@example.com', 'Duplicate', '', 'Po'],
+        ]
+        df = self.make_export(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            for extension in ('csv', 'xlsx'):
+                path = f"{tmp}/export.{extension}"
+                if extension == 'csv':
+                    df.to_csv(path, index=False)
+                else:
+                    df.to_excel(path, index=False)
+
+                result = import_candidates_from_file(path, batch_size=2)
+                imported = list(Candidate.objects.order_by('email').values_list(
+                    'email', 'full_name', 'phone_number', 'is_kosovo_citizen', 'application_date'))
+                Candidate.objects.all().delete()
+
+                expected = import_candidates(df.copy(), batch_size=2)
+                self.assertEqual(result.errors, expected.errors)
+                self.assertEqual(result.errors, [
+                    'Row 3: Email is required',
+                    'Row 5: Candidate with email a@example.com already exists',
+                ])
+                self.assertEqual(imported, list(Candidate.objects.order_by('email').values_list(
+                    'email', 'full_name', 'phone_number', 'is_kosovo_citizen', 'application_date')))
+                Candidate.objects.all().delete()
+
+    def test_streaming_reader_skips_committed_rows(self):
+        df = self.make_export([[None, f"c{i}@example.com", f"C {i}", None, None] for i in range(5)])
+        with tempfile.TemporaryDirectory() as tmp:
+            df.to_csv(f"{tmp}/export.csv", index=False)
+            frames = list(iter_frames(f"{tmp}/export.csv", chunk_size=2, skip_rows=2))
+
+        self.assertEqual([list(frame['row']) for frame in frames], [[4, 5], [6]])
+        self.assertEqual(list(frames[0]['email']), ['c2@example.com', 'c3@example.com'])
+
+    def test_upsert_updates_changed_rows_and_skips_unchanged_ones(self):
+        rows = [
+            ['1/17/2025 12:00:00', 'a@example.com', 'Arben Krasniqi', '044123456', 'Po'],
+            ['1/18/2025 12:00:00', 'b@example.com', 'Drita Berisha', '049000000', 'Jo'],
+        ]
+        import_candidates(self.make_export(rows))
+        Candidate.objects.filter(email='a@example.com').update(current_stage='INTERVIEW')
+        rows[0][3] = '044999999'
+        rows.append(['1/19/2025 12:00:00', 'c@example.com', 'Besa Gashi', '', 'Po'])
+
+        with self.assertNumQueries(10):
+            result = import_candidates(self.make_export(rows), upsert=True)
+
+        self.assertEqual((result.processed_count, result.updated_count, result.unchanged_count), (1, 1, 1))
+        self.assertEqual(result.errors, [])
+        updated = Candidate.objects.get(email='a@example.com')
+        self.assertEqual(updated.phone_number, '044999999')
+        # Pipeline state is not part of the form
+        self.assertEqual(updated.current_stage, 'INTERVIEW')
+        self.assertEqual(list(candidate_index.filter(Candidate.objects.all(), '044999999')), [updated])
+
+        result = import_candidates(self.make_export(rows), upsert=True)
+        self.assertEqual((result.processed_count, result.updated_count, result.unchanged_count), (0, 0, 3))
+
+    def test_upsert_skips_rows_up_to_the_high_water_mark(self):
+        rows = [
+            ['1/17/2025 12:00:00', 'a@example.com', 'Arben Krasniqi', '', 'Po'],
+            ['1/18/2025 12:00:00', 'b@example.com', 'Drita Berisha', '', 'Jo'],
+        ]
+        since = datetime(2025, 1, 17, 12, tzinfo=dt_timezone.utc)
+
+        with self.assertNumQueries(7):
+            result = import_candidates(self.make_export(rows), upsert=True, since=since)
+
+        self.assertEqual((result.processed_count, result.unchanged_count), (1, 1))
+        self.assertEqual(list(Candidate.objects.values_list('email', flat=True)), ['b@example.com'])
+
+    def test_missing_required_columns(self):
+        df = pd.DataFrame({'Email Address': ['a@example.com']}, dtype=str)
+        with self.assertRaisesMessage(ValueError, 'Missing required columns: Emrin dhe Mbiemrin'):
+            import_candidates(df)
+
+
+class BulkUploadJobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_upload(self, rows):
+        df = pd.DataFrame({
+            'Email Address': [f"candidate{i}@example.com" for i in range(rows)],
+            'Emrin dhe Mbiemrin': [f"Candidate {i}" for i in range(rows)],
+        })
+        content = io.BytesIO()
+        df.to_excel(content, index=False)
+        upload = BulkUpload()
+        upload.file.save('candidates.xlsx', ContentFile(content.getvalue()))
+        return upload
+
+    def test_job_imports_in_chunks_and_records_progress(self):
+        upload = self.make_upload(5)
+
+        self.assertTrue(run_bulk_upload(upload.pk, batch_size=2))
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'COMPLETED')
+        self.assertEqual(upload.processed_count, 5)
+        self.assertEqual((upload.committed_rows, upload.total_rows), (5, 5))
+        self.assertEqual(Candidate.objects.count(), 5)
+        # A finished job cannot be claimed again
+        self.assertFalse(run_bulk_upload(upload.pk))
+
+    def test_crashed_job_resumes_after_last_committed_chunk(self):
+        upload = self.make_upload(5)
+        for i in range(2):
+            Candidate.objects.create(email=f"candidate{i}@example.com", full_name=f"Candidate {i}")
+        BulkUpload.objects.filter(pk=upload.pk).update(
+            status='RUNNING', committed_rows=2, processed_count=2, heartbeat_at=None
+        )
+
+        self.assertTrue(run_bulk_upload(upload.pk, batch_size=2, statuses=('RUNNING',)))
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'COMPLETED')
+        self.assertEqual(upload.processed_count, 5)
+        self.assertEqual(Candidate.objects.count(), 5)
+
+    def test_upsert_job_continues_from_previous_high_water_mark(self):
+        rows = [
+            ['1/17/2025 12:00:00', 'a@example.com', 'Arben Krasniqi'],
+            ['1/18/2025 12:00:00', 'b@example.com', 'Drita Berisha'],
+        ]
+        first = self.make_export_upload(rows, mode='UPSERT')
+        run_bulk_upload(first.pk)
+        rows[0][2] = 'Arben Krasniqi (edited before the last import)'
+        rows.append(['1/19/2025 12:00:00', 'c@example.com', 'Besa Gashi'])
+        second = self.make_export_upload(rows, mode='UPSERT')
+
+        run_bulk_upload(second.pk, batch_size=2)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.high_water_mark, datetime(2025, 1, 18, 12, tzinfo=dt_timezone.utc))
+        self.assertEqual(second.high_water_mark, datetime(2025, 1, 19, 12, tzinfo=dt_timezone.utc))
+        self.assertEqual((second.processed_count, second.updated_count, second.unchanged_count), (1, 0, 2))
+        self.assertEqual(Candidate.objects.get(email='a@example.com').full_name, 'Arben Krasniqi')
+
+    def make_export_upload(self, rows, mode):
+        df = pd.DataFrame(rows, columns=['Timestamp', 'Email Address', 'Emrin dhe Mbiemrin'])
+        upload = BulkUpload(mode=mode)
+        upload.file.save('export.csv', ContentFile(df.to_csv(index=False).encode()))
+        return upload
+
+    def test_progress_endpoint(self):
+        upload = self.make_upload(1)
+        user = User.objects.create_user('secretary', password='secret', position='SE')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('bulk_upload_progress', args=[upload.pk]))
+
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertTrue(response.json()['is_active'])
+
+
+class VoteTallyTests(TestCase):
+    STAGES = ['LODGE_REVIEW', 'VOTING']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lodge = Lodge.objects.create(name='Lodge')
+        cls.voters = [User.objects.create_user(f"voter{i}") for i in range(4)]
+        cls.candidates = [
+            Candidate.objects.create(email=f"c{i}@example.com", full_name=f"C {i}") for i in range(12)
+        ]
+
+    def cast_random_votes(self, rng):
+        votes = []
+        for candidate in self.candidates:
+            for stage in self.STAGES:
+                for vote_level in ('LODGE', 'GRAND_LODGE'):
+                    for voter in rng.sample(self.voters, rng.randint(0, len(self.voters))):
+                        votes.append(Vote.objects.create(
+                            candidate=candidate, voter=voter, lodge=self.lodge, stage=stage,
+                            vote_level=vote_level, vote=rng.choice(['APPROVE', 'APPROVE', 'REJECT', 'ABSTAIN']),
+                        ))
+        return votes
+
+    def test_decisions_match_get_final_decision_on_random_votes(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                Vote.objects.all().delete()
+                self.cast_random_votes(random.Random(seed))
+
+                with self.assertNumQueries(1):
+                    decisions = final_decisions(self.candidates, self.STAGES)
+
+                for candidate in self.candidates:
+                    for stage in self.STAGES:
+                        self.assertEqual(
+                            decisions[(candidate.pk, stage)], Vote.get_final_decision(candidate, stage)
+                        )
+
+    def test_tally_counts(self):
+        self.cast_random_votes(random.Random(42))
+        tallies = tally_votes(self.candidates)
+        for (candidate_id, stage, vote_level), tally in tallies.items():
+            votes = Vote.objects.filter(candidate_id=candidate_id, stage=stage, vote_level=vote_level)
+            self.assertEqual(tally.approve, votes.filter(vote='APPROVE').count())
+            self.assertEqual(tally.reject, votes.filter(vote='REJECT').count())
+            self.assertEqual(tally.abstain, votes.filter(vote='ABSTAIN').count())
+
+    def test_stored_tallies_follow_vote_changes(self):
+        rng = random.Random(7)
+        votes = self.cast_random_votes(rng)
+        for vote in rng.sample(votes, len(votes) // 3):
+            vote.vote = rng.choice(['APPROVE', 'REJECT', 'ABSTAIN'])
+            if rng.random() < 0.3:
+                vote.vote_level = 'GRAND_LODGE' if vote.vote_level == 'LODGE' else 'LODGE'
+            try:
+                vote.save()
+            except IntegrityError:
+                vote.refresh_from_db()
+        for vote in rng.sample(votes, len(votes) // 4):
+            vote.delete()
+        Vote.objects.filter(voter=self.voters[0]).delete()
+
+        self.assertEqual(stored_tallies(), tally_votes())
+        call_command('rebuild_vote_tallies', '--verify', stdout=io.StringIO())
+
+    def test_rebuild_vote_tallies(self):
+        self.cast_random_votes(random.Random(3))
+        expected = tally_votes()
+        VoteTally.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_tallies', '--verify', stdout=io.StringIO())
+
+        call_command('rebuild_vote_tallies', stdout=io.StringIO())
+
+        self.assertEqual(stored_tallies(), expected)
+
+    def test_check_vote_status(self):
+        candidate = self.candidates[0]
+        Vote.objects.create(candidate=candidate, voter=self.voters[0], lodge=self.lodge,
+                            stage='VOTING', vote='APPROVE')
+        self.assertTrue(candidate.check_vote_status('VOTING'))
+        # Grand Lodge votes supersede the Lodge decision, even abstentions only
+        Vote.objects.create(candidate=candidate, voter=self.voters[1], lodge=self.lodge,
+                            stage='VOTING', vote='ABSTAIN', vote_level='GRAND_LODGE')
+        with self.assertNumQueries(1):
+            self.assertFalse(candidate.check_vote_status('VOTING'))
+
+
+class LodgeDirectoryCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lodge = Lodge.objects.create(name='Dardania')
+        cls.candidate = Candidate.objects.create(email='a@example.com', full_name='A')
+        cls.secretary = User.objects.create_user('secretary', password='secret', position='SE')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_issue_no_lodge_queries_after_warm_up(self):
+        self.client.force_login(self.secretary)
+        # session + user lookups, then the view's own queries
+        pages = [
+            (reverse('home'), 2),
+            (reverse('applicants'), 5),  # count estimate, COUNT(*) and the page
+            (reverse('candidate_detail', args=[self.candidate.pk]), 3),  # the candidate; the rest is a cached fragment
+            (reverse('lodge_detail', args=[self.lodge.pk]), 3),
+            (reverse('control_panel'), 4),
+        ]
+        for url, queries in pages:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertContains(response, 'Dardania')
+
+        self.client.logout()
+        self.client.get(reverse('login'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('login'))
+
+    def test_directory_is_invalidated_on_lodge_save_and_delete(self):
+        self.assertEqual(get_lodge_directory(), [{'id': self.lodge.pk, 'name': 'Dardania'}])
+
+        self.lodge.name = 'Iliria'
+        self.lodge.save()
+        other = Lodge.objects.create(name='Arbëria')
+        self.assertEqual([lodge['name'] for lodge in get_lodge_directory()], ['Iliria', 'Arbëria'])
+
+        other.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual([lodge['name'] for lodge in get_lodge_directory()], ['Iliria'])
+
+
+class ApplicantsPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1)
+        stages = [stage for stage, _ in Candidate.STAGE_CHOICES]
+        for i in range(37):
+            Candidate.objects.create(
+                email=f"c{i:02d}@example.com",
+                full_name=rng.choice(['Arben', 'Besa', 'Drita', 'Ilir']),
+                current_stage=rng.choice(stages),
+                application_date=datetime(2025, 1, rng.randint(1, 5), tzinfo=dt_timezone.utc),
+                interview_date=(
+                    datetime(2025, 2, rng.randint(1, 3), tzinfo=dt_timezone.utc) if rng.random() < 0.6 else None
+                ),
+            )
+        cls.user = User.objects.create_user('member', password='secret')
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.page(backwards[-1].previous_cursor))
+        return pages, backwards[::-1]
+
+    def test_keyset_pages_cover_every_row_in_order(self):
+        for field in ['full_name', 'email', 'application_date', 'current_stage', 'interview_date']:
+            for descending in (False, True):
+                with self.subTest(field=field, descending=descending):
+                    paginator = KeysetPaginator(Candidate.objects.all(), field, descending, per_page=5)
+                    expected = list(Candidate.objects.order_by(*paginator.ordering()))
+                    forward, backward = self.walk(paginator)
+
+                    self.assertEqual([c for page in forward for c in page], expected)
+                    self.assertEqual(
+                        [[c.pk for c in page] for page in backward],
+                        [[c.pk for c in page] for page in forward],
+                    )
+
+    def test_view_sorts_server_side_and_caps_page_size(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('applicants'), {'sort': '-name', 'page_size': 100000})
+
+        self.assertEqual(response.context['current_page_size'], 100)
+        names = [c.full_name for c in response.context['applicants']]
+        self.assertEqual(names, sorted(names, reverse=True))
+        response = self.client.get(reverse('applicants'), {'sort': 'bogus', 'page_size': 'x'})
+        self.assertEqual(response.context['current_sort'], 'application_date')
+        self.assertEqual(response.context['current_page_size'], 10)
+
+    def test_cursor_mode_skips_count_query(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('applicants'), {'paginate': 'cursor', 'sort': 'interview_date'})
+        cursor = response.context['page_obj'].next_cursor
+
+        # session, user, estimate and the page itself; no COUNT(*) or OFFSET
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse('applicants'), {'paginate': 'cursor', 'sort': 'interview_date', 'cursor': cursor}
+            )
+        self.assertEqual(len(response.context['applicants']), 10)
+        self.assertEqual(self.client.get(reverse('applicants'), {'cursor': 'garbage'}).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output differs between databases')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        lodge = Lodge.objects.create(name='Iliria')
+        voters = [User.objects.create_user(f"voter{i}", primary_lodge=lodge) for i in range(3)]
+        insert_candidates(200, seed=1)
+        insert_votes([voter.pk for voter in voters], [lodge.pk], seed=1)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_hot_queries_use_their_indexes(self):
+        for name, queryset, index in hot_queries(Vote.objects.values_list('candidate_id', flat=True).first()):
+            with self.subTest(name):
+                self.assertIn(f"INDEX {index}", queryset.explain())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ceku = Candidate.objects.create(
+            email='dritonceku@gmail.com', full_name='Driton Çeku', phone_number='044 123 456', city='Pejë'
+        )
+        cls.dermaku = Candidate.objects.create(email='besa@example.com', full_name='Besa Dërmaku', city='Prizren')
+        cls.user = User.objects.create_user('arben', first_name='Arben', last_name='Thaçi', password='secret')
+
+    def search(self, query, **kwargs):
+        return set(candidate_index.filter(Candidate.objects.all(), query, **kwargs))
+
+    def test_accent_folding_prefixes_and_phone_digits(self):
+        self.assertEqual(fold('Dërmaku ÇEKU'), 'dermaku ceku')
+        for query in ['ceku', 'Çek', 'driton ce', 'peje', 'gmail', '044123', 'dritonceku@gm']:
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), {self.ceku})
+                self.assertEqual(self.search(query, ordered_scan=True), {self.ceku})
+        self.assertEqual(self.search('dermaku prizren'), {self.dermaku})
+        self.assertEqual(self.search('ceku prizren'), set())
+        self.assertEqual(candidate_index.count('example'), 1)
+        self.assertEqual(set(user_index.filter(User.objects.all(), 'thaci')), {self.user})
+
+    def test_index_follows_saves_deletes_and_imports(self):
+        self.ceku.full_name = 'Driton Hoxha'
+        self.ceku.save()
+        self.assertEqual(self.search('ceku'), set())
+        self.assertEqual(self.search('hoxha'), {self.ceku})
+
+        self.dermaku.delete()
+        self.assertEqual(candidate_index.count('dermaku'), 0)
+
+        import_candidates(pd.DataFrame(
+            [['1/17/2025 12:33:45', 'new@example.com', 'Fjolla Gashi', '049000000', 'Po']],
+            columns=['Timestamp', 'Email Address', 'Emrin dhe Mbiemrin', 'Nr. e Telefonit',
+                     'Jeni qytetar i Republikes së Kosoves?'],
+            dtype=str,
+        ))
+        self.assertEqual([c.email for c in self.search('gashi')], ['new@example.com'])
+
+        Candidate.objects.all().delete()
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(candidate_index.count('gashi'), 0)
+
+    def test_saves_that_leave_the_indexed_fields_alone_are_not_reindexed(self):
+        self.user.first_name = 'Agim'
+        with mock.patch.object(SearchIndex, 'update') as update:
+            self.user.save(update_fields=['last_login'])
+            self.ceku.save(update_fields=['current_stage'])
+            update.assert_not_called()
+            self.user.save(update_fields=['first_name', 'last_login'])
+            update.assert_called_once_with([self.user])
+
+    def test_applicants_search_and_typeahead(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('applicants'), {'q': 'dërm'})
+        self.assertEqual(list(response.context['applicants']), [self.dermaku])
+        self.assertEqual(response.context['paginator'].count, 1)
+        self.assertIn('q=d%C3%ABrm', response.context['query_string'])
+
+        response = self.client.get(reverse('applicants_typeahead'), {'q': 'cek'})
+        self.assertEqual(response.json()['results'], [{
+            'id': self.ceku.pk, 'full_name': 'Driton Çeku', 'email': 'dritonceku@gmail.com', 'city': 'Pejë',
+            'stage': 'Application Submitted', 'url': reverse('candidate_detail', args=[self.ceku.pk]),
+        }])
+        self.assertEqual(self.client.get(reverse('applicants_typeahead'), {'q': 'c'}).json(), {'results': []})
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_data(self):
+        call_command('generate_data', lodges=3, users=40, candidates=300, stdout=io.StringIO())
+
+        self.assertEqual(Lodge.objects.count(), 3)
+        self.assertEqual(User.objects.filter(position='SE').count(), 3)
+        self.assertEqual(User.objects.filter(is_dignitary=True).count(), 3)
+        self.assertEqual(Candidate.objects.count(), 300)
+        self.assertEqual(
+            set(Candidate.objects.values_list('current_stage', flat=True)),
+            {stage for stage, _ in Candidate.STAGE_CHOICES},
+        )
+        self.assertEqual(set(Vote.objects.values_list('vote_level', flat=True)), {'LODGE', 'GRAND_LODGE'})
+        self.assertTrue(Document.objects.exists())
+        self.assertEqual(Lodge.members.through.objects.count(), 40)
+        # Every candidate's history starts with its application and ends in its current stage
+        self.assertEqual(StageTransition.objects.filter(from_stage='').count(), 300)
+        latest = dict(StageTransition.objects.order_by('changed_at', 'id').values_list('candidate_id', 'to_stage'))
+        self.assertEqual(latest, dict(Candidate.objects.values_list('id', 'current_stage')))
+        # Raw inserts are followed by rebuilds of the derived tables
+        call_command('rebuild_vote_tallies', verify=True, stdout=io.StringIO())
+        self.assertEqual(candidate_index.count('example'), 300)
+
+        call_command('generate_data', lodges=1, users=10, candidates=100, stdout=io.StringIO())
+        self.assertEqual(Candidate.objects.count(), 400)
+
+    def test_benchmark_urls_writes_report(self):
+        call_command('generate_data', lodges=2, users=20, candidates=50, stdout=io.StringIO())
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        first, second = f"{tmp}/first.json", f"{tmp}/second.json"
+
+        call_command('benchmark_urls', repeat=2, import_rows=20, output=first, stdout=io.StringIO())
+        with open(first) as f:
+            report = json.load(f)
+
+        self.assertEqual(report['dataset']['candidate'], 50)
+        self.assertEqual(report['urls']['home']['status'], 200)
+        self.assertEqual(report['urls']['home']['queries'], 2)
+        self.assertEqual(report['urls']['candidate_detail']['status'], 200)
+        self.assertIn('skipped', report['urls']['delete_document'])
+        self.assertEqual(report['urls']['applicants_export?q=arben&format=xlsx']['status'], 200)
+        self.assertEqual(report['urls']['lodge_calendar']['status'], 200)
+        self.assertEqual(report['urls']['lodge_events?start=2025-03-01&end=2025-04-12']['status'], 200)
+        self.assertEqual(report['urls']['chunked_upload']['status'], 200)
+        # Nearest rank: the slower of two samples
+        self.assertEqual(report['urls']['home']['p95_ms'], report['urls']['home']['max_ms'])
+        self.assertEqual(report['bulk_import']['created'], 20)
+        self.assertEqual(Candidate.objects.count(), 50)
+
+        out = io.StringIO()
+        call_command('benchmark_urls', repeat=1, import_rows=0, output=second, compare=first, stdout=out)
+        self.assertIn('queries 2 -> 2', out.getvalue())
+
+
+class QueryInstrumentationTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lodges = [Lodge.objects.create(name=f"Lodge {i}") for i in range(6)]
+        cls.user = User.objects.create_user('member', password='secret')
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'x\'  LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (...) AND "name" = ? LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SELECT 1 FROM "t2" WHERE "a" = %s'), 'SELECT ? FROM "t2" WHERE "a" = ?')
+
+    @override_settings(SERVER_TIMING=True)
+    def test_middleware_reports_server_timing_and_logs_request(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))  # warm the lodge directory cache
+        with self.assertLogs('members.queries', 'INFO') as logs:
+            response = self.client.get(reverse('home'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", tpl;dur=[\d.]+;.*total;dur=')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['status'], record['queries']), ('/', 200, 2))
+        self.assertGreater(record['template_ms'], 0)
+
+    def test_middleware_flags_n_plus_one(self):
+        def view(request):
+            names = [Lodge.objects.get(pk=lodge.pk).name for lodge in self.lodges]
+            return HttpResponse(', '.join(names))
+
+        middleware = QueryInstrumentationMiddleware(view)
+        with self.assertLogs('members.queries', 'WARNING') as logs:
+            middleware(RequestFactory().get('/lodges/'))
+
+        warning = json.loads(logs.records[0].getMessage())
+        self.assertEqual((warning['event'], warning['times']), ('n_plus_one', 6))
+        self.assertIn('"members_lodge"', warning['sql'])
+
+    def test_query_budget(self):
+        with self.assertQueryBudget(2):
+            list(Lodge.objects.all())
+        with self.assertRaisesRegex(AssertionError, '2 queries, budget is 1'):
+            with self.assertQueryBudget(1):
+                Lodge.objects.count()
+                Lodge.objects.count()
+        with self.assertRaisesRegex(AssertionError, 'likely N\\+1, 6 times'):
+            with self.assertQueryBudget(10):
+                for lodge in self.lodges:
+                    Lodge.objects.get(pk=lodge.pk)
+
+
+class AdminChangelistTests(QueryBudgetMixin, TestCase):
+    changelists = ['lodge', 'user', 'candidate', 'vote', 'document']
+
+    def query_counts(self):
+        counts = {}
+        for model in self.changelists:
+            url = reverse(f'admin:members_{model}_changelist')
+            self.client.get(url)
+            with self.assertQueryBudget(8) as recorder:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts[model] = recorder.count
+        return counts
+
+    def test_changelists_render_in_constant_queries(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(admin_user)
+        call_command('generate_data', lodges=2, users=15, candidates=40, stdout=io.StringIO())
+        small = self.query_counts()
+
+        call_command('generate_data', lodges=3, users=30, candidates=80, stdout=io.StringIO())
+        self.assertEqual(self.query_counts(), small)
+
+    def test_lodge_member_counts_are_annotated(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        lodge = Lodge.objects.create(name='Iliria')
+        lodge.members.add(*[User.objects.create_user(f"m{i}") for i in range(3)])
+
+        response = self.client.get(reverse('admin:members_lodge_changelist'), {'o': '-2'})
+
+        self.assertEqual(response.context['cl'].result_list[0].members_count, 3)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection settings')
+class SQLiteConnectionTests(TransactionTestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            # No SQLITE_JOURNAL_MODE: the journal mode and its full syncs are left alone
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 2)  # FULL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_journal_mode_is_only_set_on_request(self):
+        path = os.path.join(tempfile.mkdtemp(), 'db.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        def journal_mode(pragmas):
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': path})
+                wrapper.connect()
+                try:
+                    return wrapper.connection.execute('PRAGMA journal_mode').fetchone()[0]
+                finally:
+                    wrapper.close()
+
+        self.assertEqual(journal_mode({'journal_mode': None}), 'delete')
+        self.assertEqual(journal_mode({'journal_mode': 'WAL'}), 'wal')
+        # Stored in the file
+        self.assertEqual(journal_mode({'journal_mode': None}), 'wal')
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            Lodge.objects.create(name='Iliria')
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.member = User.objects.create_user('member', password='secret')
+        self.candidate = Candidate.objects.create(full_name='Arben Krasniqi', email='arben@example.com')
+
+    def upload_member_document(self, content, name='id.pdf'):
+        document = MemberDocument(member=self.member, document_type='ID', title='ID card')
+        document.file.save(name, ContentFile(content))
+        return document
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload_member_document(b'scan', 'id.PDF')
+        second = Document(candidate=self.candidate, name='ID card')
+        second.file.save('copy of id.pdf', ContentFile(b'scan'))
+
+        digest = hashlib.sha256(b'scan').hexdigest()
+        self.assertEqual(first.file.name, blob_name(digest, '.pdf'))
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertTrue(first.file.name.startswith(f"blobs/{digest[:2]}/{digest[2:4]}/"))
+        blob = Blob.objects.get()
+        self.assertEqual((blob.sha256, blob.size, blob.ref_count), (digest, 4, 2))
+        self.assertEqual(len(os.listdir(os.path.dirname(blob_storage.path(blob.name)))), 1)
+
+    def test_references_follow_saves_and_deletes(self):
+        document = self.upload_member_document(b'old scan')
+        old_name = document.file.name
+        document.file.save('id.pdf', ContentFile(b'new scan'))
+        self.assertEqual(Blob.objects.get(name=old_name).ref_count, 0)
+        self.assertEqual(Blob.objects.get(name=document.file.name).ref_count, 1)
+
+        document.delete()
+        self.assertEqual(Blob.objects.filter(ref_count__gt=0).count(), 0)
+
+    def test_gc_deletes_only_unreferenced_blobs(self):
+        kept = self.upload_member_document(b'kept')
+        dropped = self.upload_member_document(b'dropped')
+        dropped_path = blob_storage.path(dropped.file.name)
+        dropped.delete()
+        # Drifted counts are corrected before anything is deleted
+        Blob.objects.filter(name=kept.file.name).update(ref_count=0)
+
+        call_command('gc_blobs', grace_hours=0, stdout=io.StringIO())
+
+        self.assertEqual(list(Blob.objects.values_list('name', 'ref_count')), [(kept.file.name, 1)])
+        self.assertTrue(os.path.exists(blob_storage.path(kept.file.name)))
+        self.assertFalse(os.path.exists(dropped_path))
+
+    def test_gc_spares_recent_uploads(self):
+        upload = BulkUpload()
+        upload.file.save('candidates.xlsx', ContentFile(b'sheet'), save=False)
+
+        call_command('gc_blobs', stdout=io.StringIO())
+
+        self.assertTrue(Blob.objects.filter(name=upload.file.name).exists())
+        self.assertTrue(os.path.exists(blob_storage.path(upload.file.name)))
+
+    def test_download_is_handed_to_the_web_server(self):
+        document = self.upload_member_document(b'scan')
+        self.client.force_login(self.member)
+        url = document.file.url
+        self.assertEqual(url, reverse('file_download', kwargs={'name': document.file.name}))
+
+        with override_settings(FILE_DOWNLOAD_SERVER='x-accel-redirect'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'], f"/protected-media/{document.file.name}")
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(FILE_DOWNLOAD_SERVER='x-sendfile'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Sendfile'], blob_storage.path(document.file.name))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_download_requires_a_referenced_file(self):
+        document = self.upload_member_document(b'scan')
+        name = document.file.name
+        document.delete()
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('file_download', kwargs={'name': name})).status_code, 404)
+
+        self.client.logout()
+        response = self.client.get(reverse('file_download', kwargs={'name': name}))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTests(TestCase):
+    content = b'scanned passport'  # 16 bytes, 4 chunks
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.secretary = User.objects.create_user('secretary', password='secret', position='SE')
+        self.client.force_login(self.secretary)
+
+    def start(self, filename='passport.pdf', size=None):
+        response = self.client.post(
+            reverse('chunked_upload_start'),
+            json.dumps({'filename': filename, 'size': len(self.content) if size is None else size}),
+            content_type='application/json',
+        )
+        return response.json()
+
+    def send(self, upload, index, data=None, checksum=None):
+        data = self.content[index * 4:index * 4 + 4] if data is None else data
+        return self.client.put(
+            reverse('chunked_upload_chunk', args=[upload['id'], index]), data,
+            content_type='application/octet-stream',
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest(),
+        )
+
+    def upload(self):
+        upload = self.start()
+        for index in reversed(range(upload['chunk_count'])):
+            self.assertEqual(self.send(upload, index).status_code, 200)
+        return self.client.post(reverse('chunked_upload_complete', args=[upload['id']])).json()
+
+    def test_chunks_in_any_order_assemble_the_file(self):
+        upload = self.upload()
+
+        self.assertEqual(upload['status'], 'COMPLETE')
+        self.assertEqual(upload['sha256'], hashlib.sha256(self.content).hexdigest())
+        blob = Blob.objects.get()
+        with open(blob_storage.path(blob.name), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(blob_storage.path('blobs/tmp')), [])
+
+    def test_corrupt_and_missing_chunks_are_rejected(self):
+        upload = self.start()
+        self.assertEqual(self.send(upload, 0, checksum='0' * 64).status_code, 400)
+        self.assertEqual(self.send(upload, 1, data=b'too long').status_code, 400)
+        self.assertEqual(self.send(upload, 2).status_code, 200)
+
+        response = self.client.post(reverse('chunked_upload_complete', args=[upload['id']]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Missing chunks: 0, 1, 3')
+
+    def test_dropped_upload_resumes_with_the_missing_chunks(self):
+        upload = self.start()
+        self.send(upload, 0)
+        self.send(upload, 2)
+
+        status = self.client.get(upload['url']).json()
+        self.assertEqual(status['received'], [0, 2])
+        for index in set(range(status['chunk_count'])) - set(status['received']):
+            self.send(status, index)
+        self.assertEqual(self.client.post(reverse('chunked_upload_complete', args=[upload['id']])).status_code, 200)
+
+    def test_uploads_are_private_to_their_uploader(self):
+        upload = self.start()
+        other = User.objects.create_user('other', position='SE')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(upload['url']).status_code, 404)
+
+    def test_document_form_takes_the_completed_upload(self):
+        upload = self.upload()
+
+        response = self.client.post(reverse('upload_document'), {
+            'member': self.secretary.pk, 'document_type': 'PASSPORT', 'title': 'Passport', 'upload': upload['id'],
+        })
+
+        self.assertRedirects(response, reverse('control_panel'), fetch_redirect_response=False)
+        document = MemberDocument.objects.get()
+        self.assertEqual(document.file.name, Blob.objects.get().name)
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_bulk_upload_form_rejects_an_unfinished_upload(self):
+        upload = self.start(filename='candidates.xlsx')
+
+        response = self.client.post(reverse('bulk_upload'), {'upload': upload['id']})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['file'])
+        self.assertFalse(BulkUpload.objects.exists())
+        self.assertTrue(os.path.exists(part_path(ChunkedUpload.objects.get())))
+
+
+class DocumentThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.member = User.objects.create_user('member', password='secret')
+        self.client.force_login(self.member)
+
+    def upload_scan(self, size=(1600, 900), name='scan.png'):
+        content = io.BytesIO()
+        Image.new('RGB', size, 'navy').save(content, format='PNG')
+        document = MemberDocument(member=self.member, document_type='ID', title='ID card')
+        with self.captureOnCommitCallbacks() as callbacks:
+            document.file.save(name, ContentFile(content.getvalue()))
+        self.assertEqual(len(callbacks), 1)  # derivatives are queued for the worker pool
+        return document
+
+    def test_derivatives_fit_their_bounds(self):
+        document = self.upload_scan()
+
+        for kind, bounds in DERIVATIVES.items():
+            with self.subTest(kind):
+                name = ensure_derivative(document.file.name, kind)
+                self.assertEqual(name, derivative_name(document.file.name, kind))
+                self.assertTrue(name.startswith(os.path.splitext(document.file.name)[0]))
+                with Image.open(blob_storage.path(name)) as image:
+                    self.assertLessEqual(image.width, bounds[0])
+                    self.assertLessEqual(image.height, bounds[1])
+                    self.assertEqual(image.width / image.height, 16 / 9)
+
+    def test_missing_derivative_is_created_on_first_request(self):
+        document = self.upload_scan()
+        path = blob_storage.path(derivative_name(document.file.name, 'thumb'))
+        self.assertFalse(os.path.exists(path))
+
+        response = self.client.get(document.thumbnail_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(path))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(document.thumbnail_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_files_without_derivatives(self):
+        document = MemberDocument(member=self.member, document_type='OTHER', title='Notes')
+        document.file.save('notes.txt', ContentFile(b'notes'))
+
+        self.assertIsNone(document.thumbnail_url)
+        url = reverse('file_derivative', kwargs={'kind': 'thumb', 'name': document.file.name})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_derivatives_are_collected_with_their_original(self):
+        kept = self.upload_scan()
+        dropped = self.upload_scan(size=(300, 300))
+        kept_thumb = blob_storage.path(ensure_derivative(kept.file.name, 'thumb'))
+        dropped_thumb = blob_storage.path(ensure_derivative(dropped.file.name, 'thumb'))
+        dropped.delete()
+
+        call_command('gc_blobs', grace_hours=0, stdout=io.StringIO())
+
+        self.assertTrue(os.path.exists(kept_thumb))
+        self.assertFalse(os.path.exists(dropped_thumb))
+
+
+class PipelineStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = django_timezone.now()
+        cls.this_month, cls.last_month = month_starts(now, 2)
+        rows = [
+            ('APPLIED', 'Prishtina', cls.this_month, 2),
+            ('APPLIED', 'Prizren', cls.last_month, 4),
+            ('INTERVIEW', 'Prishtina', cls.last_month, 10),
+            ('ACCEPTED', 'Peja', cls.last_month + timedelta(days=3), 30),
+            ('REJECTED', 'Prishtina', now - timedelta(days=3 * 365), 1),
+        ]
+        for i, (stage, city, applied, days) in enumerate(rows):
+            Candidate.objects.create(
+                email=f"c{i}@example.com", full_name=f"C {i}", current_stage=stage, city=city,
+                application_date=applied, stage_changed_at=now - timedelta(days=days),
+            )
+        cls.secretary = User.objects.create_user('secretary', password='secret', position='SE')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_and_funnel(self):
+        # the grouped counts and the medians of every stage
+        with self.assertNumQueries(2):
+            stats = compute_pipeline_stats()
+        self.assertEqual(stats['total'], 5)
+        funnel = {stage['stage']: stage for stage in stats['funnel']}
+        self.assertEqual([stage['stage'] for stage in stats['funnel']], [code for code, _ in Candidate.STAGE_CHOICES])
+        self.assertEqual((funnel['APPLIED']['count'], funnel['APPLIED']['reached']), (2, 4))
+        self.assertEqual((funnel['INTERVIEW']['count'], funnel['INTERVIEW']['reached']), (1, 2))
+        self.assertEqual((funnel['REJECTED']['count'], funnel['REJECTED']['reached']), (1, 1))
+        self.assertEqual(funnel['APPLIED']['percent'], 80)
+        # days in stage 2 and 4; the lower middle of an even count
+        self.assertEqual(funnel['APPLIED']['median_days'], 2)
+        self.assertEqual(funnel['ACCEPTED']['median_days'], 30)
+        self.assertIsNone(funnel['VOTING']['median_days'])
+        self.assertEqual(stats['cities'][0], ('Prishtina', 3))
+        # the rejected application is older than the months shown
+        self.assertEqual(stats['months'], [(self.last_month, 3), (self.this_month, 1)])
+
+    def test_stats_are_cached_and_invalidated_on_stage_change(self):
+        get_pipeline_stats()
+        with self.assertNumQueries(0):
+            get_pipeline_stats()
+
+        candidate = Candidate.objects.get(email='c0@example.com')
+        candidate.full_name = 'Renamed'
+        candidate.save()
+        with self.assertNumQueries(0):
+            get_pipeline_stats()
+
+        before = candidate.stage_changed_at
+        candidate.current_stage = 'DOCUMENTS'
+        candidate.save()
+        self.assertGreater(candidate.stage_changed_at, before)
+        funnel = {stage['stage']: stage for stage in get_pipeline_stats()['funnel']}
+        self.assertEqual(funnel['DOCUMENTS']['count'], 1)
+        self.assertEqual(funnel['DOCUMENTS']['median_days'], 0)
+
+        candidate.delete()
+        self.assertEqual(get_pipeline_stats()['total'], 4)
+
+    def test_import_invalidates_stats(self):
+        get_pipeline_stats()
+        import_candidates(pd.DataFrame([{'Email Address': 'new@example.com', 'Emrin dhe Mbiemrin': 'New'}], dtype=str))
+        self.assertEqual(get_pipeline_stats()['total'], 6)
+
+    def test_dashboard(self):
+        self.client.force_login(self.secretary)
+        self.client.get(reverse('pipeline_dashboard'))
+        # session and user only
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('pipeline_dashboard'))
+        self.assertContains(response, 'Prishtina')
+        self.assertContains(response, date_format(self.last_month, 'F Y'))
+
+
+class StageTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretary', password='secret', position='SE', first_name='Besa')
+        cls.candidate = Candidate.objects.create(email='a@example.com', full_name='A')
+
+    def change_stage(self, stage):
+        self.client.force_login(self.secretary)
+        return self.client.post(reverse('candidate_detail', args=[self.candidate.pk]), {
+            'current_stage': stage, 'full_name': 'A', 'email': 'a@example.com',
+        })
+
+    def log(self, from_stage, to_stage, changed_at, days):
+        StageTransition.objects.create(
+            candidate=self.candidate, from_stage=from_stage, to_stage=to_stage, changed_at=changed_at,
+            duration=timedelta(days=days),
+        )
+
+    def test_secretary_property(self):
+        self.assertTrue(self.secretary.is_secretary)
+        self.assertFalse(User(position='MN').is_secretary)
+
+    def test_stage_changes_are_logged(self):
+        first = self.candidate.stage_transitions.get()
+        self.assertEqual((first.from_stage, first.to_stage, first.duration), ('', 'APPLIED', None))
+
+        self.change_stage('APPLIED')
+        self.assertEqual(self.candidate.stage_transitions.count(), 1)
+
+        self.change_stage('DOCUMENTS')
+        self.candidate.refresh_from_db()
+        last = self.candidate.stage_transitions.last()
+        self.assertEqual((last.from_stage, last.to_stage, last.changed_by), ('APPLIED', 'DOCUMENTS', self.secretary))
+        self.assertEqual(last.changed_at, self.candidate.stage_changed_at)
+        self.assertEqual(last.duration, last.changed_at - first.changed_at)
+
+    def test_stage_change_rolls_back_without_its_log_entry(self):
+        self.candidate.current_stage = 'INTERVIEW'
+        with mock.patch.object(StageTransition.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.candidate.save()
+        self.candidate.refresh_from_db()
+        self.assertEqual(self.candidate.current_stage, 'APPLIED')
+
+    def test_import_logs_the_first_stage(self):
+        import_candidates(pd.DataFrame(
+            [['1/17/2025 12:33:45', 'new@example.com', 'New']],
+            columns=['Timestamp', 'Email Address', 'Emrin dhe Mbiemrin'], dtype=str,
+        ))
+        transition = StageTransition.objects.get(candidate__email='new@example.com')
+        self.assertEqual(transition.to_stage, 'APPLIED')
+        self.assertEqual(transition.changed_at, datetime(2025, 1, 17, 12, 33, 45, tzinfo=dt_timezone.utc))
+
+    def test_timeline(self):
+        self.change_stage('DOCUMENTS')
+        self.change_stage('INTERVIEW')
+        timeline = list(candidate_timeline(self.candidate))
+        self.assertEqual([t.to_stage for t in timeline], ['APPLIED', 'DOCUMENTS', 'INTERVIEW'])
+        self.assertEqual([t.left_at for t in timeline], [timeline[1].changed_at, timeline[2].changed_at, None])
+
+        response = self.client.get(reverse('candidate_detail', args=[self.candidate.pk]))
+        self.assertContains(response, 'Interview Stage')
+        self.assertContains(response, 'Besa')
+
+    def test_percentiles(self):
+        march = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        for day in range(1, 11):
+            self.log('APPLIED', 'DOCUMENTS', march + timedelta(days=day), days=day)
+        self.log('DOCUMENTS', 'INTERVIEW', march, days=7)
+        self.log('DOCUMENTS', 'INTERVIEW', march - timedelta(days=30), days=100)
+
+        with self.assertNumQueries(1):
+            stats = stage_duration_percentiles(percentiles=[50, 90, 100])
+        self.assertEqual(stats['APPLIED']['count'], 10)
+        self.assertEqual(
+            stats['APPLIED']['percentiles'], {50: timedelta(days=5), 90: timedelta(days=9), 100: timedelta(days=10)}
+        )
+        self.assertEqual(stats['DOCUMENTS']['percentiles'][50], timedelta(days=7))
+        self.assertNotIn('INTERVIEW', stats)
+
+        stats = stage_duration_percentiles(start=march, end=march + timedelta(days=3), percentiles=[50])
+        self.assertEqual(stats['APPLIED'], {'count': 2, 'percentiles': {50: timedelta(days=1)}})
+        self.assertEqual(stats['DOCUMENTS'], {'count': 1, 'percentiles': {50: timedelta(days=7)}})
+
+        with self.assertRaises(ValueError):
+            stage_duration_percentiles(percentiles=[0])
+
+    def test_stage_durations_view(self):
+        self.log('APPLIED', 'DOCUMENTS', datetime(2025, 3, 2, 12, tzinfo=dt_timezone.utc), days=2)
+        self.log('APPLIED', 'DOCUMENTS', datetime(2025, 3, 5, tzinfo=dt_timezone.utc), days=4)
+        self.client.force_login(self.secretary)
+        url = reverse('stage_durations')
+
+        response = self.client.get(url, {'start': '2025-03-01', 'end': '2025-03-02', 'percentiles': '50'})
+        self.assertEqual(response.json()['stages'], [
+            {'stage': 'APPLIED', 'label': 'Application Submitted', 'count': 1, 'seconds': {'50': 2 * 86400.0}},
+        ])
+        self.assertEqual(self.client.get(url).json()['stages'][0]['count'], 2)
+        for params in ({'start': 'March'}, {'end': '2025-02-30'}, {'percentiles': '50,x'}, {'percentiles': '150'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class BatchStageChangeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretary', password='secret', position='SE')
+        cls.candidates = {
+            stage: Candidate.objects.create(email=f"{stage.lower()}@example.com", full_name=stage.title(),
+                                            current_stage=stage)
+            for stage in ('APPLIED', 'DOCUMENTS', 'INTERVIEW', 'ACCEPTED')
+        }
+
+    def ids(self, *stages):
+        return [self.candidates[stage].pk for stage in stages]
+
+    def stages(self):
+        return dict(Candidate.objects.values_list('email', 'current_stage'))
+
+    def test_change_stage_validates_and_logs(self):
+        get_pipeline_stats()
+        # the locked read, one UPDATE and one INSERT into the log, then the
+        # lodges whose rosters list the candidates
+        with self.assertNumQueries(4 + 2):  # plus the savepoint around them
+            result = change_stage(self.ids('APPLIED', 'DOCUMENTS', 'INTERVIEW', 'ACCEPTED'), 'INTERVIEW', self.secretary)
+
+        self.assertEqual(result.changed, self.ids('DOCUMENTS'))
+        self.assertEqual([pk for pk, _ in result.skipped], self.ids('APPLIED', 'INTERVIEW', 'ACCEPTED'))
+        self.assertIn('cannot move from Accepted to Interview Stage', dict(result.skipped)[self.ids('ACCEPTED')[0]])
+        self.assertEqual(result.status_message, 'Moved 1 candidates to Interview Stage | Skipped 3 candidates')
+        self.assertEqual(self.stages()['documents@example.com'], 'INTERVIEW')
+        self.assertEqual(self.stages()['applied@example.com'], 'APPLIED')
+
+        moved = Candidate.objects.get(pk=self.ids('DOCUMENTS')[0])
+        transition = moved.stage_transitions.last()
+        self.assertEqual((transition.from_stage, transition.to_stage), ('DOCUMENTS', 'INTERVIEW'))
+        self.assertEqual((transition.changed_at, transition.changed_by), (moved.stage_changed_at, self.secretary))
+        self.assertGreater(transition.duration, timedelta(0))
+        funnel = {stage['stage']: stage['count'] for stage in get_pipeline_stats()['funnel']}
+        self.assertEqual(funnel['INTERVIEW'], 2)
+
+        with self.assertRaises(ValueError):
+            change_stage(self.ids('APPLIED'), 'HIRED')
+
+    def test_form_post(self):
+        self.client.force_login(self.secretary)
+        response = self.client.post(reverse('applicants_stage'), {
+            'candidates': self.ids('APPLIED', 'ACCEPTED'), 'stage': 'DOCUMENTS', 'next': '/applicants/?sort=name',
+        }, follow=True)
+        self.assertRedirects(response, '/applicants/?sort=name')
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['Moved 1 candidates to Document Review | Skipped 1 candidates',
+             'Accepted cannot move from Accepted to Document Review'],
+        )
+        self.assertEqual(self.stages()['applied@example.com'], 'DOCUMENTS')
+
+        response = self.client.post(reverse('applicants_stage'), {'stage': 'DOCUMENTS', 'next': 'https://evil.example'})
+        self.assertRedirects(response, reverse('applicants'), fetch_redirect_response=False)
+
+    def test_json_post(self):
+        self.client.force_login(self.secretary)
+        response = self.client.post(
+            reverse('applicants_stage'), {'candidates': self.ids('INTERVIEW', 'ACCEPTED'), 'stage': 'REJECTED'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['changed'], self.ids('INTERVIEW'))
+        self.assertEqual([row['id'] for row in response.json()['skipped']], self.ids('ACCEPTED'))
+
+        response = self.client.post(
+            reverse('applicants_stage'), {'candidates': ['x'], 'stage': 'REJECTED'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_secretary_or_dignitary(self):
+        self.client.force_login(User.objects.create_user('member'))
+        response = self.client.post(reverse('applicants_stage'), {'candidates': self.ids('APPLIED'), 'stage': 'DOCUMENTS'})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotContains(self.client.get(reverse('applicants')), reverse('applicants_stage'))
+
+        self.client.force_login(self.secretary)
+        self.assertContains(self.client.get(reverse('applicants')), reverse('applicants_stage'))
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        response = self.client.post(reverse('admin:members_candidate_changelist'), {
+            'action': 'move_to_rejected', '_selected_action': self.ids('APPLIED', 'DOCUMENTS'),
+        }, follow=True)
+        self.assertContains(response, 'Moved 2 candidates to Rejected')
+        self.assertEqual(Candidate.objects.filter(current_stage='REJECTED').count(), 2)
+
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretary', first_name='Sara', last_name='Hoxha', position='SE')
+        cls.lodge = Lodge.objects.create(name='Dardania')
+        cls.other_lodge = Lodge.objects.create(name='Iliria')
+        cls.lodge.members.add(cls.secretary)
+        cls.candidates = [
+            Candidate.objects.create(
+                email=f"c{i}@example.com", full_name=name, city='Prishtinë',
+                application_date=datetime(2025, 1, i + 1, 12, tzinfo=dt_timezone.utc),
+            )
+            for i, name in enumerate(['Arben Krasniqi', 'Drita Berisha', 'Besa Gashi'])
+        ]
+        for candidate, lodge, level in [
+            (cls.candidates[0], cls.lodge, 'LODGE'), (cls.candidates[1], cls.other_lodge, 'GRAND_LODGE'),
+        ]:
+            Vote.objects.create(candidate=candidate, voter=cls.secretary, lodge=lodge, vote='APPROVE',
+                                vote_level=level, stage='VOTING')
+
+    def setUp(self):
+        self.client.force_login(self.secretary)
+
+    def read_csv(self, response):
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_candidate_csv_follows_list_search_and_sort(self):
+        with self.assertNumQueries(3):
+            # session, user and the rows
+            response = self.client.get(reverse('applicants_export'), {'q': 'prishtine', 'sort': 'name'})
+            rows = self.read_csv(response)
+
+        self.assertIn('attachment; filename="candidates-', response['Content-Disposition'])
+        header, *rows = rows
+        self.assertEqual(header[:3], ['ID', 'Full Name', 'Email'])
+        self.assertEqual([row[1] for row in rows], ['Arben Krasniqi', 'Besa Gashi', 'Drita Berisha'])
+        self.assertEqual(rows[0][header.index('Stage')], 'Application Submitted')
+        self.assertEqual(rows[0][header.index('Application Date')], '2025-01-01 12:00:00')
+
+        rows = self.read_csv(self.client.get(reverse('applicants_export'), {'q': 'drita'}))
+        self.assertEqual([row[1] for row in rows[1:]], ['Drita Berisha'])
+
+    def test_xlsx_export(self):
+        response = self.client.get(reverse('applicants_export'), {'format': 'xlsx', 'sort': '-application_date'})
+
+        self.assertIn('.xlsx"', response['Content-Disposition'])
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.values)
+        self.assertEqual([row[1] for row in rows[1:]], ['Besa Gashi', 'Drita Berisha', 'Arben Krasniqi'])
+        self.assertEqual(rows[-1][9], datetime(2025, 1, 1, 12))
+
+    def test_formulas_are_escaped(self):
+        Candidate.objects.filter(pk=self.candidates[0].pk).update(
+            full_name='=HYPERLINK("http://evil","x")', city='@SUM(1)', address='-1+1', phone_number='+383 44 000'
+        )
+        Candidate.objects.filter(pk=self.candidates[1].pk).update(full_name='\t=1+1', city='Pejë - Qendër')
+
+        rows = self.read_csv(self.client.get(reverse('applicants_export'), {'sort': 'application_date'}))
+        header = rows[0]
+        first, second = rows[1], rows[2]
+        self.assertEqual(first[header.index('Full Name')], '\'=HYPERLINK("http://evil","x")')
+        self.assertEqual(first[header.index('City')], "'@SUM(1)")
+        self.assertEqual(first[header.index('Address')], "'-1+1")
+        self.assertEqual(first[header.index('Phone Number')], "'+383 44 000")
+        self.assertEqual(second[header.index('Full Name')], "'\t=1+1")
+        self.assertEqual(second[header.index('City')], 'Pejë - Qendër')
+
+        response = self.client.get(reverse('applicants_export'), {'format': 'xlsx', 'sort': 'application_date'})
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        cell = sheet.cell(row=2, column=header.index('Full Name') + 1)
+        self.assertEqual((cell.value, cell.data_type), ('\'=HYPERLINK("http://evil","x")', 's'))
+        self.assertEqual(sheet.cell(row=2, column=header.index('City') + 1).value, "'@SUM(1)")
+        self.assertEqual(sheet.cell(row=3, column=header.index('Full Name') + 1).data_type, 's')
+
+    def test_vote_export_with_lodge_and_level(self):
+        rows = self.read_csv(self.client.get(reverse('export_votes'), {'lodge': self.other_lodge.pk}))
+
+        self.assertEqual(rows[0][:5], ['Candidate', 'Candidate Email', 'Stage', 'Level', 'Lodge'])
+        self.assertEqual(rows[1:], [[
+            'Drita Berisha', 'c1@example.com', 'Final Voting', 'Grand Lodge Level', 'Iliria', 'secretary', 'Approve',
+            rows[1][7], '',
+        ]])
+        self.assertEqual(self.client.get(reverse('export_votes'), {'lodge': 'x'}).status_code, 400)
+
+    def test_lodge_roster_export(self):
+        User.objects.create_user('visitor')
+
+        rows = self.read_csv(self.client.get(reverse('export_members'), {'lodge': self.lodge.pk}))
+        self.assertEqual([row[:3] for row in rows[1:]], [['secretary', 'Sara', 'Hoxha']])
+        self.assertEqual(rows[1][4], 'Secretary')
+        self.assertEqual(len(self.read_csv(self.client.get(reverse('export_members')))), 3)
+
+    def test_requires_secretary_or_dignitary(self):
+        self.client.force_login(User.objects.create_user('member'))
+        for name in ('applicants_export', 'export_votes', 'export_members'):
+            self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretary', position='SE')
+        cls.lodge = Lodge.objects.create(name='Dardania')
+        cls.lodge.members.add(cls.secretary, User.objects.create_user('member'))
+        Lodge.objects.create(name='Iliria')
+        cls.candidates = [
+            Candidate.objects.create(
+                email=f"c{i}@example.com", full_name=f"Candidate {i}",
+                application_date=datetime(2025, 1, i + 1, tzinfo=dt_timezone.utc),
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.secretary)
+
+    def test_candidates_projection_and_cursor_pages(self):
+        url = reverse('api_candidates')
+        response = self.client.get(url, {'fields': 'id,full_name', 'sort': 'application_date', 'page_size': 2})
+        pages = [response.json()]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).json())
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(pages[0]['results'][0], {'id': self.candidates[0].pk, 'full_name': 'Candidate 0'})
+        self.assertEqual(
+            [row['full_name'] for page in pages for row in page['results']], [f"Candidate {i}" for i in range(5)]
+        )
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+        self.assertEqual(self.client.get(url, {'fields': 'id,password'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'sort': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 400)
+
+    def test_unchanged_poll_gets_not_modified(self):
+        url = reverse('api_candidates')
+        response = self.client.get(url, {'stage': 'APPLIED'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+        # session, user and the validator's count and newest change; no page query
+        with self.assertNumQueries(4):
+            cached = self.client.get(url, {'stage': 'APPLIED'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        change_stage([self.candidates[0].pk], 'DOCUMENTS')
+        changed = self.client.get(url, {'stage': 'APPLIED'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()['results']), 4)
+        self.assertEqual(self.client.get(url, {'stage': 'DOCUMENTS'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_candidate_detail_with_documents_and_tallies(self):
+        candidate = self.candidates[0]
+        url = reverse('api_candidate_detail', args=[candidate.pk])
+        document = Document.objects.create(candidate=candidate, name='CV', file='cv.pdf')
+        response = self.client.get(url, {'fields': 'full_name,current_stage'})
+
+        data = response.json()
+        self.assertEqual((data['full_name'], data['current_stage']), ('Candidate 0', 'APPLIED'))
+        self.assertNotIn('email', data)
+        self.assertEqual(data['documents'][0]['id'], document.pk)
+        self.assertEqual(data['documents'][0]['url'], reverse('file_download', args=['cv.pdf']))
+        self.assertEqual(data['tallies'], [])
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, {'fields': 'full_name,current_stage'}, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        Vote.objects.create(candidate=candidate, voter=self.secretary, lodge=self.lodge, vote='APPROVE', stage='VOTING')
+        response = self.client.get(url, {'fields': 'full_name,current_stage'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tallies'], [{
+            'stage': 'VOTING', 'vote_level': 'LODGE', 'approve': 1, 'reject': 0, 'abstain': 0, 'total': 1,
+        }])
+        self.assertEqual(self.client.get(reverse('api_candidate_detail', args=[0])).status_code, 404)
+
+    def test_lodges_with_member_counts(self):
+        response = self.client.get(reverse('api_lodges'))
+
+        self.assertEqual([(row['name'], row['member_count']) for row in response.json()['results']],
+                         [('Dardania', 2), ('Iliria', 0)])
+        self.assertEqual(self.client.get(reverse('api_lodges'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Lodge.objects.get(name='Iliria').members.add(self.secretary)
+        self.assertEqual(self.client.get(reverse('api_lodges'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_votes_are_for_secretaries_and_dignitaries(self):
+        vote = Vote.objects.create(candidate=self.candidates[1], voter=self.secretary, lodge=self.lodge,
+                                   vote='REJECT', stage='VOTING')
+        response = self.client.get(reverse('api_votes'), {'lodge': self.lodge.pk, 'fields': 'id,vote'})
+        self.assertEqual(response.json()['results'], [{'id': vote.pk, 'vote': 'REJECT'}])
+
+        vote.vote = 'APPROVE'
+        vote.save()
+        self.assertEqual(
+            self.client.get(reverse('api_votes'), {'lodge': self.lodge.pk, 'fields': 'id,vote'},
+                            HTTP_IF_NONE_MATCH=response['ETag']).json()['results'],
+            [{'id': vote.pk, 'vote': 'APPROVE'}],
+        )
+
+        self.client.force_login(User.objects.get(username='member'))
+        self.assertEqual(self.client.get(reverse('api_votes')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api_candidates')).status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_candidates')).status_code, 403)
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.secretary = User.objects.create_user('secretary', position='SE')
+        cls.member = User.objects.create_user('member')
+        cls.lodge = Lodge.objects.create(name='Dardania')
+        cls.candidate = Candidate.objects.create(email='a@example.com', full_name='Arta Krasniqi')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.secretary)
+        self.url = reverse('candidate_detail', args=[self.candidate.pk])
+
+    def stats(self, name):
+        return next(stats for stats in get_fragment_stats() if stats['name'] == name)
+
+    def test_warm_fragment_skips_its_queries(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(self.url)
+
+        self.assertContains(response, 'Arta Krasniqi')
+        self.assertLess(len(warm), len(cold))
+        self.assertEqual(self.stats('candidate_detail'), {'name': 'candidate_detail', 'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_documents_votes_and_stage_changes_invalidate_the_fragment(self):
+        self.client.get(self.url)
+
+        Document.objects.create(candidate=self.candidate, name='Curriculum vitae', file='cv.pdf')
+        self.assertContains(self.client.get(self.url), 'Curriculum vitae')
+
+        version = get_version(f"candidate:{self.candidate.pk}")
+        Vote.objects.create(candidate=self.candidate, voter=self.member, lodge=self.lodge, stage='VOTING', vote='APPROVE')
+        self.assertGreater(get_version(f"candidate:{self.candidate.pk}"), version)
+
+        # A batch UPDATE sends no signals; the new last_updated changes the key
+        change_stage([self.candidate.pk], 'DOCUMENTS')
+        self.assertContains(self.client.get(self.url), '<span class="badge bg-gold text-dark">Document Review</span>')
+        self.assertEqual(self.stats('candidate_detail')['hits'], 0)
+
+    def test_edit_form_stays_out_of_the_shared_fragment(self):
+        self.client.get(self.url)
+        self.assertContains(self.client.get(self.url), 'editProfileModal')
+
+        self.client.force_login(self.member)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Arta Krasniqi')
+        self.assertNotContains(response, 'editProfileModal')
+        self.assertEqual(self.stats('candidate_detail')['hits'], 2)
+
+    def test_lodge_fragment_follows_lodge_and_membership_changes(self):
+        name = f"lodge:{self.lodge.pk}"
+        url = reverse('lodge_detail', args=[self.lodge.pk])
+        self.client.get(url)
+
+        self.lodge.name = 'Iliria'
+        self.lodge.save()
+        self.assertContains(self.client.get(url), 'Iliria')
+
+        for change in (
+            lambda: self.lodge.members.add(self.member),
+            lambda: self.member.lodges.remove(self.lodge),
+            lambda: self.member.lodges.add(self.lodge),
+            lambda: self.member.lodges.clear(),
+        ):
+            version = get_version(name)
+            change()
+            self.assertGreater(get_version(name), version)
+
+    def test_stats_endpoint(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats = self.client.get(reverse('fragment_cache_stats')).json()['fragments']
+        self.assertEqual([row['name'] for row in stats], ['candidate_detail', 'lodge_detail'])
+        self.assertEqual(stats[0]['hit_ratio'], 0.5)
+        self.assertIsNone(stats[1]['hit_ratio'])
+
+        self.assertEqual(self.client.post(reverse('fragment_cache_stats')).json()['fragments'][0]['hits'], 0)
+
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('fragment_cache_stats')).status_code, 403)
+
+
+class LodgeRosterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lodge = Lodge.objects.create(name='Dardania')
+        cls.other = Lodge.objects.create(name='Iliria')
+        cls.master = User.objects.create_user('master', first_name='Agim', last_name='Berisha', position='MN')
+        cls.secretary = User.objects.create_user('secretary', first_name='Besa', last_name='Gashi', position='SE')
+        # Listed through primary_lodge alone, and through both
+        cls.primary = User.objects.create_user('primary', position='Antare', primary_lodge=cls.lodge, is_active=False)
+        cls.lodge.members.add(cls.master, cls.secretary, cls.primary)
+        cls.other.members.add(cls.secretary, User.objects.create_user('outsider', position='Antare'))
+
+        cls.open = Candidate.objects.create(email='open@example.com', full_name='Open', current_stage='VOTING')
+        cls.accepted = Candidate.objects.create(email='done@example.com', full_name='Done', current_stage='ACCEPTED')
+        cls.elsewhere = Candidate.objects.create(email='else@example.com', full_name='Elsewhere', current_stage='VOTING')
+        for voter, vote in ((cls.master, 'APPROVE'), (cls.secretary, 'REJECT')):
+            Vote.objects.create(candidate=cls.open, voter=voter, lodge=cls.lodge, stage='VOTING', vote=vote)
+            Vote.objects.create(candidate=cls.accepted, voter=voter, lodge=cls.lodge, stage='VOTING', vote=vote)
+        Vote.objects.create(candidate=cls.elsewhere, voter=cls.secretary, lodge=cls.other, stage='VOTING', vote='APPROVE')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('lodge_detail', args=[self.lodge.pk])
+        self.client.force_login(self.secretary)
+
+    def test_summary(self):
+        with self.assertNumQueries(3):
+            summary = compute_lodge_summary(self.lodge.pk)
+
+        self.assertEqual(
+            (summary['member_count'], summary['active_count'], summary['new_count']), (3, 2, 3)
+        )
+        self.assertEqual(
+            [(row['label'], row['count']) for row in summary['positions']],
+            [('Worshipful Master', 1), ('Secretary', 1), ('Regular Member', 1)],
+        )
+        self.assertEqual(
+            [(officer['label'], officer['name']) for officer in summary['officers']],
+            [('Worshipful Master', 'Agim Berisha'), ('Secretary', 'Besa Gashi')],
+        )
+        [candidate] = summary['under_review']
+        self.assertEqual(
+            (candidate['full_name'], candidate['stage_label'], candidate['votes'], candidate['approvals'], candidate['rejections']),
+            ('Open', 'Final Voting', 2, 1, 1),
+        )
+
+    def test_page_queries_do_not_grow_with_the_lodge(self):
+        def cold_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        small = cold_queries()
+        users = User.objects.bulk_create(
+            [User(username=f"member{i}", position='Antare', primary_lodge=self.other) for i in range(ROSTER_PAGE_SIZE + 10)]
+        )
+        self.lodge.members.add(*users)
+        self.assertEqual(cold_queries(), small)
+
+        response = self.client.get(self.url, {'page': 2})
+        self.assertContains(response, f"of {ROSTER_PAGE_SIZE + 13} members")
+        # Primary lodge and memberships
+        self.assertContains(response, '<td>Iliria</td>', html=True)
+        self.assertContains(response, '<td>Dardania</td>', html=True)
+        # Officers come first
+        self.assertContains(self.client.get(self.url), '<td>Agim Berisha</td>', html=True)
+        self.assertNotContains(response, '<td>Agim Berisha</td>', html=True)
+        # No placeholder lodge details
+        self.assertNotContains(response, 'KS-001')
+
+    def test_summary_follows_member_vote_and_stage_changes(self):
+        def summary():
+            return get_lodge_summary(self.lodge.pk)
+
+        self.assertEqual(summary()['member_count'], 3)
+        with self.assertNumQueries(0):
+            summary()
+
+        self.master.position = 'MB1'
+        self.master.save()
+        self.assertEqual(summary()['officers'][0]['label'], 'Senior Warden')
+
+        self.primary.primary_lodge = self.other
+        self.primary.save()
+        self.assertEqual(get_lodge_summary(self.other.pk)['member_count'], 3)
+        self.primary.lodges.remove(self.lodge)
+        self.assertEqual(summary()['member_count'], 2)
+
+        self.secretary.delete()
+        self.assertEqual(summary()['member_count'], 1)
+
+        self.open.current_stage = 'ACCEPTED'
+        self.open.save()
+        self.assertEqual(summary()['under_review'], [])
+
+        Vote.objects.create(candidate=self.elsewhere, voter=self.master, lodge=self.lodge, stage='VOTING', vote='APPROVE')
+        self.assertEqual([row['full_name'] for row in summary()['under_review']], ['Elsewhere'])
+
+        change_stage([self.elsewhere.pk], 'LODGE_REVIEW')
+        self.assertEqual(summary()['under_review'][0]['stage_label'], 'Lodge Review')
+
+    def test_logins_leave_the_summary_cached(self):
+        get_lodge_summary(self.lodge.pk)
+        self.client.logout()
+        self.master.set_password('secret')
+        self.master.save(update_fields=['password'])
+        version = get_version(f"lodge:{self.lodge.pk}")
+        self.assertTrue(self.client.login(username='master', password='secret'))
+        self.assertEqual(get_version(f"lodge:{self.lodge.pk}"), version)
+
+
+class LodgeCalendarTests(TestCase):
+    @staticmethod
+    def at(day, hour=18):
+        return datetime(2025, 3, day, hour, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lodge = Lodge.objects.create(name='Dardania')
+        cls.other = Lodge.objects.create(name='Iliria')
+        cls.secretary = User.objects.create_user('secretary', position='SE')
+        cls.meeting = LodgeEvent.objects.create(
+            lodge=cls.lodge, title='March meeting', start=cls.at(19), end=cls.at(19, 21), location='Main Temple, Pristina',
+            description='Agenda; elections, budget\nand more',
+        )
+        # Started in February, still running on March 1st
+        cls.retreat = LodgeEvent.objects.create(
+            lodge=cls.lodge, kind='DEGREE', title='Degree retreat', start=datetime(2025, 2, 27, tzinfo=dt_timezone.utc),
+            end=cls.at(2),
+        )
+        LodgeEvent.objects.create(lodge=cls.lodge, title='April meeting', start=datetime(2025, 4, 16, 18, tzinfo=dt_timezone.utc))
+        LodgeEvent.objects.create(lodge=cls.other, title='Other lodge', start=cls.at(12))
+        cls.candidate = Candidate.objects.create(email='a@example.com', full_name='Arta', interview_date=cls.at(5, 10))
+        cls.interview = LodgeEvent.objects.create(
+            lodge=cls.lodge, kind='INTERVIEW', title='Interview: Arta', candidate=cls.candidate,
+            start=cls.at(5, 10), end=cls.at(5, 11),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.feed_url = reverse('lodge_events', args=[self.lodge.pk])
+        self.ics_url = reverse('lodge_calendar', args=[self.lodge.pk])
+
+    def test_feed_returns_the_events_overlapping_the_range(self):
+        self.client.force_login(self.secretary)
+        with self.assertNumQueries(3):  # session, user, events
+            response = self.client.get(self.feed_url, {'start': '2025-03-01T00:00:00+00:00', 'end': '2025-04-01'})
+        events = response.json()
+        self.assertEqual([event['title'] for event in events], ['Degree retreat', 'Interview: Arta', 'March meeting'])
+        self.assertEqual(events[2]['start'], '2025-03-19T18:00:00+00:00')
+        self.assertEqual(events[2]['extendedProps']['location'], 'Main Temple, Pristina')
+        self.assertEqual(events[1]['url'], reverse('candidate_detail', args=[self.candidate.pk]))
+
+        for params in ({}, {'start': '2025-03-01', 'end': 'soon'}, {'start': '2025-04-01', 'end': '2025-03-01'},
+                       {'start': '2020-01-01', 'end': '2025-01-01'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.feed_url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+        self.client.logout()
+        self.assertEqual(self.client.get(self.feed_url).status_code, 302)
+
+    def test_ics_is_cached_and_revalidated_with_one_query(self):
+        url = f"{self.ics_url}?token={calendar_token(self.secretary, self.lodge.pk)}"
+        with mock.patch.object(django_timezone, 'now', return_value=self.at(1)):
+            response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        content = response.content.decode()
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n'))
+        self.assertIn('X-WR-CALNAME:Dardania\r\n', content)
+        self.assertIn('DTSTART:20250319T180000Z\r\nDTEND:20250319T210000Z\r\n', content)
+        self.assertIn('LOCATION:Main Temple\\, Pristina\r\n', content)
+        self.assertIn('DESCRIPTION:Agenda\\; elections\\, budget\\nand more\r\n', content)
+        self.assertNotIn('Other lodge', content)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in content.split('\r\n')))
+
+        # No session and no events: the token's user is checked and the cached ETag answers the poll
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        etag = response['ETag']
+        self.meeting.title = 'March meeting (moved)'
+        self.meeting.save()
+        with mock.patch.object(django_timezone, 'now', return_value=self.at(1)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:March meeting (moved)', response.content.decode())
+
+    def test_ics_needs_a_token_or_a_session(self):
+        def status(token):
+            return self.client.get(self.ics_url, {'token': token}).status_code
+
+        token = calendar_token(self.secretary, self.lodge.pk)
+        self.assertEqual(status(token), 200)
+        self.assertEqual(status(calendar_token(self.secretary, self.other.pk)), 302)
+        self.assertEqual(status(token.replace(f"{self.secretary.pk}:", f"{self.secretary.pk + 1}:", 1)), 302)
+        self.assertEqual(self.client.get(self.ics_url).status_code, 302)
+
+        self.client.force_login(self.secretary)
+        self.assertEqual(self.client.get(self.ics_url).status_code, 200)
+        self.assertEqual(self.client.get(reverse('lodge_calendar', args=[999])).status_code, 404)
+
+        # Resetting revokes the user's links; deactivating the user does too
+        response = self.client.post(reverse('calendar_token_reset', args=[self.lodge.pk]))
+        self.assertRedirects(response, reverse('lodge_detail', args=[self.lodge.pk]), fetch_redirect_response=False)
+        self.client.logout()
+        self.assertEqual(status(token), 302)
+        self.secretary.refresh_from_db()
+        token = calendar_token(self.secretary, self.lodge.pk)
+        self.assertEqual(status(token), 200)
+        self.secretary.is_active = False
+        self.secretary.save()
+        self.assertEqual(status(token), 302)
+
+    def test_long_lines_are_folded(self):
+        self.meeting.description = 'ë' * 100
+        self.meeting.save()
+        self.client.force_login(self.secretary)
+        with mock.patch.object(django_timezone, 'now', return_value=self.at(1)):
+            content = self.client.get(self.ics_url).content.decode()
+        folded = content.split('DESCRIPTION:')[1].split('\r\nEND:VEVENT')[0]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', ''), 'ë' * 100)
+
+    def test_interviews_follow_the_candidate(self):
+        self.candidate.interview_date = self.at(7, 14)
+        self.candidate.save()
+        self.interview.refresh_from_db()
+        self.assertEqual((self.interview.start, self.interview.end), (self.at(7, 14), self.at(7, 15)))
+
+        self.candidate.interview_date = None
+        self.candidate.save(update_fields=['current_stage'])
+        self.assertTrue(LodgeEvent.objects.filter(pk=self.interview.pk).exists())
+        self.candidate.save()
+        self.assertFalse(LodgeEvent.objects.filter(pk=self.interview.pk).exists())
+
+    def test_lodge_page_shows_the_last_and_next_meeting(self):
+        self.client.force_login(self.secretary)
+        with mock.patch.object(django_timezone, 'now', return_value=self.at(25)):
+            response = self.client.get(reverse('lodge_detail', args=[self.lodge.pk]))
+        self.assertContains(response, '<p class="lodge-name">March meeting</p>', html=True)
+        self.assertContains(response, '<p class="lodge-name">April meeting</p>', html=True)
+        self.assertContains(response, f"?token={calendar_token(self.secretary, self.lodge.pk)}")
+
+        # The lodge fragment is cached; the link is still the viewer's own
+        member = User.objects.create_user('member', position='Antare')
+        self.client.force_login(member)
+        with mock.patch.object(django_timezone, 'now', return_value=self.at(25)):
+            response = self.client.get(reverse('lodge_detail', args=[self.lodge.pk]))
+        self.assertContains(response, f"?token={calendar_token(member, self.lodge.pk)}")
+        self.assertNotContains(response, calendar_token(self.secretary, self.lodge.pk))
+
+    def test_clean(self):
+        for event, field in (
+            (LodgeEvent(lodge=self.lodge, kind='INTERVIEW', title='x', start=self.at(1)), 'candidate'),
+            (LodgeEvent(lodge=self.lodge, title='x', start=self.at(2), end=self.at(1)), 'end'),
+            (LodgeEvent(lodge=self.lodge, title='x', start=self.at(1), end=self.at(10)), 'end'),
+        ):
+            with self.subTest(field=field), self.assertRaises(ValidationError) as caught:
+                event.full_clean()
+            self.assertIn(field, caught.exception.message_dict)
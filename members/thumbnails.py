@@ -0,0 +1,166 @@
+"""
+Thumbnails and previews of uploaded documents.
+
+Images and PDFs get size-bounded derivatives (``DERIVATIVES``) in WebP, or
+JPEG when Pillow was built without WebP. PDFs are previewed from their first
+page, rendered by poppler's ``pdftoppm`` when it is installed; without it
+they simply have no derivatives.
+
+Derivatives are stored next to their original, under a name carrying the
+original's content digest, the kind and ``DERIVATIVE_VERSION``::
+
+    blobs/3f/a2/3fa2...c9.thumb-v1.webp
+
+so new content or new sizes get a new URL and browsers may cache every
+derivative for good. They are generated in a thread pool once the upload
+commits (``enqueue_derivatives``) and, if still missing, on first request
+(``ensure_derivative``). Pillow releases the GIL while decoding and resizing,
+so threads are enough.
+"""
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+from .storage import blob_storage, file_extension
+
+logger = logging.getLogger(__name__)
+
+# Kind -> bounding box; images are scaled down to fit, never up
+DERIVATIVES = {
+    'thumb': (240, 240),
+    'preview': (1200, 1200),
+}
+# Bump when DERIVATIVES or the encoding change, so stale derivatives get new names
+DERIVATIVE_VERSION = 1
+QUALITY = 80
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+PDF_EXTENSIONS = {'.pdf'}
+
+_DERIVATIVE_RE = re.compile(r'^(?P<base>.+)\.(?P<kind>[a-z]+)-v(?P<version>\d+)\.(?:webp|jpg)$')
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def _format():
+    return ('WEBP', '.webp') if features.check('webp') else ('JPEG', '.jpg')
+
+
+def derivative_name(name, kind):
+    return f"{os.path.splitext(name)[0]}.{kind}-v{DERIVATIVE_VERSION}{_format()[1]}"
+
+
+def original_base(name):
+    """Name without extension of the original a current derivative belongs to, or None"""
+    match = _DERIVATIVE_RE.match(name)
+    if match and match['kind'] in DERIVATIVES and int(match['version']) == DERIVATIVE_VERSION:
+        return match['base']
+    return None
+
+
+def can_derive(name):
+    extension = file_extension(name or '')
+    return extension in IMAGE_EXTENSIONS or (extension in PDF_EXTENSIONS and shutil.which('pdftoppm') is not None)
+
+
+def derivative_url(name, kind):
+    """URL of derivative ``kind`` of the stored file ``name``, or None when it cannot have one"""
+    if not can_derive(name):
+        return None
+    return reverse('file_derivative', kwargs={'kind': kind, 'name': name})
+
+
+def _open_first_page(path, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(
+            ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png', '-scale-to', str(max(size)),
+             path, os.path.join(tmp, 'page')],
+            check=True, capture_output=True, timeout=60,
+        )
+        image = Image.open(os.path.join(tmp, 'page.png'))
+        image.load()
+        return image
+
+
+def _open_image(path, size):
+    image = Image.open(path)
+    # Lets the JPEG decoder scale down while decoding, far cheaper for large scans
+    image.draft('RGB', size)
+    return ImageOps.exif_transpose(image)
+
+
+def generate_derivative(name, kind):
+    """Write derivative ``kind`` of ``name``; returns its name, or None when the file has none"""
+    if not can_derive(name):
+        return None
+    size = DERIVATIVES[kind]
+    source = blob_storage.path(name)
+    try:
+        if file_extension(name) in PDF_EXTENSIONS:
+            image = _open_first_page(source, size)
+        else:
+            image = _open_image(source, size)
+        image.thumbnail(size)
+    except (OSError, Image.DecompressionBombError, subprocess.SubprocessError):
+        logger.warning("Cannot create the %s of %s", kind, name, exc_info=True)
+        return None
+
+    image_format, _ = _format()
+    if image.mode not in ('RGB', 'RGBA') or (image.mode == 'RGBA' and image_format == 'JPEG'):
+        image = image.convert('RGB')
+    target = derivative_name(name, kind)
+    path = blob_storage.path(target)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, format=image_format, quality=QUALITY)
+        # Readers see either no derivative or a complete one
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return target
+
+
+def ensure_derivative(name, kind):
+    """Name of derivative ``kind`` of ``name``, generated now if missing; None when it cannot have one"""
+    if not can_derive(name):
+        return None
+    target = derivative_name(name, kind)
+    if blob_storage.exists(target):
+        return target
+    return generate_derivative(name, kind)
+
+
+def _generate_all(name):
+    for kind in DERIVATIVES:
+        try:
+            ensure_derivative(name, kind)
+        except Exception:
+            logger.exception("Creating the %s of %s crashed", kind, name)
+
+
+def enqueue_derivatives(name):
+    """Create every derivative of ``name`` in the worker pool once the current transaction commits"""
+    if can_derive(name):
+        transaction.on_commit(lambda: _get_executor().submit(_generate_all, name))
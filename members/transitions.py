@@ -0,0 +1,163 @@
+"""
+Queries over the StageTransition log.
+
+Each transition records the time the candidate spent in the stage it left
+(``duration``), so the time in a stage is a plain column and percentiles
+over it are one window query: transitions out of each stage are numbered by
+duration (ROW_NUMBER) and counted (COUNT OVER), and only the rows at the
+requested ranks come back. The (from_stage, changed_at, duration) index
+covers the date range filter and the sort.
+
+``change_stage`` moves many candidates at once: one UPDATE and one bulk
+INSERT into the log, instead of a save and its signal handlers per candidate.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import Lead, RowNumber
+from django.utils import timezone
+
+from .cache import bump_version, invalidate_pipeline_stats
+from .models import Candidate, StageTransition, Vote
+
+DEFAULT_PERCENTILES = (50, 90, 95)
+
+# Stage -> stages a batch may move it to: one step either way along the
+# pipeline, rejection of any open application and reopening a rejected one
+ALLOWED_TRANSITIONS = {
+    'APPLIED': {'DOCUMENTS', 'REJECTED'},
+    'DOCUMENTS': {'APPLIED', 'INTERVIEW', 'REJECTED'},
+    'INTERVIEW': {'DOCUMENTS', 'LODGE_REVIEW', 'REJECTED'},
+    'LODGE_REVIEW': {'INTERVIEW', 'VOTING', 'REJECTED'},
+    'VOTING': {'LODGE_REVIEW', 'ACCEPTED', 'REJECTED'},
+    'ACCEPTED': {'VOTING'},
+    'REJECTED': {'APPLIED'},
+}
+STAGE_LABELS = dict(Candidate.STAGE_CHOICES)
+
+
+class StageChangeResult:
+    """Ids of the candidates a batch moved and ``(id, reason)`` of those it left alone"""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.changed = []
+        self.skipped = []
+
+    @property
+    def status_message(self):
+        status_message = []
+        if self.changed:
+            status_message.append(f"Moved {len(self.changed)} candidates to {STAGE_LABELS[self.stage]}")
+        if self.skipped:
+            status_message.append(f"Skipped {len(self.skipped)} candidates")
+        return ' | '.join(status_message) or 'No candidates selected'
+
+
+def change_stage(candidates, stage, user=None):
+    """
+    Move ``candidates`` (a queryset or ids) to ``stage`` where
+    ALLOWED_TRANSITIONS permits it, in one transaction: a single UPDATE of
+    the candidates and one bulk insert of their StageTransitions. Bypasses
+    Candidate.save and its signal handlers.
+    """
+    if stage not in STAGE_LABELS:
+        raise ValueError(f"Unknown stage {stage!r}")
+    result = StageChangeResult(stage)
+    with transaction.atomic():
+        rows = (
+            Candidate.objects.select_for_update()
+            .filter(pk__in=candidates)
+            .order_by('pk')
+            .values_list('pk', 'full_name', 'current_stage', 'stage_changed_at')
+        )
+        entered = {}
+        for pk, full_name, current_stage, stage_changed_at in rows:
+            if current_stage == stage:
+                result.skipped.append((pk, f"{full_name} is already in {STAGE_LABELS[stage]}"))
+            elif stage not in ALLOWED_TRANSITIONS[current_stage]:
+                result.skipped.append(
+                    (pk, f"{full_name} cannot move from {STAGE_LABELS[current_stage]} to {STAGE_LABELS[stage]}")
+                )
+            else:
+                entered[pk] = (current_stage, stage_changed_at)
+        if not entered:
+            return result
+
+        now = timezone.now()
+        Candidate.objects.filter(pk__in=list(entered)).update(
+            current_stage=stage, stage_changed_at=now, last_updated=now
+        )
+        StageTransition.objects.bulk_create(
+            [
+                StageTransition(
+                    candidate_id=pk, from_stage=from_stage, to_stage=stage, changed_at=now,
+                    duration=now - stage_changed_at, changed_by=user,
+                )
+                for pk, (from_stage, stage_changed_at) in entered.items()
+            ],
+            batch_size=1000,
+        )
+        result.changed = list(entered)
+    invalidate_pipeline_stats()
+    # Rosters of the lodges that voted on them list the candidates' stages
+    for lodge_id in Vote.objects.filter(candidate__in=result.changed).values_list('lodge', flat=True).distinct():
+        bump_version(f"lodge:{lodge_id}")
+    return result
+
+
+def candidate_timeline(candidate):
+    """
+    Transitions of ``candidate``, oldest first, each annotated with
+    ``left_at``: when the candidate moved on, None for the current stage
+    """
+    order = [F('changed_at').asc(), F('id').asc()]
+    return (
+        StageTransition.objects.filter(candidate=candidate)
+        .select_related('changed_by')
+        .annotate(left_at=Window(Lead('changed_at'), order_by=order))
+        .order_by(*order)
+    )
+
+
+def _rank(percentile):
+    # Nearest rank, ceil(total * percentile / 100), in integer arithmetic
+    return (F('total') * percentile + 99) / 100
+
+
+def stage_duration_percentiles(start=None, end=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Nearest-rank ``percentiles`` (whole numbers 1-100) of the time spent in
+    each stage by candidates who left it between ``start`` (inclusive) and
+    ``end`` (exclusive)::
+
+        {'LODGE_REVIEW': {'count': 412, 'percentiles': {50: timedelta(...), 90: ...}}, ...}
+
+    Stages nobody left in the range are missing.
+    """
+    percentiles = sorted(set(percentiles))
+    if not percentiles or not all(1 <= p <= 100 for p in percentiles):
+        raise ValueError("Percentiles must be whole numbers between 1 and 100")
+
+    # IN over every stage lets the range on changed_at use the index too
+    transitions = StageTransition.objects.filter(from_stage__in=[code for code, _ in Candidate.STAGE_CHOICES])
+    if start is not None:
+        transitions = transitions.filter(changed_at__gte=start)
+    if end is not None:
+        transitions = transitions.filter(changed_at__lt=end)
+    ranked = (
+        transitions.order_by()
+        .annotate(
+            position=Window(RowNumber(), partition_by=[F('from_stage')], order_by=F('duration').asc()),
+            total=Window(Count('*'), partition_by=[F('from_stage')]),
+        )
+        .filter(Q(*[Q(position=_rank(p)) for p in percentiles], _connector=Q.OR))
+        .values_list('from_stage', 'duration', 'position', 'total')
+    )
+
+    stats = {}
+    for stage, duration, position, total in ranked:
+        stage_stats = stats.setdefault(stage, {'count': total, 'percentiles': {}})
+        for p in percentiles:
+            if (total * p + 99) // 100 == position:
+                stage_stats['percentiles'][p] = duration
+    return stats
@@ -0,0 +1,124 @@
+"""
+Chunked, resumable uploads.
+
+A client announces a file (``start_upload``), sends it in numbered chunks of
+``chunk_size`` bytes together with each chunk's SHA-256 (``write_chunk``) and
+finishes with ``complete_upload``:
+
+    POST /uploads/                      {"filename": ..., "size": ...}
+    PUT  /uploads/<id>/chunks/<n>/      chunk bytes, X-Chunk-SHA256: <hex>
+    POST /uploads/<id>/complete/
+    GET  /uploads/<id>/                 received chunks, to resume
+
+Chunks are written straight to their offset in a part file of the final size
+under blobs/tmp, so they may arrive in any order, in parallel or again after
+a dropped connection. Completing hashes the part file and renames it into the
+content-addressed store (members.storage) without copying it. The document and
+bulk upload forms then take the upload's id in place of a file.
+"""
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .models import ChunkedUpload, UploadChunk
+from .storage import CHUNK_SIZE, TEMP_DIR, blob_storage
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+_CHECKSUM_RE = re.compile(r'[0-9a-f]{64}')
+
+
+class UploadError(Exception):
+    """A request the upload cannot accept; the message is meant for the client"""
+
+
+def part_path(upload):
+    return blob_storage.path(f"{TEMP_DIR}/upload-{upload.pk}.part")
+
+
+def start_upload(user, filename, size):
+    max_size = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+    if not isinstance(size, int) or not 0 < size <= max_size:
+        raise UploadError(f"size must be between 1 and {max_size} bytes")
+    filename = os.path.basename(str(filename or '')).strip()
+    if not filename:
+        raise UploadError("filename is required")
+    upload = ChunkedUpload.objects.create(
+        user=user, filename=filename[:255], size=size,
+        chunk_size=getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+    )
+    os.makedirs(os.path.dirname(part_path(upload)), exist_ok=True)
+    with open(part_path(upload), 'wb') as f:
+        f.truncate(size)
+    return upload
+
+
+def received_chunks(upload):
+    return list(upload.chunks.order_by('index').values_list('index', flat=True))
+
+
+def write_chunk(upload, index, stream, checksum):
+    """
+    Write chunk ``index`` from the file-like ``stream`` into place and record
+    it if its SHA-256 matches ``checksum``. Sending a chunk again overwrites it.
+    """
+    if upload.status != 'UPLOADING':
+        raise UploadError("The upload is already complete")
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f"Chunk {index} is out of range 0-{upload.chunk_count - 1}")
+    checksum = (checksum or '').lower()
+    if not _CHECKSUM_RE.fullmatch(checksum):
+        raise UploadError("The X-Chunk-SHA256 header must hold the chunk's hex SHA-256")
+
+    expected = upload.chunk_length(index)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path(upload), 'r+b') as f:
+            f.seek(index * upload.chunk_size)
+            # Read one byte past the chunk so an oversized body is noticed
+            while size <= expected and (data := stream.read(min(CHUNK_SIZE, expected + 1 - size))):
+                f.write(data[:expected - size])
+                digest.update(data)
+                size += len(data)
+    except FileNotFoundError:
+        raise UploadError("The upload has expired; start it again")
+    if size != expected:
+        raise UploadError(f"Chunk {index} must be {expected} bytes, got {size if size <= expected else 'more'}")
+    if digest.hexdigest() != checksum:
+        raise UploadError(f"Chunk {index} does not match its checksum; send it again")
+
+    UploadChunk.objects.update_or_create(upload=upload, index=index, defaults={'sha256': checksum})
+    # Keeps gc_blobs away from uploads that are still moving
+    ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+
+
+def complete_upload(upload):
+    """Move the assembled file into the blob store; returns the upload with ``file_name`` set"""
+    if upload.status == 'COMPLETE':
+        return upload
+    missing = sorted(set(range(upload.chunk_count)) - set(received_chunks(upload)))
+    if missing:
+        raise UploadError(f"Missing chunks: {', '.join(map(str, missing[:20]))}")
+    try:
+        upload.file_name = blob_storage.store_file(part_path(upload), upload.filename)
+    except FileNotFoundError:
+        raise UploadError("The upload has expired; start it again")
+    upload.status = 'COMPLETE'
+    upload.save(update_fields=['file_name', 'status', 'updated_at'])
+    upload.chunks.all().delete()
+    return upload
+
+
+def completed_upload(user, upload_id):
+    """The complete upload ``upload_id`` of ``user``, or None"""
+    try:
+        return ChunkedUpload.objects.get(pk=upload_id, user=user, status='COMPLETE')
+    except (ChunkedUpload.DoesNotExist, ValidationError):
+        # Malformed ids raise ValidationError
+        return None
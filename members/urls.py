@@ -1,9 +1,14 @@
 from django.urls import path
 from django.contrib.auth.views import LogoutView
 from .views import (
-    CustomLoginView, HomeView, ApplicantsListView, LodgeDetailView,
-    ControlPanelView, MemberDocumentUploadView, BulkCandidateUploadView,
-    MemberDocumentDeleteView, CandidateDetailView
+    CustomLoginView, HomeView, ApplicantsListView, LodgeDetailView, LodgeEventFeedView, LodgeCalendarView,
+    CalendarTokenResetView,
+    ControlPanelView, PipelineDashboardView, StageDurationsView, FragmentCacheStatsView, MemberDocumentUploadView, BulkCandidateUploadView,
+    MemberDocumentDeleteView, CandidateDetailView, BulkUploadProgressView,
+    ApplicantsExportView, ApplicantsStageView, ApplicantsTypeaheadView, VoteExportView, MemberExportView,
+    FileDownloadView, FileDerivativeView, ChunkedUploadStartView,
+    ApiCandidateListView, ApiCandidateDetailView, ApiLodgeListView, ApiVoteListView,
+    ChunkedUploadView, ChunkedUploadChunkView, ChunkedUploadCompleteView
 )
 
 urlpatterns = [
@@ -14,12 +19,38 @@ urlpatterns = [
         next_page='login'
     ), name='logout'),
     path('applicants/', ApplicantsListView.as_view(), name='applicants'),
+    path('applicants/export/', ApplicantsExportView.as_view(), name='applicants_export'),
+    path('applicants/stage/', ApplicantsStageView.as_view(), name='applicants_stage'),
+    path('applicants/typeahead/', ApplicantsTypeaheadView.as_view(), name='applicants_typeahead'),
     path('applicant/<int:candidate_id>/', CandidateDetailView.as_view(), name='candidate_detail'),
     path('lodge/<int:lodge_id>/', LodgeDetailView.as_view(), name='lodge_detail'),
+    path('lodge/<int:lodge_id>/events/', LodgeEventFeedView.as_view(), name='lodge_events'),
+    path('lodge/<int:lodge_id>/calendar.ics', LodgeCalendarView.as_view(), name='lodge_calendar'),
+    path('lodge/<int:lodge_id>/calendar/reset/', CalendarTokenResetView.as_view(), name='calendar_token_reset'),
     
     # Control Panel URLs
     path('control-panel/', ControlPanelView.as_view(), name='control_panel'),
+    path('control-panel/dashboard/', PipelineDashboardView.as_view(), name='pipeline_dashboard'),
+    path('control-panel/stage-durations/', StageDurationsView.as_view(), name='stage_durations'),
+    path('control-panel/cache-stats/', FragmentCacheStatsView.as_view(), name='fragment_cache_stats'),
+    path('control-panel/export/votes/', VoteExportView.as_view(), name='export_votes'),
+    path('control-panel/export/members/', MemberExportView.as_view(), name='export_members'),
     path('control-panel/upload-document/', MemberDocumentUploadView.as_view(), name='upload_document'),
     path('control-panel/bulk-upload/', BulkCandidateUploadView.as_view(), name='bulk_upload'),
+    path('control-panel/bulk-upload/<int:pk>/progress/', BulkUploadProgressView.as_view(), name='bulk_upload_progress'),
     path('control-panel/document/<int:pk>/delete/', MemberDocumentDeleteView.as_view(), name='delete_document'),
+    path('files/<path:name>', FileDownloadView.as_view(), name='file_download'),
+    path('derivatives/<slug:kind>/<path:name>', FileDerivativeView.as_view(), name='file_derivative'),
+    
+    # Read-only JSON API (members.api)
+    path('api/candidates/', ApiCandidateListView.as_view(), name='api_candidates'),
+    path('api/candidates/<int:candidate_id>/', ApiCandidateDetailView.as_view(), name='api_candidate_detail'),
+    path('api/lodges/', ApiLodgeListView.as_view(), name='api_lodges'),
+    path('api/votes/', ApiVoteListView.as_view(), name='api_votes'),
+    
+    # Chunked uploads (members.uploads)
+    path('uploads/', ChunkedUploadStartView.as_view(), name='chunked_upload_start'),
+    path('uploads/<uuid:pk>/', ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', ChunkedUploadChunkView.as_view(), name='chunked_upload_chunk'),
+    path('uploads/<uuid:pk>/complete/', ChunkedUploadCompleteView.as_view(), name='chunked_upload_complete'),
 ] 
\ No newline at end of file
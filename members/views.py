@@ -1,18 +1,41 @@
 from django.contrib.auth.views import LoginView
-from django.urls import reverse_lazy
-from django.views.generic import TemplateView, ListView, CreateView, DeleteView
-from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Candidate, Lodge, MemberDocument, BulkUpload, User
+from django.urls import reverse, reverse_lazy
+from django.views.generic import TemplateView, ListView, CreateView, DeleteView, View
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin
+from .models import Blob, Candidate, ChunkedUpload, Document, Lodge, MemberDocument, BulkUpload, User, Vote
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from .mixins import SecretaryOrDignitaryRequiredMixin
+from .api import CANDIDATE_FIELDS, LODGE_FIELDS, VOTE_FIELDS, ApiView, keyset_page, parse_fields
+from .cache import (
+    get_fragment_stats, get_lodge_calendar, get_lodge_summary, get_pipeline_stats, get_version, reset_fragment_stats,
+)
+from .calendars import calendar_token, calendar_token_user, feed_events, parse_range
+from .exports import CANDIDATE_COLUMNS, MEMBER_COLUMNS, VOTE_COLUMNS, export_response
+from .jobs import enqueue_bulk_upload
+from .pagination import EstimatedCountPaginator, KeysetPaginator, KnownCountPaginator, estimate_count
+from .rosters import ROSTER_PAGE_SIZE, roster_members
+from .search import candidate_index, prefer_ordered_scan
+from .storage import blob_digest, file_response, is_referenced
+from .thumbnails import DERIVATIVES, ensure_derivative
+from .transitions import DEFAULT_PERCENTILES, candidate_timeline, change_stage, stage_duration_percentiles
+from .voting import stored_tallies
+from .uploads import (
+    UploadError, complete_upload, completed_upload, received_chunks, start_upload, write_chunk,
+)
 from django.contrib import messages
-import pandas as pd
-from django.core.files.storage import FileSystemStorage
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.core.paginator import InvalidPage
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import url_has_allowed_host_and_scheme
 import json
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Count, F, Max
 
 class CustomLoginView(LoginView):
     template_name = 'registration/login.html'
@@ -21,42 +44,192 @@ class CustomLoginView(LoginView):
     def get_success_url(self):
         return reverse_lazy('home')
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['all_lodges'] = Lodge.objects.all()  # Add lodges to context for nav menu
-        return context
-
 class HomeView(LoginRequiredMixin, TemplateView):
     template_name = 'members/home.html'
     login_url = 'login'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['all_lodges'] = Lodge.objects.all()  # Add lodges to context for nav menu
-        return context
-
 class ApplicantsListView(LoginRequiredMixin, ListView):
     model = Candidate
     template_name = 'members/applicants.html'
     context_object_name = 'applicants'
     login_url = 'login'
     paginate_by = 10  # Default page size
+    paginator_class = EstimatedCountPaginator
+    page_sizes = [10, 20, 50, 100]
+    
+    # Sortable columns: ?sort=<key> or ?sort=-<key> -> Candidate field
+    sort_fields = {
+        'name': 'full_name',
+        'email': 'email',
+        'application_date': 'application_date',
+        'stage': 'current_stage',
+        'interview_date': 'interview_date',
+    }
+    default_sort = '-application_date'
     
     def get_paginate_by(self, queryset):
-        # Get page size from request, default to 10
-        return self.request.GET.get('page_size', self.paginate_by)
+        # Get page size from request, default to 10 and never above the largest choice
+        try:
+            page_size = int(self.request.GET.get('page_size', self.paginate_by))
+        except ValueError:
+            return self.paginate_by
+        return min(max(page_size, 1), max(self.page_sizes))
+    
+    def get_sort(self):
+        """Returns (sort key, field name, descending) from ?sort=, falling back to the default"""
+        sort = self.request.GET.get('sort', self.default_sort)
+        key = sort.lstrip('-')
+        if key not in self.sort_fields:
+            sort = self.default_sort
+            key = sort.lstrip('-')
+        return key, self.sort_fields[key], sort.startswith('-')
+    
+    def get_keyset_paginator(self, queryset, page_size):
+        _, field_name, descending = self.get_sort()
+        return KeysetPaginator(queryset, field_name, descending=descending, per_page=page_size)
+    
+    @property
+    def cursor_mode(self):
+        return 'cursor' in self.request.GET or self.request.GET.get('paginate') == 'cursor'
+    
+    @property
+    def search_query(self):
+        return self.request.GET.get('q', '').strip()
     
     def get_queryset(self):
-        return Candidate.objects.all().order_by('-application_date')
+        queryset = Candidate.objects.all()
+        self.search_count = None
+        if self.search_query:
+            # Counted on the search table alone; also decides how the page is found
+            self.search_count = candidate_index.count(self.search_query)
+            ordered_scan = prefer_ordered_scan(
+                self.search_count, estimate_count(queryset) or 0, self.get_paginate_by(None)
+            )
+            queryset = candidate_index.filter(queryset, self.search_query, ordered_scan=ordered_scan)
+        return queryset.order_by(*self.get_keyset_paginator(queryset, self.paginate_by).ordering())
+    
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        if self.search_count is not None:
+            paginator.count = self.search_count
+            paginator.count_is_estimated = False
+        return paginator
+    
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, page_size)
+        # Keyset pagination: deep pages cost the same as the first one
+        try:
+            page = self.get_keyset_paginator(queryset, page_size).page(self.request.GET.get('cursor'))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (None, page, page.object_list, page.has_other_pages())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        sort_key, _, descending = self.get_sort()
+        page_size = self.get_paginate_by(None)
+        
+        query = {'sort': f"{'-' if descending else ''}{sort_key}", 'page_size': page_size}
+        if self.search_query:
+            query['q'] = self.search_query
+        context['numbered_query_string'] = urlencode(query)
+        if self.cursor_mode:
+            query['paginate'] = 'cursor'
+            context['estimated_count'] = (
+                self.search_count if self.search_count is not None else estimate_count(self.object_list)
+            )
+        
         context['stages'] = Candidate.STAGE_CHOICES
-        context['all_lodges'] = Lodge.objects.all()
-        context['page_sizes'] = [10, 20, 50, 100]
-        context['current_page_size'] = int(self.request.GET.get('page_size', self.paginate_by))
+        context['page_sizes'] = self.page_sizes
+        context['current_page_size'] = page_size
+        context['current_sort'] = sort_key
+        context['sort_descending'] = descending
+        context['cursor_mode'] = self.cursor_mode
+        # Batch stage changes (ApplicantsStageView) and exports are open to the same users as the control panel
+        context['can_change_stages'] = SecretaryOrDignitaryRequiredMixin.test_func(self)
+        context['search_query'] = self.search_query
+        context['query_string'] = urlencode(query)
         return context
 
+class ApplicantsExportView(SecretaryOrDignitaryRequiredMixin, ApplicantsListView):
+    """Every applicant matching the list's search, in its sort order: ?format=csv or xlsx"""
+    
+    def get_queryset(self):
+        # Every match is read, so the search table drives the query without counting first
+        queryset = Candidate.objects.all()
+        if self.search_query:
+            queryset = candidate_index.filter(queryset, self.search_query)
+        return queryset.order_by(*self.get_keyset_paginator(queryset, None).ordering())
+    
+    def get(self, request, *args, **kwargs):
+        return export_response(self.get_queryset(), CANDIDATE_COLUMNS, 'candidates', request.GET.get('format'))
+
+class ApplicantsStageView(SecretaryOrDignitaryRequiredMixin, View):
+    """
+    Batch stage change from the applicants list: POST ``candidates`` (ids)
+    and ``stage``; redirects back to ``next``. A JSON body with the same keys
+    gets a JSON report of the changed and skipped candidates instead.
+    """
+    
+    # Skipped candidates named in messages, the rest are counted
+    reported_skips = 10
+    
+    def post(self, request, *args, **kwargs):
+        is_json = request.content_type == 'application/json'
+        try:
+            data = json.loads(request.body) if is_json else {
+                'candidates': request.POST.getlist('candidates'), 'stage': request.POST.get('stage'),
+            }
+            ids = [int(pk) for pk in data.get('candidates') or []]
+            result = change_stage(ids, data.get('stage'), request.user)
+        except (ValueError, TypeError, AttributeError) as e:
+            if is_json:
+                return JsonResponse({'error': str(e) or 'The body must be JSON with candidates and stage'}, status=400)
+            messages.error(request, 'Select candidates and a stage to move them to.')
+            return redirect(self.get_next_url())
+        
+        if is_json:
+            return JsonResponse({
+                'stage': result.stage,
+                'changed': result.changed,
+                'skipped': [{'id': pk, 'reason': reason} for pk, reason in result.skipped],
+            })
+        if result.changed:
+            messages.success(request, result.status_message)
+        for _, reason in result.skipped[:self.reported_skips]:
+            messages.warning(request, reason)
+        if len(result.skipped) > self.reported_skips:
+            messages.warning(request, f"...and {len(result.skipped) - self.reported_skips} more skipped")
+        return redirect(self.get_next_url())
+    
+    def get_next_url(self):
+        url = self.request.POST.get('next')
+        if url and url_has_allowed_host_and_scheme(url, {self.request.get_host()}, self.request.is_secure()):
+            return url
+        return reverse('applicants')
+
+class ApplicantsTypeaheadView(LoginRequiredMixin, View):
+    """JSON suggestions for the applicants search box: ?q=<prefix of name, email, phone or city>"""
+    login_url = 'login'
+    limit = 10
+    
+    def get(self, request, *args, **kwargs):
+        candidates = candidate_index.top(request.GET.get('q', ''), self.limit)
+        return JsonResponse({
+            'results': [
+                {
+                    'id': candidate.pk,
+                    'full_name': candidate.full_name,
+                    'email': candidate.email,
+                    'city': candidate.city,
+                    'stage': candidate.get_current_stage_display(),
+                    'url': reverse('candidate_detail', args=[candidate.pk]),
+                }
+                for candidate in candidates
+            ]
+        })
+
 class CandidateDetailView(LoginRequiredMixin, TemplateView):
     template_name = 'members/candidate_detail.html'
     login_url = 'login'
@@ -64,8 +237,10 @@ class CandidateDetailView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['candidate'] = get_object_or_404(Candidate, id=self.kwargs['candidate_id'])
-        context['all_lodges'] = Lodge.objects.all()
+        context['documents'] = context['candidate'].document_set.order_by('-uploaded_at')
+        context['timeline'] = candidate_timeline(context['candidate'])
         context['stages'] = Candidate.STAGE_CHOICES
+        context['fragment_version'] = get_version(f"candidate:{context['candidate'].pk}")
         return context
     
     def post(self, request, *args, **kwargs):
@@ -83,6 +258,7 @@ class CandidateDetailView(LoginRequiredMixin, TemplateView):
         candidate.social_profile_url = request.POST.get('social_profile_url', candidate.social_profile_url)
         candidate.current_stage = request.POST.get('current_stage', candidate.current_stage)
         candidate.is_kosovo_citizen = request.POST.get('is_kosovo_citizen') == 'on'
+        candidate._changed_by = request.user
         
         try:
             candidate.save()
@@ -93,26 +269,303 @@ class CandidateDetailView(LoginRequiredMixin, TemplateView):
         return redirect('candidate_detail', candidate_id=candidate.id)
 
 class LodgeDetailView(LoginRequiredMixin, TemplateView):
+    """Lodge page with its roster: cached summary (members.rosters) and a page of members"""
     template_name = 'members/lodge_detail.html'
     login_url = 'login'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['lodge'] = get_object_or_404(Lodge, id=self.kwargs['lodge_id'])
-        context['all_lodges'] = Lodge.objects.all()  # Add lodges to context for nav menu
+        lodge = context['lodge'] = get_object_or_404(Lodge, id=self.kwargs['lodge_id'])
+        context['fragment_version'] = get_version(f"lodge:{lodge.pk}")
+        context['summary'] = summary = get_lodge_summary(lodge.pk)
+        # Counted from the summary; the page is only queried when the fragment is rendered
+        paginator = KnownCountPaginator(roster_members(lodge.pk), ROSTER_PAGE_SIZE, count=summary['member_count'])
+        context['paginator'] = paginator
+        context['page_obj'] = paginator.get_page(self.request.GET.get('page'))
+        # Lazy, so they only run when the fragment is rendered; a meeting that
+        # has passed moves to "last" once the fragment expires
+        meetings = lodge.events.filter(kind='MEETING')
+        now = timezone.now()
+        context['last_meeting'] = meetings.filter(start__lt=now).order_by('-start')[:1]
+        context['next_meeting'] = meetings.filter(start__gte=now).order_by('start')[:1]
+        # Per user, so rendered outside the cached fragment
+        context['calendar_token'] = calendar_token(self.request.user, lodge.pk)
         return context
 
+class LodgeEventFeedView(LoginRequiredMixin, View):
+    """FullCalendar JSON feed of a lodge's events: ?start=<date or datetime>&end=<date or datetime>"""
+    
+    def get(self, request, lodge_id):
+        try:
+            start, end = parse_range(request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(feed_events(lodge_id, start, end), safe=False)
+
+class LodgeCalendarView(AccessMixin, View):
+    """
+    iCalendar file of a lodge's events, served from the cache with an ETag.
+    Calendar clients authenticate with a user's ?token= (members.calendars.calendar_token)
+    """
+    login_url = 'login'
+    
+    def dispatch(self, request, *args, **kwargs):
+        # A valid token skips the session lookup as well
+        token = request.GET.get('token')
+        if not (token and calendar_token_user(kwargs['lodge_id'], token)) and not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request, lodge_id):
+        calendar = get_lodge_calendar(lodge_id)
+        if calendar is None:
+            raise Http404("No such lodge")
+        tag, content = calendar
+        response = get_conditional_response(request, etag=tag)
+        if response is None:
+            response = HttpResponse(content, content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="lodge-{lodge_id}.ics"'
+        response['ETag'] = tag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class CalendarTokenResetView(LoginRequiredMixin, View):
+    """POST revokes every calendar subscription URL of the user and returns to the lodge page"""
+    login_url = 'login'
+    
+    def post(self, request, lodge_id):
+        User.objects.filter(pk=request.user.pk).update(calendar_token_version=F('calendar_token_version') + 1)
+        messages.success(request, 'Your old calendar links no longer work; subscribe again with the new one.')
+        return redirect('lodge_detail', lodge_id=lodge_id)
+
 class ControlPanelView(SecretaryOrDignitaryRequiredMixin, TemplateView):
     template_name = 'members/control_panel.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['all_lodges'] = Lodge.objects.all()
         context['recent_documents'] = MemberDocument.objects.select_related('member', 'uploaded_by').order_by('-uploaded_at')[:10]
         context['recent_uploads'] = BulkUpload.objects.select_related('uploaded_by').order_by('-uploaded_at')[:5]
         return context
 
-class MemberDocumentUploadView(SecretaryOrDignitaryRequiredMixin, CreateView):
+class PipelineDashboardView(SecretaryOrDignitaryRequiredMixin, TemplateView):
+    template_name = 'members/dashboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['stats'] = get_pipeline_stats()
+        return context
+
+def start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, datetime.min.time()))
+
+class StageDurationsView(SecretaryOrDignitaryRequiredMixin, View):
+    """
+    JSON percentiles of the time candidates spent in each stage (see
+    members.transitions): ?start=<date>&end=<date>&percentiles=50,90,95,
+    counting candidates who left the stage from start up to and including end
+    """
+    
+    def get_date(self, name):
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+        # Raises ValueError itself for impossible dates such as 2025-02-30
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+        return date
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            start, end = self.get_date('start'), self.get_date('end')
+            percentiles = [int(p) for p in request.GET.get('percentiles', '').split(',') if p] or DEFAULT_PERCENTILES
+            stats = stage_duration_percentiles(
+                start=start and start_of_day(start),
+                end=end and start_of_day(end + timedelta(days=1)),
+                percentiles=percentiles,
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({
+            'start': start and start.isoformat(),
+            'end': end and end.isoformat(),
+            'stages': [
+                {
+                    'stage': code,
+                    'label': label,
+                    'count': stats[code]['count'],
+                    'seconds': {
+                        str(p): duration.total_seconds() for p, duration in stats[code]['percentiles'].items()
+                    },
+                }
+                for code, label in Candidate.STAGE_CHOICES if code in stats
+            ],
+        })
+
+class FragmentCacheStatsView(SecretaryOrDignitaryRequiredMixin, View):
+    """JSON hits, misses and hit ratio of the cached page fragments; POST resets the counters"""
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'fragments': get_fragment_stats()})
+
+    def post(self, request, *args, **kwargs):
+        reset_fragment_stats()
+        return JsonResponse({'fragments': get_fragment_stats()})
+
+def filter_by_params(queryset, params, filters):
+    """Narrow ``queryset`` by each GET parameter in ``filters`` (parameter -> lookup) that has a value"""
+    for param, lookup in filters.items():
+        value = params.get(param)
+        if value:
+            queryset = queryset.filter(**{lookup: value})
+    return queryset
+
+class ExportView(SecretaryOrDignitaryRequiredMixin, View):
+    """
+    Streamed export of ``model`` (see members.exports): ?format=csv or xlsx,
+    narrowed by the GET parameters in ``filters`` (parameter -> lookup)
+    """
+    model = None
+    columns = None
+    name = None
+    ordering = ()
+    filters = {}
+    
+    def get_queryset(self):
+        return filter_by_params(self.model.objects.order_by(*self.ordering), self.request.GET, self.filters)
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            queryset = self.get_queryset()
+        except (ValueError, ValidationError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return export_response(queryset, self.columns, self.name, request.GET.get('format'))
+
+class VoteExportView(ExportView):
+    model = Vote
+    columns = VOTE_COLUMNS
+    name = 'votes'
+    ordering = ('candidate_id', 'stage', 'vote_level', 'id')
+    filters = {
+        'candidate': 'candidate', 'lodge': 'lodge', 'stage': 'stage', 'vote_level': 'vote_level', 'vote': 'vote',
+    }
+
+class MemberExportView(ExportView):
+    """Members, or with ?lodge=<id> the roster of that lodge"""
+    model = User
+    columns = MEMBER_COLUMNS
+    name = 'members'
+    ordering = ('last_name', 'first_name', 'id')
+    filters = {'lodge': 'lodges', 'primary_lodge': 'primary_lodge', 'position': 'position'}
+
+class ApiCandidateListView(ApiView):
+    """
+    Candidates as JSON (see members.api): ?fields=, ?q= and ?sort= as in the
+    applicants list, ?stage=, ?page_size= and ?cursor=
+    """
+    
+    def get_validator(self):
+        sort = self.request.GET.get('sort', ApplicantsListView.default_sort)
+        if sort.lstrip('-') not in ApplicantsListView.sort_fields:
+            raise ValueError(f"Unknown sort: {sort}. Available: {', '.join(ApplicantsListView.sort_fields)}")
+        self.sort_field = ApplicantsListView.sort_fields[sort.lstrip('-')]
+        self.descending = sort.startswith('-')
+        self.fields = parse_fields(self.request.GET.get('fields'), CANDIDATE_FIELDS)
+        
+        self.queryset = filter_by_params(Candidate.objects.all(), self.request.GET, {'stage': 'current_stage'})
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            self.queryset = candidate_index.filter(self.queryset, query)
+        # Saves, stage changes and imports all move last_updated; deletions change the count.
+        # Two queries: SQLite answers COUNT(*) and MAX() from indexes only when they are alone
+        return self.queryset.count(), self.queryset.aggregate(updated=Max('last_updated'))['updated']
+    
+    def get_data(self):
+        return keyset_page(self.request, self.queryset, self.fields, self.sort_field, self.descending)
+
+class ApiCandidateDetailView(ApiView):
+    """One candidate as JSON with its documents and vote tallies; ?fields= narrows the candidate's own columns"""
+    
+    def get_validator(self):
+        self.fields = parse_fields(self.request.GET.get('fields'), CANDIDATE_FIELDS)
+        # Document and vote changes move last_updated too (members.signals.touch_candidate)
+        updated = Candidate.objects.filter(pk=self.kwargs['candidate_id']).values_list('last_updated', flat=True)
+        if not updated:
+            raise Http404('No candidate found')
+        return tuple(updated)
+    
+    def get_data(self):
+        candidate_id = self.kwargs['candidate_id']
+        data = Candidate.objects.filter(pk=candidate_id).values(*self.fields).get()
+        data['documents'] = []
+        documents = Document.objects.filter(candidate_id=candidate_id).order_by('-uploaded_at')
+        for document in documents.values('id', 'name', 'file', 'uploaded_at', 'verified'):
+            document['url'] = reverse('file_download', args=[document.pop('file')])
+            data['documents'].append(document)
+        data['tallies'] = [
+            {
+                'stage': stage, 'vote_level': vote_level, 'approve': tally.approve, 'reject': tally.reject,
+                'abstain': tally.abstain, 'total': tally.total,
+            }
+            for (_, stage, vote_level), tally in sorted(stored_tallies([candidate_id]).items())
+        ]
+        return data
+
+class ApiLodgeListView(ApiView):
+    """Lodges with their member counts as JSON; ?fields="""
+    
+    def get_validator(self):
+        # A handful of rows: they are their own validator, a 304 saves the encoding and the transfer
+        fields = parse_fields(self.request.GET.get('fields'), LODGE_FIELDS)
+        self.rows = list(
+            Lodge.objects.annotate(member_count=Count('members')).order_by('name', 'id').values(*fields)
+        )
+        return self.rows
+    
+    def get_data(self):
+        return {'results': self.rows}
+
+class ApiVoteListView(SecretaryOrDignitaryRequiredMixin, ApiView):
+    """Votes as JSON, oldest first: ?fields=, the filters of the vote export, ?page_size= and ?cursor="""
+    
+    def get_validator(self):
+        self.fields = parse_fields(self.request.GET.get('fields'), VOTE_FIELDS)
+        self.queryset = filter_by_params(Vote.objects.all(), self.request.GET, VoteExportView.filters)
+        # New votes move the highest id, deletions the count and changes their candidate's last_updated,
+        # and so the newest one of all candidates, which the index returns without joining the votes
+        return (
+            self.queryset.count(),
+            self.queryset.aggregate(last=Max('id'))['last'],
+            Candidate.objects.aggregate(updated=Max('last_updated'))['updated'],
+        )
+    
+    def get_data(self):
+        return keyset_page(self.request, self.queryset, self.fields, 'id')
+
+class ChunkedUploadFormMixin:
+    """
+    Lets an upload form take a completed chunked upload (its id in ``upload``)
+    in place of the ``file`` field; the object is then created as usual.
+    """
+    
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        if self.request.POST.get('upload'):
+            form.fields['file'].required = False
+        return form
+    
+    def form_valid(self, form):
+        upload_id = self.request.POST.get('upload')
+        if upload_id:
+            upload = completed_upload(self.request.user, upload_id)
+            if upload is None:
+                form.add_error('file', 'The upload was not found or is incomplete. Please upload the file again.')
+                return self.form_invalid(form)
+            form.instance.file = upload.file_name
+            upload.delete()
+        return super().form_valid(form)
+
+class MemberDocumentUploadView(SecretaryOrDignitaryRequiredMixin, ChunkedUploadFormMixin, CreateView):
     model = MemberDocument
     template_name = 'members/document_upload.html'
     fields = ['member', 'document_type', 'file', 'title', 'description']
@@ -124,117 +577,44 @@ class MemberDocumentUploadView(SecretaryOrDignitaryRequiredMixin, CreateView):
         messages.success(self.request, 'Document uploaded successfully.')
         return response
 
-class BulkCandidateUploadView(SecretaryOrDignitaryRequiredMixin, CreateView):
+class BulkCandidateUploadView(SecretaryOrDignitaryRequiredMixin, ChunkedUploadFormMixin, CreateView):
     model = BulkUpload
     template_name = 'members/bulk_upload.html'
-    fields = ['file']
+    fields = ['file', 'mode']
     success_url = reverse_lazy('control_panel')
     
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        # Posts without a mode keep the model default, an insert-only import
+        form.fields['mode'].required = False
+        return form
+    
     def form_valid(self, form):
         form.instance.uploaded_by = self.request.user
         response = super().form_valid(form)
         
-        try:
-            # Read Excel file with all string columns to preserve leading zeros in phone numbers
-            df = pd.read_excel(form.instance.file.path, dtype=str)
-            
-            # Trim column names and remove extra spaces
-            df.columns = df.columns.str.strip()
-            
-            # Define required columns (using Albanian names)
-            REQUIRED_COLUMNS = {
-                'Emrin dhe Mbiemrin',
-                'Email Address'
-            }
-            
-            # Check for missing required columns (after trimming)
-            missing_columns = REQUIRED_COLUMNS - set(df.columns)
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-            
-            # Process each row
-            processed_count = 0
-            skipped_count = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # Clean and validate email
-                    email = row['Email Address'].strip().lower() if pd.notna(row['Email Address']) else None
-                    if not email:
-                        errors.append(f"Row {index + 2}: Email is required")
-                        continue
-                    
-                    # Check if candidate with this email already exists
-                    if Candidate.objects.filter(email=email).exists():
-                        skipped_count += 1
-                        errors.append(f"Row {index + 2}: Candidate with email {email} already exists")
-                        continue
-                    
-                    # Handle Kosovo citizenship
-                    is_kosovo_citizen = True
-                    if 'Jeni qytetar i Republikes së Kosoves?' in df.columns:
-                        answer = str(row['Jeni qytetar i Republikes së Kosoves?']).strip().lower()
-                        is_kosovo_citizen = answer in ['po', 'yes', 'true', '1']
-                    
-                    # Parse timestamp
-                    application_date = None
-                    if 'Timestamp' in df.columns:
-                        try:
-                            application_date = pd.to_datetime(row['Timestamp'])
-                        except:
-                            pass
-                    
-                    # Create new candidate
-                    candidate_data = {
-                        'email': email,
-                        'full_name': row['Emrin dhe Mbiemrin'].strip() if pd.notna(row['Emrin dhe Mbiemrin']) else '',
-                        'phone_number': str(row['Nr. e Telefonit']).strip() if 'Nr. e Telefonit' in df.columns and pd.notna(row['Nr. e Telefonit']) else '',
-                        'address': row['Adresa'].strip() if 'Adresa' in df.columns and pd.notna(row['Adresa']) else '',
-                        'city': row['Qyteti'].strip() if 'Qyteti' in df.columns and pd.notna(row['Qyteti']) else '',
-                        'is_kosovo_citizen': is_kosovo_citizen,
-                        'social_profile_url': row['Shto vegzën e profilit tuaj (LinkedIn, Facebook etj).'].strip() if 'Shto vegzën e profilit tuaj (LinkedIn, Facebook etj).' in df.columns and pd.notna(row['Shto vegzën e profilit tuaj (LinkedIn, Facebook etj).']) else '',
-                        'current_stage': 'APPLIED'
-                    }
-                    
-                    candidate = Candidate.objects.create(**candidate_data)
-                    
-                    # Update application date if available
-                    if application_date:
-                        candidate.application_date = application_date
-                        candidate.save()
-                    
-                    processed_count += 1
-                except Exception as e:
-                    errors.append(f"Row {index + 2}: {str(e)}")
-            
-            # Update upload status
-            status_message = []
-            if processed_count > 0:
-                status_message.append(f"Successfully processed {processed_count} new candidates")
-            if skipped_count > 0:
-                status_message.append(f"Skipped {skipped_count} existing candidates")
-            
-            form.instance.processed_count = processed_count
-            if errors:
-                form.instance.status = 'COMPLETED_WITH_ERRORS'
-                form.instance.error_log = '\n'.join(errors)
-                messages.warning(self.request, f"{' | '.join(status_message)}. {len(errors)} errors found.")
-            else:
-                form.instance.status = 'COMPLETED'
-                form.instance.error_log = 'All records processed successfully'
-                messages.success(self.request, f"{' | '.join(status_message)}")
-            
-            form.instance.save()
-                
-        except Exception as e:
-            form.instance.status = 'FAILED'
-            form.instance.error_log = str(e)
-            form.instance.save()
-            messages.error(self.request, f'Failed to process file: {str(e)}')
+        # The import runs as a background job; the control panel polls its progress
+        enqueue_bulk_upload(form.instance)
+        messages.info(self.request, 'File uploaded. Candidates are being imported in the background.')
         
         return response
 
+class BulkUploadProgressView(SecretaryOrDignitaryRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        upload = get_object_or_404(BulkUpload, pk=self.kwargs['pk'])
+        return JsonResponse({
+            'id': upload.pk,
+            'status': upload.status,
+            'processed_count': upload.processed_count,
+            'updated_count': upload.updated_count,
+            'unchanged_count': upload.unchanged_count,
+            'committed_rows': upload.committed_rows,
+            'total_rows': upload.total_rows,
+            'progress_percent': upload.progress_percent,
+            'is_active': upload.is_active,
+            'error_log': upload.error_log,
+        })
+
 @method_decorator(login_required, name='dispatch')
 class MemberDocumentDeleteView(SecretaryOrDignitaryRequiredMixin, DeleteView):
     model = MemberDocument
@@ -243,3 +623,82 @@ class MemberDocumentDeleteView(SecretaryOrDignitaryRequiredMixin, DeleteView):
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Document deleted successfully.')
         return super().delete(request, *args, **kwargs)
+
+class FileDownloadView(LoginRequiredMixin, View):
+    """
+    Uploaded documents and spreadsheets, for signed-in members only. Django
+    checks access; the transfer itself goes to the web server when
+    FILE_DOWNLOAD_SERVER is set (see members.storage.file_response).
+    """
+    login_url = 'login'
+    
+    def get(self, request, name, *args, **kwargs):
+        if not Blob.objects.filter(name=name, ref_count__gt=0).exists() and not is_referenced(name):
+            raise Http404
+        response = file_response(self.get_file_name(name), as_attachment='download' in request.GET)
+        if response.get('ETag') and response['ETag'] == request.headers.get('If-None-Match'):
+            return HttpResponseNotModified(headers={'ETag': response['ETag']})
+        return response
+    
+    def get_file_name(self, name):
+        return name
+
+class FileDerivativeView(FileDownloadView):
+    """Thumbnail or preview of a stored file, generated on the first request if the worker pool has not yet"""
+    
+    def get_file_name(self, name):
+        if self.kwargs['kind'] not in DERIVATIVES:
+            raise Http404
+        derivative = ensure_derivative(name, self.kwargs['kind'])
+        if derivative is None:
+            raise Http404
+        return derivative
+
+class ChunkedUploadMixin(SecretaryOrDignitaryRequiredMixin):
+    """JSON endpoints of the chunked upload API (see members.uploads)"""
+    
+    def get_upload(self):
+        return get_object_or_404(ChunkedUpload, pk=self.kwargs['pk'], user=self.request.user)
+    
+    def upload_response(self, upload, status=200):
+        return JsonResponse({
+            'id': str(upload.pk),
+            'url': reverse('chunked_upload', args=[upload.pk]),
+            'filename': upload.filename,
+            'size': upload.size,
+            'chunk_size': upload.chunk_size,
+            'chunk_count': upload.chunk_count,
+            'received': received_chunks(upload) if upload.status == 'UPLOADING' else list(range(upload.chunk_count)),
+            'status': upload.status,
+            'sha256': blob_digest(upload.file_name) if upload.file_name else None,
+        }, status=status)
+    
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+class ChunkedUploadStartView(ChunkedUploadMixin, View):
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            raise UploadError('The body must be JSON with filename and size')
+        upload = start_upload(request.user, data.get('filename'), data.get('size'))
+        return self.upload_response(upload, status=201)
+
+class ChunkedUploadView(ChunkedUploadMixin, View):
+    def get(self, request, *args, **kwargs):
+        return self.upload_response(self.get_upload())
+
+class ChunkedUploadChunkView(ChunkedUploadMixin, View):
+    def put(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        # Read as a stream: request.body would hold the chunk in memory and is capped by DATA_UPLOAD_MAX_MEMORY_SIZE
+        write_chunk(upload, self.kwargs['index'], request, request.headers.get('X-Chunk-SHA256'))
+        return self.upload_response(upload)
+
+class ChunkedUploadCompleteView(ChunkedUploadMixin, View):
+    def post(self, request, *args, **kwargs):
+        return self.upload_response(complete_upload(self.get_upload()))
@@ -0,0 +1,119 @@
+from django.db.models import Count, Q
+
+from .models import Vote, VoteTally
+
+
+class Tally:
+    """Approve/reject/abstain counts of one (candidate, stage, vote_level)"""
+    __slots__ = ('approve', 'reject', 'abstain', 'total')
+
+    def __init__(self, approve=0, reject=0, abstain=0, total=None):
+        self.approve = approve
+        self.reject = reject
+        self.abstain = abstain
+        self.total = approve + reject + abstain if total is None else total
+
+    def __repr__(self):
+        return f"Tally(approve={self.approve}, reject={self.reject}, abstain={self.abstain})"
+
+    def __eq__(self, other):
+        return isinstance(other, Tally) and (
+            (self.approve, self.reject, self.abstain, self.total)
+            == (other.approve, other.reject, other.abstain, other.total)
+        )
+
+    @property
+    def is_unanimous(self):
+        """Same rule as Vote.check_unanimous: at least one vote and every non-abstaining vote approves"""
+        counted = self.total - self.abstain
+        return counted > 0 and counted == self.approve
+
+
+def _ids(objects):
+    return [getattr(obj, 'pk', obj) for obj in objects]
+
+
+def tally_votes(candidates=None, stages=None, vote_levels=None):
+    """
+    Count votes for many candidates, stages and vote levels in one query.
+
+    ``candidates`` may be Candidate instances or ids; ``None`` means no filter.
+    Returns ``{(candidate_id, stage, vote_level): Tally}`` with an entry for
+    every combination that has at least one vote.
+    """
+    votes = Vote.objects.all()
+    if candidates is not None:
+        votes = votes.filter(candidate_id__in=_ids(candidates))
+    if stages is not None:
+        votes = votes.filter(stage__in=stages)
+    if vote_levels is not None:
+        votes = votes.filter(vote_level__in=vote_levels)
+
+    rows = (
+        votes.values('candidate_id', 'stage', 'vote_level')
+        .annotate(
+            approve=Count('id', filter=Q(vote='APPROVE')),
+            reject=Count('id', filter=Q(vote='REJECT')),
+            abstain=Count('id', filter=Q(vote='ABSTAIN')),
+            total=Count('id'),
+        )
+        .order_by()
+    )
+    return {
+        (row['candidate_id'], row['stage'], row['vote_level']): Tally(
+            row['approve'], row['reject'], row['abstain'], row['total']
+        )
+        for row in rows
+    }
+
+
+def stored_tallies(candidates=None, stages=None, vote_levels=None):
+    """
+    Same result as ``tally_votes`` read from the materialized VoteTally table:
+    one indexed lookup instead of counting Vote rows.
+    """
+    tallies = VoteTally.objects.all()
+    if candidates is not None:
+        tallies = tallies.filter(candidate_id__in=_ids(candidates))
+    if stages is not None:
+        tallies = tallies.filter(stage__in=stages)
+    if vote_levels is not None:
+        tallies = tallies.filter(vote_level__in=vote_levels)
+
+    rows = tallies.values_list(
+        'candidate_id', 'stage', 'vote_level', 'approve_count', 'reject_count', 'abstain_count'
+    )
+    return {
+        (candidate_id, stage, vote_level): Tally(approve, reject, abstain)
+        for candidate_id, stage, vote_level, approve, reject, abstain in rows
+        if approve or reject or abstain
+    }
+
+
+def decide(grand_lodge_tally, lodge_tally):
+    """Grand Lodge decision supersedes the Lodge decision whenever Grand Lodge votes exist"""
+    if grand_lodge_tally is not None:
+        return grand_lodge_tally.is_unanimous
+    return lodge_tally is not None and lodge_tally.is_unanimous
+
+
+def final_decisions(candidates, stages, tallies=None):
+    """
+    Final decision for every (candidate, stage) pair.
+
+    Equivalent to calling ``Vote.get_final_decision`` for each pair but runs a
+    single query against the VoteTally table (pass ``tallies`` from
+    ``tally_votes`` to decide from the raw votes instead).
+    Returns ``{(candidate_id, stage): bool}``.
+    """
+    candidate_ids = _ids(candidates)
+    if tallies is None:
+        tallies = stored_tallies(candidate_ids, stages)
+    return {
+        (candidate_id, stage): decide(
+            tallies.get((candidate_id, stage, 'GRAND_LODGE')),
+            tallies.get((candidate_id, stage, 'LODGE')),
+        )
+        for candidate_id in candidate_ids
+        for stage in stages
+    }
@@ -10,11 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Deployment settings can come from the environment or a .env file next to
+# manage.py (see .env.example); real environment variables take precedence
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -45,6 +52,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # First after security so the session and user lookups are counted too
+    'members.instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,11 +103,71 @@ WSGI_APPLICATION = 'membership_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# DB_ENGINE=postgresql selects PostgreSQL with persistent, health-checked
+# connections; anything else (the default) uses SQLite tuned for concurrent
+# readers and writers through SQLITE_PRAGMAS below.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'membership'),
+            'USER': os.environ.get('DB_USER', 'membership'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Keep connections open between requests instead of reconnecting
+            # every time, and check them before reuse so a restarted server
+            # does not surface as errors
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'members.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+# Applied to every new SQLite connection by members.backends.sqlite3, which
+# also starts transactions with BEGIN IMMEDIATE; pragmas set to None are
+# left alone. WAL lets readers run alongside a writer, but it is stored in the
+# database file, so it is only set when SQLITE_JOURNAL_MODE asks for it (once
+# on the server database is enough) and management commands do not rewrite
+# other databases. NORMAL syncs at checkpoints rather than on every commit,
+# which is only safe in WAL mode; busy_timeout makes writers wait for the lock
+# instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or None
+SQLITE_PRAGMAS = {
+    'journal_mode': SQLITE_JOURNAL_MODE,
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL' if SQLITE_JOURNAL_MODE == 'WAL' else 'FULL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# locmem is per process; point this at a shared backend (Redis, Memcached,
+# database) when running several workers so invalidations reach all of them.
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'membership',
+        # Room for the page fragments of a few thousand candidates (about
+        # 10 KB each) and their version counters; the default of 300 entries
+        # evicts them before they are ever reused
+        'OPTIONS': {'MAX_ENTRIES': 5000},
     }
 }
 
@@ -151,3 +220,56 @@ AUTHENTICATION_BACKENDS = [
 
 # Add or update these settings
 SITE_ID = 1
+
+# Bulk candidate uploads run as background jobs.
+# 'thread' runs them in an in-process pool, 'command' leaves them queued for
+# `python manage.py process_bulk_uploads --loop`.
+BULK_UPLOAD_RUNNER = 'thread'
+BULK_UPLOAD_WORKERS = 1
+BULK_UPLOAD_BATCH_SIZE = 1000
+
+# Uploaded files are stored once per content (members.storage). Downloads are
+# authorised by Django and transferred by: 'django' itself, 'x-sendfile'
+# (Apache mod_xsendfile, lighttpd) or 'x-accel-redirect' (nginx, with an
+# `internal` location at FILE_DOWNLOAD_INTERNAL_URL aliased to MEDIA_ROOT).
+FILE_DOWNLOAD_SERVER = os.environ.get('FILE_DOWNLOAD_SERVER', 'django')
+FILE_DOWNLOAD_INTERNAL_URL = '/protected-media/'
+# Chunked uploads (members.uploads): bytes per chunk and the largest accepted file
+CHUNKED_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+# Threads creating document thumbnails and previews (members.thumbnails)
+THUMBNAIL_WORKERS = 2
+
+# Query instrumentation (members.instrumentation): a statement repeated this
+# many times in one request is logged as a likely N+1
+N_PLUS_ONE_THRESHOLD = 5
+# Server-Timing headers expose database and render timings to the browser
+SERVER_TIMING = DEBUG
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'require_debug_true': {'()': 'django.utils.log.RequireDebugTrue'},
+        'require_debug_false': {'()': 'django.utils.log.RequireDebugFalse'},
+    },
+    'handlers': {
+        # Every request line while developing, only N+1 warnings otherwise
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['require_debug_true'],
+        },
+        'console_warnings': {
+            'class': 'logging.StreamHandler',
+            'level': 'WARNING',
+            'filters': ['require_debug_false'],
+        },
+    },
+    'loggers': {
+        'members.queries': {
+            'handlers': ['console', 'console_warnings'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,102 @@
+// Sends the file of a form[data-chunked-upload-url] in numbered, checksummed
+// chunks (see members/uploads.py), resuming where a dropped upload stopped,
+// then submits the form with the upload id in place of the file.
+// Browsers that cannot hash (crypto.subtle needs HTTPS or localhost) post the
+// form as before.
+(function () {
+    const RESUME_PREFIX = 'chunked-upload:';
+    const ATTEMPTS = 5;
+
+    async function sha256Hex(blob) {
+        const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function request(form, url, options) {
+        options.headers = Object.assign(
+            {'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value}, options.headers
+        );
+        options.credentials = 'same-origin';
+        const response = await fetch(url, options);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        return data;
+    }
+
+    async function startOrResume(form, file, resumeKey) {
+        const saved = localStorage.getItem(resumeKey);
+        if (saved) {
+            try {
+                return await request(form, saved, {method: 'GET'});
+            } catch (error) {
+                localStorage.removeItem(resumeKey);
+            }
+        }
+        const upload = await request(form, form.dataset.chunkedUploadUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size}),
+        });
+        localStorage.setItem(resumeKey, upload.url);
+        return upload;
+    }
+
+    async function sendChunk(form, upload, index, chunk) {
+        const checksum = await sha256Hex(chunk);
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await request(form, upload.url + 'chunks/' + index + '/', {
+                    method: 'PUT', headers: {'X-Chunk-SHA256': checksum}, body: chunk,
+                });
+            } catch (error) {
+                if (attempt >= ATTEMPTS) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+        }
+    }
+
+    async function upload(form, file, progress) {
+        const resumeKey = RESUME_PREFIX + [file.name, file.size, file.lastModified].join(':');
+        let upload = await startOrResume(form, file, resumeKey);
+        const received = new Set(upload.received);
+        for (let index = 0; index < upload.chunk_count; index++) {
+            if (!received.has(index)) {
+                const start = index * upload.chunk_size;
+                await sendChunk(form, upload, index, file.slice(start, start + upload.chunk_size));
+            }
+            progress.textContent = Math.round(100 * (index + 1) / upload.chunk_count) + '%';
+        }
+        upload = await request(form, upload.url + 'complete/', {method: 'POST'});
+        localStorage.removeItem(resumeKey);
+        return upload;
+    }
+
+    document.querySelectorAll('form[data-chunked-upload-url]').forEach(form => {
+        const input = form.querySelector('input[type=file]');
+        const progress = form.querySelector('.upload-progress');
+        const button = form.querySelector('[type=submit]');
+
+        form.addEventListener('submit', async event => {
+            const file = input.files[0];
+            if (!file || !window.crypto || !crypto.subtle) {
+                return;
+            }
+            event.preventDefault();
+            button.disabled = true;
+            try {
+                const result = await upload(form, file, progress);
+                form.elements.upload.value = result.id;
+                // Disabled inputs are not submitted, so the file is not sent again
+                input.disabled = true;
+                form.submit();
+            } catch (error) {
+                progress.textContent = 'Upload interrupted: ' + error.message + '. Submit again to resume.';
+                button.disabled = false;
+            }
+        });
+    });
+})();